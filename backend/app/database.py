@@ -2,7 +2,7 @@
 Database configuration and session management
 """
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
@@ -18,27 +18,109 @@ if not DATABASE_URL:
     print("⚠️ DATABASE_URL не найден. Используем SQLite для разработки.")
     DATABASE_URL = "sqlite:///./optioner.db"
 
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+
+# SQLite: сколько ждать блокировку записи вместо мгновенного "database is locked"
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+# SQLite: NORMAL в режиме WAL не теряет целостность, но не делает fsync на каждый commit
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+
+# PostgreSQL: параметры пула на воркер
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+# Асинхронный engine (aiosqlite / asyncpg) для фоновой записи истории
+DB_ASYNC_ENABLED = os.getenv("DB_ASYNC_ENABLED", "false").lower() == "true"
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    WAL: чтения не блокируются записью, записи не ждут читателей
+    ЗАЧЕМ: Бета работает на SQLite — параллельные запросы не должны упираться в блокировки
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+
 # Создать engine
-if DATABASE_URL.startswith("sqlite"):
-    # SQLite не нужны параметры пула
+if IS_SQLITE:
     engine = create_engine(
         DATABASE_URL,
-        connect_args={"check_same_thread": False}
+        connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}
     )
+    event.listen(engine, "connect", _set_sqlite_pragmas)
     print(f"✅ Используем SQLite: {DATABASE_URL}")
 else:
     # PostgreSQL с параметрами пула
     engine = create_engine(
         DATABASE_URL,
-        pool_pre_ping=True,  # Проверять соединение перед использованием
-        pool_size=5,         # Размер пула соединений
-        max_overflow=10      # Максимум дополнительных соединений
+        pool_pre_ping=True,               # Проверять соединение перед использованием
+        pool_size=DB_POOL_SIZE,           # Размер пула соединений
+        max_overflow=DB_MAX_OVERFLOW,     # Максимум дополнительных соединений
+        pool_recycle=DB_POOL_RECYCLE,     # Переоткрывать соединения старше N секунд
+        pool_timeout=DB_POOL_TIMEOUT      # Сколько ждать свободное соединение
     )
     print(f"✅ Используем PostgreSQL: {DATABASE_URL.split('@')[1] if '@' in DATABASE_URL else 'unknown'}")
 
 # Создать session maker
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+_async_engine = None
+_async_session_maker = None
+
+
+def _async_url(url: str) -> str:
+    """URL с асинхронным драйвером"""
+    if url.startswith("sqlite:"):
+        return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    if url.startswith("postgresql://") or url.startswith("postgres://"):
+        return "postgresql+asyncpg://" + url.split("://", 1)[1]
+    return url
+
+
+def get_async_session_maker():
+    """
+    Фабрика AsyncSession (создаётся при первом обращении)
+    ЗАЧЕМ: Драйверы aiosqlite/asyncpg нужны только при DB_ASYNC_ENABLED=true
+    """
+    global _async_engine, _async_session_maker
+    if _async_session_maker is None:
+        from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+        if IS_SQLITE:
+            _async_engine = create_async_engine(
+                _async_url(DATABASE_URL),
+                connect_args={"timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}
+            )
+            event.listen(_async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+        else:
+            _async_engine = create_async_engine(
+                _async_url(DATABASE_URL),
+                pool_pre_ping=True,
+                pool_size=DB_POOL_SIZE,
+                max_overflow=DB_MAX_OVERFLOW,
+                pool_recycle=DB_POOL_RECYCLE,
+                pool_timeout=DB_POOL_TIMEOUT
+            )
+        _async_session_maker = async_sessionmaker(_async_engine, expire_on_commit=False)
+    return _async_session_maker
+
+
+async def get_async_db():
+    """Dependency для AsyncSession (аналог get_db)"""
+    async with get_async_session_maker()() as session:
+        yield session
+
+
+async def dispose_async_engine():
+    """Закрыть пул асинхронного engine при остановке"""
+    if _async_engine is not None:
+        await _async_engine.dispose()
+
 # Base class для моделей
 Base = declarative_base()
 
@@ -67,5 +149,6 @@ def init_db():
     from app.models import analysis_history  # Import models
     from app.models import user  # Import user models
     from app.models import crypto_rating  # Import crypto rating models
+    from app.models import scheduler_lease  # Import scheduler lease model
     Base.metadata.create_all(bind=engine)
     print("✅ Database tables created successfully")
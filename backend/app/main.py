@@ -1,53 +1,54 @@
 """
 FastAPI Main Application
 """
-from fastapi import FastAPI, Depends, Request, HTTPException
+import time
+_import_started = time.perf_counter()
+
+from fastapi import FastAPI, Depends, Request, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.base import BaseHTTPMiddleware
 from sqlalchemy.orm import Session
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
+import logging
 import os
-import time
 import json
-import redis
 from dotenv import load_dotenv
 from typing import Dict, Optional
 from datetime import datetime, timedelta
 import re
 
-from app.database import get_db, init_db
+from app.database import get_db
 from app.models.analysis_history import AnalysisHistory
 from app.models.user import Base as UserBase
-from app.routers import options, ai_chat, polygon, data_source_info, ib_monitoring, yahoo_proxy, crypto_rating, ml_api, ai_prediction, finnhub_proxy, options_universal, stock_classifier, stock_groups_settings
+from app.routers import options, ai_chat, polygon, data_source_info, ib_monitoring, yahoo_proxy, crypto_rating, ml_api, ai_prediction, finnhub_proxy, options_universal, stock_classifier, stock_groups_settings, profiling, pl_stream
 
 # Load environment variables from .env file
 env_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env')
 load_dotenv(dotenv_path=env_path, override=True)
 
-# Инициализировать БД при старте
-try:
-    init_db()
-    print("✅ Database initialized")
-except Exception as e:
-    print(f"⚠️ Database initialization failed: {e}")
-
-# Redis клиент для кэша
-try:
-    redis_client = redis.Redis(
-        host=os.getenv('REDIS_HOST', 'localhost'),
-        port=int(os.getenv('REDIS_PORT', 6379)),
-        db=0,
-        decode_responses=True,
-        socket_connect_timeout=1,  # Таймаут 1 секунда
-        socket_timeout=1
-    )
-    redis_client.ping()
-    print("✅ Redis подключен")
-except Exception as e:
-    print(f"⚠️ Redis недоступен: {e}. Используем in-memory кэш.")
-    redis_client = None
+# Уровни логов по модулям, JSON формат, запись в stdout в фоновом потоке (LOG_LEVEL, LOG_LEVELS)
+from app.services.logging_setup import setup_logging
+setup_logging()
+logger = logging.getLogger(__name__)
+
+# Запись/воспроизведение ответов Polygon, Yahoo, Finnhub (MARKET_DATA_CASSETTE_MODE)
+from app.services.market_data_cassettes import install_cassettes
+install_cassettes()
+
+from app.services import app_startup
+
+# Метрики Prometheus по вызовам провайдеров (после кассет — учитываются и воспроизведённые)
+from app.services import prometheus_metrics
+prometheus_metrics.instrument_http_clients()
+
+# Кэши, общие для воркеров (SHARED_STATE_BACKEND: Redis или память процесса)
+from app.services import shared_state, ticker_price_cache
+
+# БД и Redis проверяются в startup_event (параллельно), а не при импорте
+# Redis клиент общего состояния (None — кэши в памяти процесса)
+redis_client = None
 
 app = FastAPI(
     title="Options Flow AI Analyzer",
@@ -56,7 +57,13 @@ app = FastAPI(
 )
 
 # Rate Limiter для защиты от DoS атак
-limiter = Limiter(key_func=get_remote_address)
+# При SHARED_STATE_BACKEND=redis лимиты общие для всех воркеров; если Redis упал —
+# временно считаются в памяти воркера
+limiter = Limiter(
+    key_func=get_remote_address,
+    storage_uri=shared_state.limiter_storage_uri(),
+    in_memory_fallback_enabled=True
+)
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
@@ -74,15 +81,14 @@ app.include_router(ml_api.router)
 app.include_router(options_universal.router)
 app.include_router(stock_classifier.router)
 app.include_router(stock_groups_settings.router)
+app.include_router(profiling.router)
+app.include_router(pl_stream.router)
 
-# Простой in-memory кэш (fallback если Redis недоступен)
-_data_cache: Dict = {}
+# TTL кэша опционных данных анализа (shared_state, namespace "options_data")
 _cache_ttl = 300  # 5 минут в секундах
 
-# Кэш для цен тикеров (короткий TTL для актуальности)
+# Кэш для цен тикеров — ticker_price_cache (TTL 30 секунд, общий с потоком P&L)
 # ЗАЧЕМ: Избежать дублирующих запросов к Polygon API при параллельных вызовах
-_ticker_price_cache: Dict = {}
-_ticker_price_ttl = 30  # 30 секунд — баланс между актуальностью и экономией запросов
 
 # Security Headers Middleware
 class SecurityHeadersMiddleware(BaseHTTPMiddleware):
@@ -113,16 +119,47 @@ app.add_middleware(
     allow_headers=["Content-Type", "Authorization", "Accept"],  # Только необходимые заголовки
 )
 
+# Профилирование запросов по X-Profile-Token и список самых медленных запросов
+from app.services.request_profiler import ProfilingMiddleware
+app.add_middleware(ProfilingMiddleware)
+
+# Метрики HTTP маршрутов — внешний слой, чтобы время включало все middleware
+app.add_middleware(prometheus_metrics.PrometheusMiddleware, router=app.router)
+
 
 @app.on_event("startup")
 async def startup_event():
     """Startup event для инициализации приложения"""
+    global redis_client
+    startup_started = time.perf_counter()
+    app_startup.record("import", _import_started)
+    # БД и Redis параллельно
+    redis_client = await app_startup.run_probes()
+    # Загрузка и прогрев ONNX модели (STARTUP_MODE=eager — до приёма запросов)
+    # ЗАЧЕМ: Первый запрос после деплоя не должен ждать загрузки и оптимизации графа
+    await app_startup.warm_up_model()
+    with app_startup.phase("background_services"):
+        # Фоновая запись истории анализов
+        from app.services.history_writer import start_history_writer
+        start_history_writer()
+        # Ночное обновление фундаментальных данных Finnhub (AsyncIOScheduler в текущем loop)
+        from app.services.fundamentals_refresh import start_fundamentals_scheduler
+        start_fundamentals_scheduler()
+    app_startup.report(startup_started)
     print("🚀 Application startup complete")
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Shutdown event для корректного завершения приложения"""
+    from app.services.stock_features_cache import close_http_client
+    from app.services.fundamentals_refresh import stop_fundamentals_scheduler
+    from app.services.history_writer import stop_history_writer
+    from app.database import dispose_async_engine
+    stop_fundamentals_scheduler()
+    await stop_history_writer()
+    await dispose_async_engine()
+    await close_http_client()
     print("👋 Application shutdown")
 
 
@@ -151,16 +188,44 @@ async def root():
 
 
 @app.get("/health")
-async def health_check():
+async def health_check(response: Response):
+    """
+    Состояние воркера
+    ЗАЧЕМ: Пока идёт фоновый прогрев модели (STARTUP_MODE=lazy) — 503 "starting",
+    чтобы трафик не шёл на холодный воркер; модель не загрузилась — "degraded"
+    (прогноз IV работает через fallback на текущую IV)
+    """
     from app.services.data_source_factory import DataSourceFactory
+    from app.services.ai_prediction_service import ai_service
+    ai_status = ai_service.get_status()
+    if not app_startup.is_ready():
+        status = "starting"
+        response.status_code = 503
+    else:
+        status = "healthy" if ai_status["ready"] else "degraded"
     return {
-        "status": "healthy",
+        "status": status,
         "environment": os.getenv("ENVIRONMENT", "development"),
         "ai_provider": os.getenv("AI_PROVIDER", "gemini"),
-        "data_source": DataSourceFactory.get_source_name()
+        "data_source": DataSourceFactory.get_source_name(),
+        "ai_model": ai_status,
+        "startup": {"mode": app_startup.STARTUP_MODE, "timings_ms": app_startup.timings},
+        "shared_state": shared_state.describe()
     }
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    """Метрики Prometheus (при заданном METRICS_TOKEN — только с Bearer токеном)"""
+    if not prometheus_metrics.PROMETHEUS_AVAILABLE:
+        raise HTTPException(status_code=503, detail="prometheus_client is not installed")
+    token = prometheus_metrics.METRICS_TOKEN
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    body, content_type = prometheus_metrics.render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
 @app.get("/api/market/risk-free-rate")
 async def get_risk_free_rate():
     """
@@ -197,42 +262,19 @@ async def get_ticker_price(request: Request, ticker: str):
     ЗАЧЕМ: Избежать дублирующих запросов при параллельных вызовах от разных компонентов
     """
     ticker = validate_ticker(ticker).upper()
-    cache_key = f"price_{ticker}"
-    current_time = time.time()
     
     # Проверяем кэш — если данные свежие, возвращаем их
     # ЗАЧЕМ: Экономим запросы к Polygon API (лимит 5/мин на бесплатном плане)
-    if cache_key in _ticker_price_cache:
-        cached_data, cached_time = _ticker_price_cache[cache_key]
-        if current_time - cached_time < _ticker_price_ttl:
-            return {**cached_data, "cached": True}
+    cached = ticker_price_cache.get_cached(ticker)
+    if ticker_price_cache.is_fresh(cached):
+        return {**cached["data"], "cached": True}
     
     try:
-        from app.services.polygon_client import PolygonClient
-        
-        client = PolygonClient()
-        data = client.get_stock_price(ticker)
-        
-        response_data = {
-            "status": "success",
-            "ticker": ticker,
-            "price": data.get('price'),
-            "change": data.get('change'),
-            "changePercent": data.get('change_percent'),
-            "volume": data.get('volume'),
-            "timestamp": data.get('timestamp'),
-            "cached": False
-        }
-        
-        # Сохраняем в кэш
-        _ticker_price_cache[cache_key] = (response_data, current_time)
-        
-        return response_data
+        return ticker_price_cache.fetch_price(ticker)
     except Exception as e:
         # При ошибке пробуем вернуть устаревший кэш (лучше старые данные, чем ничего)
-        if cache_key in _ticker_price_cache:
-            cached_data, _ = _ticker_price_cache[cache_key]
-            return {**cached_data, "cached": True, "stale": True}
+        if cached:
+            return {**cached["data"], "cached": True, "stale": True}
         return {"status": "error", "error": str(e)}
 
 
@@ -264,11 +306,10 @@ async def get_ticker_details(request: Request, ticker: str):
 async def get_expiration_dates(request: Request, ticker: str):
     """Получить даты экспирации опционов для тикера с кэшированием"""
     ticker = validate_ticker(ticker)
-    cache_key = f"expiration_dates:{ticker.upper()}"
     
     try:
         # Проверяем кэш сначала
-        cached_data = _get_cached_expiration_dates(cache_key)
+        cached_data = _get_cached_expiration_dates(ticker.upper())
         if cached_data:
             print(f"📦 Возвращаем даты экспирации из кэша для {ticker}")
             return cached_data
@@ -289,7 +330,7 @@ async def get_expiration_dates(request: Request, ticker: str):
         }
         
         # Кэшируем результат на 1 час (даты экспирации меняются редко)
-        _cache_expiration_dates(cache_key, result, ttl_minutes=60)
+        _cache_expiration_dates(ticker.upper(), result, ttl_minutes=60)
         
         return result
         
@@ -331,22 +372,11 @@ async def get_options_chain(request: Request, ticker: str, expiration_date: str)
 async def clear_expiration_cache(request: Request, ticker: str):
     """Очистить кэш дат экспирации для тикера"""
     ticker = validate_ticker(ticker)
-    cache_key = f"expiration_dates:{ticker.upper()}"
     
     try:
-        # Очистить из Redis
-        if redis_client:
-            try:
-                deleted = redis_client.delete(cache_key)
-                if deleted:
-                    print(f"🗑️ Удален кэш из Redis для {ticker}")
-            except Exception as e:
-                print(f"Redis delete error: {e}")
-        
-        # Очистить из memory кэша
-        if cache_key in _data_cache:
-            del _data_cache[cache_key]
-            print(f"🗑️ Удален кэш из memory для {ticker}")
+        # Очистить из общего кэша (Redis и память процесса)
+        if shared_state.delete("expiration_dates", ticker.upper()):
+            print(f"🗑️ Удален кэш дат экспирации для {ticker}")
         
         return {
             "status": "success",
@@ -358,104 +388,34 @@ async def clear_expiration_cache(request: Request, ticker: str):
         return {"status": "error", "error": str(e)}
 
 
-def _get_cached_expiration_dates(cache_key: str):
-    """Получить даты экспирации из кэша с проверкой TTL"""
+def _get_cached_expiration_dates(ticker: str):
+    """Получить даты экспирации из общего кэша (TTL 1 час соблюдает хранилище)"""
     try:
-        # Попытка получить из Redis
-        if redis_client:
-            try:
-                cached_str = redis_client.get(cache_key)
-                if cached_str:
-                    cached_data = json.loads(cached_str)
-                    
-                    # Проверяем TTL - если данные старше 1 часа, считаем их устаревшими
-                    cached_at = datetime.fromisoformat(cached_data.get('cached_at', ''))
-                    if datetime.now() - cached_at < timedelta(hours=1):
-                        return cached_data
-                    else:
-                        print(f"🗑️ Удаляем устаревшие данные из Redis кэша")
-                        redis_client.delete(cache_key)
-                        return None
-            except Exception as e:
-                print(f"Redis error: {e}")
-        
-        # Fallback на in-memory кэш
-        if cache_key in _data_cache:
-            cached_data, timestamp = _data_cache[cache_key]
-            if time.time() - timestamp < 3600:  # 1 час
-                return cached_data
-            else:
-                print(f"🗑️ Удаляем устаревшие данные из memory кэша")
-                del _data_cache[cache_key]
-                return None
-        
-        return None
+        cached_data = shared_state.get("expiration_dates", ticker)
+        prometheus_metrics.record_cache("expiration_dates", cached_data is not None)
+        return cached_data
     except Exception as e:
         print(f"Cache error: {e}")
         return None
 
-def _cache_expiration_dates(cache_key: str, data: dict, ttl_minutes: int = 60):
+def _cache_expiration_dates(ticker: str, data: dict, ttl_minutes: int = 60):
     """Кэшировать даты экспирации с TTL"""
     try:
-        # Сохранить в Redis с TTL
-        if redis_client:
-            try:
-                redis_client.setex(
-                    cache_key, 
-                    ttl_minutes * 60,  # TTL в секундах
-                    json.dumps(data)
-                )
-                print(f"💾 Данные сохранены в Redis кэш на {ttl_minutes} минут")
-                return
-            except Exception as e:
-                print(f"Redis cache error: {e}")
-        
-        # Fallback на in-memory кэш
-        _data_cache[cache_key] = (data, time.time())
-        print(f"💾 Данные сохранены в memory кэш на {ttl_minutes} минут")
-        
+        shared_state.put("expiration_dates", ticker, data, ttl=ttl_minutes * 60)
+        logger.debug("💾 Даты экспирации %s сохранены в кэш на %s минут", ticker, ttl_minutes)
     except Exception as e:
         print(f"Cache save error: {e}")
 
 def _get_cached_data(ticker: str):
-    """Получить данные из кэша (Redis или in-memory)"""
-    cache_key = f"options_data:{ticker.upper()}"
-    
-    # Попытка получить из Redis
-    if redis_client:
-        try:
-            cached_str = redis_client.get(cache_key)
-            if cached_str:
-                return json.loads(cached_str)
-        except Exception as e:
-            print(f"Redis get error: {e}")
-    
-    # Fallback на in-memory кэш
-    if cache_key in _data_cache:
-        cached = _data_cache[cache_key]
-        if time.time() - cached['timestamp'] < _cache_ttl:
-            return cached['data']
-    
-    return None
+    """Получить данные из общего кэша (Redis или in-memory — см. shared_state)"""
+    cached = shared_state.get("options_data", ticker.upper())
+    prometheus_metrics.record_cache("options_data", cached is not None)
+    return cached
 
 
 def _set_cached_data(ticker: str, data):
-    """Сохранить данные в кэш (Redis или in-memory)"""
-    cache_key = f"options_data:{ticker.upper()}"
-    
-    # Попытка сохранить в Redis
-    if redis_client:
-        try:
-            redis_client.setex(cache_key, _cache_ttl, json.dumps(data))
-            return
-        except Exception as e:
-            print(f"Redis set error: {e}")
-    
-    # Fallback на in-memory кэш
-    _data_cache[cache_key] = {
-        'data': data,
-        'timestamp': time.time()
-    }
+    """Сохранить данные в общий кэш"""
+    shared_state.put("options_data", ticker.upper(), data, ttl=_cache_ttl)
 
 
 @app.post("/analyze")
@@ -531,7 +491,8 @@ async def analyze_step1_data(request: Request, ticker: str):
         })
 
         end_time = time.time()
-        print(f"⏱️ Step 1 (Data Fetch) took: {end_time - start_time:.2f} seconds")
+        logger.info("⏱️ Step 1 (Data Fetch) took: %.2f seconds", end_time - start_time,
+                    extra={"step": "data_fetch", "ticker": ticker, "duration_ms": int((end_time - start_time) * 1000)})
         return {
             "status": "success",
             "ticker": ticker.upper(),
@@ -563,7 +524,8 @@ async def analyze_step2_metrics(request: Request, ticker: str):
         _set_cached_data(ticker, cached)
         
         end_time = time.time()
-        print(f"⏱️ Step 2 (Metrics Calc) took: {end_time - start_time:.2f} seconds")
+        logger.info("⏱️ Step 2 (Metrics Calc) took: %.2f seconds", end_time - start_time,
+                    extra={"step": "metrics", "ticker": ticker, "duration_ms": int((end_time - start_time) * 1000)})
         return {
             "status": "success",
             "ticker": ticker.upper(),
@@ -596,17 +558,15 @@ async def analyze_step3_ai(request: Request, ticker: str, ai_model: str = "gemin
             os.environ["AI_PROVIDER"] = "gemini"
         
         # Детальные логи времени выполнения
-        import json
         step_start = time.time()
         
-        print(f"\n=== AI Analysis Start ===")
-        print(f"AI Model: {ai_model}")
-        print(f"Provider: {os.getenv('AI_PROVIDER')}")
-        print(f"⏱️ Step 3 initialization took: {step_start - start_time:.2f}s")
+        logger.debug("=== AI Analysis Start === model=%s provider=%s init=%.2fs",
+                     ai_model, os.getenv('AI_PROVIDER'), step_start - start_time)
         
-        # Логируем размер данных
-        metrics_json = json.dumps(cached['metrics'], ensure_ascii=False)
-        print(f"📊 Metrics data size: {len(metrics_json)} characters")
+        # Размер данных — сериализация только ради лога, поэтому только на DEBUG
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("📊 Metrics data size: %d characters",
+                         len(json.dumps(cached['metrics'], ensure_ascii=False)))
         
         # Сохраняем файл только в development окружении
         if ticker.upper() == 'TSLA' and os.getenv('ENVIRONMENT', 'development') == 'development':
@@ -615,27 +575,25 @@ async def analyze_step3_ai(request: Request, ticker: str, ai_model: str = "gemin
                 with open("tsla_metrics.json", "w", encoding="utf-8") as f:
                     json.dump(cached['metrics'], f, indent=2, ensure_ascii=False)
                 file_end = time.time()
-                print(f"✅ Metrics for TSLA saved to tsla_metrics.json in {file_end - file_start:.2f}s")
+                logger.debug("✅ Metrics for TSLA saved to tsla_metrics.json in %.2fs", file_end - file_start)
             except Exception as e:
-                print(f"⚠️ Could not save metrics file: {e}")
+                logger.warning("⚠️ Could not save metrics file: %s", e)
         
         # Создание AI анализатора
         ai_init_start = time.time()
         ai = AIAnalyzer()
         ai_init_end = time.time()
-        print(f"🤖 AI Analyzer initialization took: {ai_init_end - ai_init_start:.2f}s")
+        logger.debug("🤖 AI Analyzer initialization took: %.2fs", ai_init_end - ai_init_start)
         
         # Запуск анализа
         analysis_start = time.time()
-        print(f"🚀 Starting AI analysis at {analysis_start}")
         analysis = ai.analyze(ticker.upper(), cached['metrics'])
         analysis_end = time.time()
-        print(f"🏁 AI analysis completed in: {analysis_end - analysis_start:.2f}s")
+        logger.debug("🏁 AI analysis completed in: %.2fs", analysis_end - analysis_start)
         
-        print(f"Analysis result type: {type(analysis)}")
-        print(f"Analysis result length: {len(str(analysis)) if analysis else 0}")
-        print(f"Analysis preview: {str(analysis)[:200] if analysis else 'None'}")
-        print(f"=== AI Analysis End ===\n")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Analysis result: type=%s length=%d preview=%.200s",
+                         type(analysis).__name__, len(str(analysis)) if analysis else 0, analysis)
         
         # Восстановить оригинальное значение
         if original_provider:
@@ -643,14 +601,14 @@ async def analyze_step3_ai(request: Request, ticker: str, ai_model: str = "gemin
         
         end_time = time.time()
         execution_time_ms = int((end_time - start_time) * 1000)
-        print(f"⏱️ Step 3 (AI Analysis) took: {end_time - start_time:.2f} seconds")
+        logger.info("⏱️ Step 3 (AI Analysis) took: %.2f seconds", end_time - start_time,
+                    extra={"step": "ai_analysis", "ticker": ticker, "ai_model": ai_model,
+                           "duration_ms": execution_time_ms})
         
-        # Автосохранение в БД
-        print("💾 Attempting to save analysis to database...")
+        # Автосохранение в БД через фоновый писатель (ответ не ждёт commit)
         try:
-            db = next(get_db())
-            print(f"📊 Creating analysis record for {ticker.upper()}")
-            analysis_record = AnalysisHistory(
+            from app.services.history_writer import enqueue_analysis
+            saved = await enqueue_analysis(
                 ticker=ticker.upper(),
                 stock_data=cached['stock_data'],
                 metrics=cached['metrics'],
@@ -659,17 +617,13 @@ async def analyze_step3_ai(request: Request, ticker: str, ai_model: str = "gemin
                 ai_provider=ai.get_provider_name(),
                 execution_time_ms=execution_time_ms
             )
-            db.add(analysis_record)
-            print("💾 Committing to database...")
-            db.commit()
-            db.refresh(analysis_record)
+            analysis_id = saved["id"]
             
             # Сгенерировать URL
             base_url = os.getenv("BASE_URL", "http://localhost:3000")
-            analysis_url = f"{base_url}/analysis/{analysis_record.id}"
+            analysis_url = f"{base_url}/analysis/{analysis_id}"
             
-            print(f"✅ Analysis saved to DB: {analysis_record.id}")
-            print(f"🔗 Share URL: {analysis_url}")
+            logger.debug("✅ Analysis queued for DB: %s (%s)", analysis_id, analysis_url)
             
             return {
                 "status": "success",
@@ -678,13 +632,13 @@ async def analyze_step3_ai(request: Request, ticker: str, ai_model: str = "gemin
                 "metrics": cached['metrics'],
                 "ai_analysis": analysis,
                 "ai_provider": ai.get_provider_name(),
-                "analysis_id": str(analysis_record.id),
-                "share_url": analysis_url
+                "analysis_id": analysis_id,
+                "share_url": analysis_url,
+                # pending — запись ещё в очереди, ссылка заработает после commit
+                "save_status": saved["save_status"]
             }
         except Exception as db_error:
-            print(f"⚠️ Failed to save to DB: {db_error}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("⚠️ Failed to save to DB: %s", db_error)
             # Вернуть результат даже если сохранение не удалось
             return {
                 "status": "success",
@@ -707,8 +661,7 @@ async def save_analysis(
     ai_model: str,
     ai_analysis: str,
     ai_provider: str,
-    execution_time_ms: Optional[int] = None,
-    db: Session = Depends(get_db)
+    execution_time_ms: Optional[int] = None
 ):
     """Сохранить результат анализа в PostgreSQL"""
     try:
@@ -716,8 +669,9 @@ async def save_analysis(
         ip_address = request.client.host if request.client else None
         user_agent = request.headers.get("user-agent")
         
-        # Создать запись
-        analysis = AnalysisHistory(
+        # Поставить запись в очередь фонового писателя
+        from app.services.history_writer import enqueue_analysis
+        saved = await enqueue_analysis(
             ticker=ticker.upper(),
             stock_data=stock_data,
             metrics=metrics,
@@ -729,27 +683,44 @@ async def save_analysis(
             execution_time_ms=execution_time_ms
         )
         
-        db.add(analysis)
-        db.commit()
-        db.refresh(analysis)
-        
         # Сгенерировать URL
         base_url = os.getenv("BASE_URL", "http://localhost:3000")
-        url = f"{base_url}/analysis/{analysis.id}"
+        url = f"{base_url}/analysis/{saved['id']}"
         
         return {
             "status": "success",
-            "id": str(analysis.id),
-            "url": url
+            "id": saved["id"],
+            "url": url,
+            "save_status": saved["save_status"]
         }
     except Exception as e:
-        db.rollback()
+        return {"status": "error", "error": str(e)}
+
+
+@app.get("/api/analysis/history")
+def get_history(
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    ticker: Optional[str] = None,
+    offset: int = 0,
+    db: Session = Depends(get_db)
+):
+    """
+    Получить историю анализов: краткие записи и курсор следующей страницы
+    ВАЖНО: Объявлен до /api/analysis/{analysis_id}, иначе "history" попадает в analysis_id
+    Синхронный обработчик — FastAPI выполняет его в пуле потоков, запрос к БД не блокирует event loop
+    """
+    try:
+        from app.services.analysis_history_service import get_history_page
+        page = get_history_page(db, limit=limit, cursor=cursor, ticker=ticker, offset=offset)
+        return {"status": "success", **page}
+    except Exception as e:
         return {"status": "error", "error": str(e)}
 
 
 @app.get("/api/analysis/{analysis_id}")
-async def get_analysis(analysis_id: str, db: Session = Depends(get_db)):
-    """Получить сохраненный анализ по ID"""
+def get_analysis(analysis_id: str, db: Session = Depends(get_db)):
+    """Получить сохраненный анализ по ID (синхронный — выполняется в пуле потоков)"""
     try:
         # Найти анализ по UUID
         analysis = db.query(AnalysisHistory).filter(
@@ -765,37 +736,3 @@ async def get_analysis(analysis_id: str, db: Session = Depends(get_db)):
             return {"status": "error", "error": "Анализ не найден"}
     except Exception as e:
         return {"status": "error", "error": str(e)}
-
-
-@app.get("/api/analysis/history")
-async def get_history(
-    limit: int = 20,
-    offset: int = 0,
-    ticker: Optional[str] = None,
-    db: Session = Depends(get_db)
-):
-    """Получить историю анализов с пагинацией"""
-    try:
-        # Базовый запрос
-        query = db.query(AnalysisHistory)
-        
-        # Фильтр по тикеру если указан
-        if ticker:
-            query = query.filter(AnalysisHistory.ticker == ticker.upper())
-        
-        # Сортировка по дате (новые первые)
-        query = query.order_by(AnalysisHistory.created_at.desc())
-        
-        # Пагинация
-        analyses = query.offset(offset).limit(limit).all()
-        
-        # Конвертировать в dict
-        data = [analysis.to_dict() for analysis in analyses]
-        
-        return {
-            "status": "success",
-            "data": data,
-            "count": len(data)
-        }
-    except Exception as e:
-        return {"status": "error", "error": str(e)}
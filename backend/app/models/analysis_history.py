@@ -1,7 +1,7 @@
 """
 SQLAlchemy model for analysis_history table
 """
-from sqlalchemy import Column, String, Text, Integer, TIMESTAMP, Index, JSON
+from sqlalchemy import Column, String, Text, Integer, TIMESTAMP, Index, JSON, literal_column
 from sqlalchemy.sql import func
 import uuid
 
@@ -59,3 +59,16 @@ class AnalysisHistory(Base):
 Index('idx_ticker', AnalysisHistory.ticker)
 Index('idx_created_at', AnalysisHistory.created_at.desc())
 Index('idx_ai_model', AnalysisHistory.ai_model)
+# Keyset пагинация истории: (created_at, id) по всем записям и внутри тикера
+Index('idx_created_at_id', AnalysisHistory.created_at.desc(), AnalysisHistory.id.desc())
+Index('idx_ticker_created_at', AnalysisHistory.ticker, AnalysisHistory.created_at.desc(), AnalysisHistory.id.desc())
+
+# SQLite хранит TIMESTAMP строкой в разных форматах (server_default без микросекунд),
+# поэтому пагинация сортирует по нормализованной строке. Индекс по выражению работает,
+# только если запрос содержит то же выражение буквально — формат литералом, не параметром
+SQLITE_SORT_KEY = func.strftime(literal_column("'%Y-%m-%d %H:%M:%f'"), AnalysisHistory.created_at)
+Index('idx_sqlite_sort_key_id', SQLITE_SORT_KEY.desc(), AnalysisHistory.id.desc()).ddl_if(dialect='sqlite')
+Index(
+    'idx_sqlite_ticker_sort_key_id',
+    AnalysisHistory.ticker, SQLITE_SORT_KEY.desc(), AnalysisHistory.id.desc()
+).ddl_if(dialect='sqlite')
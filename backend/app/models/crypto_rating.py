@@ -4,7 +4,7 @@
 Затрагивает: БД, API эндпоинты, планировщик задач
 """
 
-from sqlalchemy import Column, Integer, String, DateTime, JSON, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, JSON, ForeignKey, Boolean, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
@@ -18,7 +18,9 @@ class CryptoSnapshot(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
-    crypto_list = Column(JSON, nullable=False)  # [{"symbol": "BTC", "name": "Bitcoin"}, ...]
+    # Устаревший формат: полный список [{"symbol": "BTC", "name": "Bitcoin"}, ...]
+    # Новые снимки хранят пустой список, состав — в crypto_snapshot_ranks
+    crypto_list = Column(JSON, nullable=False)
     task_id = Column(Integer, ForeignKey("crypto_scheduled_tasks.id"), nullable=True)
     
     # Связь с задачей
@@ -27,6 +29,51 @@ class CryptoSnapshot(Base):
     # Связи с анализами
     analyses_as_first = relationship("CryptoAnalysis", foreign_keys="CryptoAnalysis.first_snapshot_id", back_populates="first_snapshot")
     analyses_as_second = relationship("CryptoAnalysis", foreign_keys="CryptoAnalysis.second_snapshot_id", back_populates="second_snapshot")
+    
+    # Состав снимка (строка на криптовалюту)
+    ranks = relationship("CryptoSnapshotRank", back_populates="snapshot", cascade="all, delete-orphan")
+
+
+class CryptoAsset(Base):
+    """
+    Справочник криптовалют (symbol -> name)
+    ЗАЧЕМ: Название хранится один раз, а не в каждом снимке
+    """
+    __tablename__ = "crypto_assets"
+
+    symbol = Column(String, primary_key=True)
+    name = Column(String, nullable=False)
+
+
+class CryptoSnapshotRank(Base):
+    """
+    Позиция криптовалюты в снимке
+    ЗАЧЕМ: Сравнение снимков и история тикера — индексные SQL запросы, а не разбор JSON
+    """
+    __tablename__ = "crypto_snapshot_ranks"
+
+    snapshot_id = Column(Integer, ForeignKey("crypto_snapshots.id", ondelete="CASCADE"), primary_key=True)
+    symbol = Column(String, primary_key=True)
+    rank = Column(Integer, nullable=False)
+
+    snapshot = relationship("CryptoSnapshot", back_populates="ranks")
+
+
+class CryptoMembershipPeriod(Base):
+    """
+    Период пребывания криптовалюты в топе (материализованный индекс членства)
+    left_snapshot_id — первый снимок, в котором её уже нет (NULL — всё ещё в топе)
+    """
+    __tablename__ = "crypto_membership_periods"
+
+    id = Column(Integer, primary_key=True)
+    symbol = Column(String, nullable=False)
+    entered_snapshot_id = Column(Integer, ForeignKey("crypto_snapshots.id", ondelete="CASCADE"), nullable=False)
+    left_snapshot_id = Column(Integer, ForeignKey("crypto_snapshots.id"), nullable=True)
+
+
+Index('idx_crypto_snapshot_ranks_symbol', CryptoSnapshotRank.symbol, CryptoSnapshotRank.snapshot_id)
+Index('idx_crypto_membership_symbol', CryptoMembershipPeriod.symbol, CryptoMembershipPeriod.entered_snapshot_id)
 
 
 class CryptoAnalysis(Base):
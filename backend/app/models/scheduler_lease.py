@@ -0,0 +1,20 @@
+"""
+Модель аренды (lease) для распределённой блокировки планировщика
+ЗАЧЕМ: При нескольких воркерах uvicorn задачи по расписанию выполняет только
+владелец аренды; если он умер, аренда истекает и её забирает другой воркер
+Затрагивает: scheduler_lease (LeaseLock), crypto_scheduler
+"""
+
+from sqlalchemy import Column, String, DateTime
+from app.database import Base
+
+
+class SchedulerLease(Base):
+    """
+    Аренда именованной блокировки: владелец и срок действия
+    """
+    __tablename__ = "scheduler_leases"
+
+    name = Column(String(100), primary_key=True)
+    owner = Column(String(255), nullable=False)
+    expires_at = Column(DateTime, nullable=False)
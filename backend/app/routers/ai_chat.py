@@ -4,7 +4,7 @@ AI Chat Router - FastAPI эндпоинты для AI чата с Gemini
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import List, Dict, Optional
-import google.generativeai as genai
+from app.services.prometheus_metrics import track_upstream
 import os
 from datetime import datetime
 
@@ -18,10 +18,26 @@ AI_CHAT_TOP_P = float(os.getenv('AI_CHAT_TOP_P', '0.95'))
 AI_CHAT_TOP_K = int(os.getenv('AI_CHAT_TOP_K', '64'))
 AI_CHAT_MAX_TOKENS = int(os.getenv('AI_CHAT_MAX_TOKENS', '8000'))
 
-if AI_CHAT_API_KEY:
+_model = None
+_model_initialized = False
+
+
+def get_model():
+    """
+    Модель Gemini для чата, создаётся при первом обращении
+    ЗАЧЕМ: google.generativeai импортируется около секунды — не на старте воркера
+    """
+    global _model, _model_initialized
+    if _model_initialized:
+        return _model
+    _model_initialized = True
+    if not AI_CHAT_API_KEY:
+        print("⚠️ AI_CHAT_GEMINI_API_KEY not found in environment")
+        return None
     try:
+        import google.generativeai as genai
         genai.configure(api_key=AI_CHAT_API_KEY)
-        model = genai.GenerativeModel(
+        _model = genai.GenerativeModel(
             AI_CHAT_MODEL,
             generation_config={
                 'temperature': AI_CHAT_TEMPERATURE,
@@ -33,10 +49,7 @@ if AI_CHAT_API_KEY:
         print(f"✅ AI Chat configured with model: {AI_CHAT_MODEL}")
     except Exception as e:
         print(f"❌ Error configuring AI Chat: {str(e)}")
-        model = None
-else:
-    print("⚠️ AI_CHAT_GEMINI_API_KEY not found in environment")
-    model = None
+    return _model
 
 # Системный промпт
 SYSTEM_PROMPT = """Ты - профессиональный опционный трейдер и аналитик. 
@@ -155,6 +168,7 @@ async def chat(request: ChatRequest):
     Отправка сообщения в AI чат с контекстом позиций
     """
     try:
+        model = get_model()
         if not model:
             raise HTTPException(
                 status_code=500,
@@ -187,7 +201,8 @@ async def chat(request: ChatRequest):
 ОТВЕТ:"""
 
         # Отправляем запрос в Gemini
-        response = model.generate_content(full_prompt)
+        with track_upstream("gemini"):
+            response = model.generate_content(full_prompt)
         
         return {
             'status': 'success',
@@ -212,6 +227,7 @@ async def get_suggestions(request: SuggestionsRequest):
     Получить автоматические рекомендации на основе позиций
     """
     try:
+        model = get_model()
         if not model:
             raise HTTPException(
                 status_code=500,
@@ -237,7 +253,8 @@ async def get_suggestions(request: SuggestionsRequest):
 
 Формат: короткие пункты с эмодзи."""
 
-        response = model.generate_content(prompt)
+        with track_upstream("gemini"):
+            response = model.generate_content(prompt)
         
         return {
             'status': 'success',
@@ -1,9 +1,10 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Optional, List
 import logging
 
 from app.services.ai_prediction_service import ai_service
+from app.services.ai_iv_surface_service import get_iv_surface
 
 router = APIRouter(
     prefix="/api/ai",
@@ -26,6 +27,44 @@ class PredictionResponse(BaseModel):
     used_ai: bool
     ticker: str
 
+# Максимальный размер батча — защита от чрезмерно больших запросов
+MAX_BATCH_SIZE = 5000
+
+class BatchPredictionRequest(BaseModel):
+    scenarios: List[PredictionRequest] = Field(
+        ..., max_length=MAX_BATCH_SIZE,
+        description="Сценарии для прогноза (нога × цена × день)"
+    )
+
+class BatchPredictionResponse(BaseModel):
+    success: bool
+    count: int
+    predictions: List[PredictionResponse]
+
+class IVSurfaceRequest(BaseModel):
+    ticker: str = Field(..., description="Тикер актива, например AAPL")
+    type: str = Field(..., description="Тип опциона: CALL или PUT")
+    currentIv: float = Field(..., gt=0, description="Текущая рыночная IV")
+    moneynessMin: float = Field(0.5, gt=0, description="Минимальный K/S")
+    moneynessMax: float = Field(1.5, gt=0, description="Максимальный K/S")
+    moneynessPoints: int = Field(41, ge=2, le=201, description="Число узлов по K/S")
+    ttmMinDays: float = Field(1, gt=0, description="Минимум дней до экспирации")
+    ttmMaxDays: float = Field(365, gt=0, le=1095, description="Максимум дней до экспирации")
+    ttmPoints: int = Field(20, ge=2, le=100, description="Число узлов по времени")
+
+class IVSurfaceResponse(BaseModel):
+    success: bool
+    ticker: str
+    type: str
+    used_ai: bool
+    cached: bool
+    iv_bucket: float
+    date: str
+    moneyness: List[float]
+    ttm: List[float]
+    shape: List[int]
+    iv: List[float]
+
 @router.post("/predict-iv", response_model=PredictionResponse)
 async def predict_iv(request: PredictionRequest):
     """
@@ -73,3 +112,79 @@ async def predict_iv(request: PredictionRequest):
             used_ai=False,
             ticker=request.ticker
         )
+
+
+@router.post("/predict-iv/batch", response_model=BatchPredictionResponse)
+async def predict_iv_batch(request: BatchPredictionRequest):
+    """
+    Пакетный прогноз IV для N сценариев одним вызовом модели.
+    ЗАЧЕМ: Вместо сотен запросов /predict-iv на обновление калькулятора — один.
+    Порядок predictions совпадает с порядком scenarios.
+    """
+    scenarios = request.scenarios
+    try:
+        predicted, used_ai = await ai_service.predict_iv_batch_with_source([
+            {
+                'ticker': s.ticker,
+                'type': s.type,
+                'stock_price': s.stockPrice,
+                'strike': s.strike,
+                'ttm': s.ttm,
+                'current_iv': s.currentIv
+            }
+            for s in scenarios
+        ])
+        success = True
+    except Exception as e:
+        logger.error(f"Error in predict-iv/batch endpoint: {e}")
+        # Fallback на исходные IV при любой ошибке
+        predicted = [s.currentIv for s in scenarios]
+        used_ai = [False] * len(scenarios)
+        success = False
+
+    # used_ai — из результата сервиса: без сессии ONNX вернулась исходная IV
+    predictions = [
+        PredictionResponse(
+            success=success,
+            iv=iv,
+            used_ai=ai_used,
+            ticker=s.ticker
+        )
+        for s, iv, ai_used in zip(scenarios, predicted, used_ai)
+    ]
+
+    return BatchPredictionResponse(
+        success=success,
+        count=len(predictions),
+        predictions=predictions
+    )
+
+
+@router.post("/iv-surface", response_model=IVSurfaceResponse)
+async def predict_iv_surface(request: IVSurfaceRequest):
+    """
+    AI IV Surface на сетке moneyness (K/S) × время до экспирации (годы).
+    Вся сетка считается одним вызовом модели и кэшируется на сервере
+    по (тикер, тип, бакет текущей IV, день).
+    iv — плоский массив по строкам: iv[i_moneyness * len(ttm) + i_ttm].
+    """
+    if request.moneynessMin >= request.moneynessMax or request.ttmMinDays >= request.ttmMaxDays:
+        raise HTTPException(status_code=400, detail="Некорректные границы сетки")
+
+    try:
+        surface = await get_iv_surface(
+            ticker=request.ticker,
+            option_type=request.type,
+            current_iv=request.currentIv,
+            moneyness_min=request.moneynessMin,
+            moneyness_max=request.moneynessMax,
+            moneyness_points=request.moneynessPoints,
+            ttm_min_days=request.ttmMinDays,
+            ttm_max_days=request.ttmMaxDays,
+            ttm_points=request.ttmPoints
+        )
+        return IVSurfaceResponse(success=True, **surface)
+
+    except Exception as e:
+        logger.error(f"Error in iv-surface endpoint: {e}")
+        raise HTTPException(status_code=500, detail="Не удалось построить AI IV Surface")
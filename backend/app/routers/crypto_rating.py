@@ -4,9 +4,9 @@ API роутер для функционала рейтинга криптова
 Затрагивает: Frontend, планировщик задач, БД
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from pydantic import BaseModel
 from datetime import datetime
 import logging
@@ -15,8 +15,9 @@ import os
 from app.database import get_db
 # from app.services.crypto_scheduler import crypto_scheduler  # Больше не используется
 from app.services.crypto_analysis_service import crypto_analysis_service
-from app.services.coinmarketcap_service import coinmarketcap_service
 from app.services.email_service import email_service
+from app.services import crypto_snapshot_store
+from app.services.crypto_trajectory_service import get_trajectories, MAX_SNAPSHOTS
 
 logger = logging.getLogger(__name__)
 
@@ -71,6 +72,14 @@ class TaskInfo(BaseModel):
     next_run_at: datetime = None
 
 
+class MembershipPeriod(BaseModel):
+    """Период пребывания криптовалюты в топе"""
+    entered_snapshot_id: int
+    entered_at: datetime
+    left_snapshot_id: Optional[int] = None
+    left_at: Optional[datetime] = None
+
+
 class SnapshotDetail(BaseModel):
     """Детальная информация о снимке"""
     id: int
@@ -79,6 +88,11 @@ class SnapshotDetail(BaseModel):
     crypto_list: List[CryptoItem]
 
 
+def _snapshot_count(db: Session, snapshot_id: int) -> int:
+    """Количество криптовалют в снимке"""
+    return crypto_snapshot_store.get_snapshot_counts(db, [snapshot_id]).get(snapshot_id, 0)
+
+
 @router.post("/create-snapshot")
 async def create_snapshot(db: Session = Depends(get_db)):
     """
@@ -126,7 +140,7 @@ async def create_snapshot(db: Session = Depends(get_db)):
             "success": True,
             "snapshot_id": snapshot.id,
             "created_at": snapshot.created_at,
-            "crypto_count": len(snapshot.crypto_list),
+            "crypto_count": _snapshot_count(db, snapshot.id),
             "analysis_created": analysis is not None,
             "analysis_id": analysis.id if analysis else None
         }
@@ -153,11 +167,13 @@ async def get_snapshot_detail(
         if not snapshot:
             raise HTTPException(status_code=404, detail="Snapshot not found")
         
+        crypto_list = crypto_snapshot_store.get_snapshot_items(db, snapshot_id)
+        
         return SnapshotDetail(
             id=snapshot.id,
             created_at=snapshot.created_at,
-            crypto_count=len(snapshot.crypto_list),
-            crypto_list=[CryptoItem(**crypto) for crypto in snapshot.crypto_list]
+            crypto_count=len(crypto_list),
+            crypto_list=[CryptoItem(**crypto) for crypto in crypto_list]
         )
         
     except HTTPException:
@@ -174,20 +190,56 @@ async def get_all_snapshots(db: Session = Depends(get_db)):
     try:
         from app.models.crypto_rating import CryptoSnapshot
         
-        snapshots = db.query(CryptoSnapshot).order_by(
+        # Только id и дата — JSON колонка не загружается, количество одним GROUP BY
+        snapshots = db.query(CryptoSnapshot.id, CryptoSnapshot.created_at).order_by(
             CryptoSnapshot.created_at.desc()
         ).all()
+        counts = crypto_snapshot_store.get_snapshot_counts(db)
         
         return [{
             "id": s.id,
             "created_at": s.created_at,
-            "crypto_count": len(s.crypto_list)
+            "crypto_count": counts.get(s.id, 0)
         } for s in snapshots]
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/symbols/{symbol}/history", response_model=List[MembershipPeriod])
+async def get_symbol_history(
+    symbol: str,
+    db: Session = Depends(get_db)
+):
+    """
+    Когда криптовалюта входила в топ и выпадала из него
+    """
+    try:
+        return crypto_snapshot_store.get_symbol_history(db, symbol)
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/trajectories")
+async def get_rank_trajectories(
+    from_snapshot_id: Optional[int] = Query(None, description="Первый снимок диапазона"),
+    to_snapshot_id: Optional[int] = Query(None, description="Последний снимок диапазона"),
+    limit: int = Query(52, ge=2, le=MAX_SNAPSHOTS, description="Максимум последних снимков"),
+    db: Session = Depends(get_db)
+):
+    """
+    Траектории рангов, входы/выходы из топа и скорость движения по серии снимков
+    """
+    try:
+        return get_trajectories(db, from_snapshot_id, to_snapshot_id, limit)
+        
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/analyses", response_model=List[AnalysisSummary])
 async def get_all_analyses(db: Session = Depends(get_db)):
     """
@@ -288,7 +340,7 @@ async def fetch_snapshot_now(db: Session = Depends(get_db)):
             "success": True,
             "snapshot_id": snapshot.id,
             "created_at": snapshot.created_at,
-            "crypto_count": len(snapshot.crypto_list)
+            "crypto_count": _snapshot_count(db, snapshot.id)
         }
         
     except Exception as e:
@@ -301,6 +353,7 @@ async def test_coinmarketcap_connection():
     Проверить подключение к CoinMarketCap API
     """
     try:
+        from app.services.coinmarketcap_service import coinmarketcap_service
         success = coinmarketcap_service.test_connection()
         
         return {
@@ -342,7 +395,7 @@ async def delete_snapshot(
                 detail=f"Cannot delete snapshot: used in {analyses_count} analysis(es). Delete analyses first."
             )
         
-        db.delete(snapshot)
+        crypto_snapshot_store.delete_snapshot(db, snapshot)
         db.commit()
         
         return {
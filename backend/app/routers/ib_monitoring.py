@@ -3,22 +3,17 @@ IB Gateway Monitoring Router
 Endpoint для мониторинга состояния IB Gateway
 """
 from fastapi import APIRouter, HTTPException
-from typing import Dict, List, Optional
-from datetime import datetime, timedelta
+from typing import Dict, Optional
+from datetime import datetime
 import os
 import logging
 
+from app.services import ib_request_metrics
+
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/ib", tags=["IB Monitoring"])
 
-# In-memory хранилище для статистики (в production можно заменить на Redis)
-_requests_log: List[Dict] = []
-_errors_log: List[Dict] = []
-
-# Максимальное количество записей в логах
-MAX_LOG_SIZE = 1000
-
 
 def log_request(asset_type: str, success: bool = True, error: Optional[str] = None):
     """
@@ -29,29 +24,7 @@ def log_request(asset_type: str, success: bool = True, error: Optional[str] = No
         success: Успешность запроса
         error: Сообщение об ошибке (если есть)
     """
-    timestamp = datetime.now().isoformat()
-    
-    # Добавить в лог запросов
-    _requests_log.append({
-        "timestamp": timestamp,
-        "asset_type": asset_type,
-        "success": success
-    })
-    
-    # Ограничить размер лога
-    if len(_requests_log) > MAX_LOG_SIZE:
-        _requests_log.pop(0)
-    
-    # Если ошибка - добавить в лог ошибок
-    if not success and error:
-        _errors_log.append({
-            "timestamp": timestamp,
-            "asset_type": asset_type,
-            "error": error
-        })
-        
-        if len(_errors_log) > MAX_LOG_SIZE:
-            _errors_log.pop(0)
+    ib_request_metrics.record_request(asset_type, success=success, error=error)
 
 
 def get_requests_stats() -> Dict:
@@ -61,31 +34,7 @@ def get_requests_stats() -> Dict:
     Returns:
         Dict с количеством запросов по каждому типу
     """
-    now = datetime.now()
-    hour_ago = now - timedelta(hours=1)
-    
-    # Фильтруем запросы за последний час
-    recent_requests = [
-        r for r in _requests_log 
-        if datetime.fromisoformat(r["timestamp"]) > hour_ago
-    ]
-    
-    # Считаем по типам
-    stats = {
-        "stocks": 0,
-        "options": 0,
-        "futures": 0,
-        "indices": 0,
-        "forex": 0,
-        "total": len(recent_requests)
-    }
-    
-    for req in recent_requests:
-        asset_type = req.get("asset_type", "unknown")
-        if asset_type in stats:
-            stats[asset_type] += 1
-    
-    return stats
+    return ib_request_metrics.get_window_stats(minutes=60)
 
 
 @router.get("/status")
@@ -127,17 +76,13 @@ async def get_ib_status():
                 logger.error(f"Failed to get IB auth status: {e}")
         
         # Получаем последний успешный запрос
-        last_successful = None
-        if _requests_log:
-            successful_requests = [r for r in _requests_log if r.get("success")]
-            if successful_requests:
-                last_successful = successful_requests[-1]["timestamp"]
+        last_successful = ib_request_metrics.get_last_success()
         
         # Получаем статистику запросов
         requests_stats = get_requests_stats()
         
         # Получаем последние ошибки (максимум 10)
-        recent_errors = _errors_log[-10:] if _errors_log else []
+        recent_errors = ib_request_metrics.get_recent_errors(10)
         
         return {
             "status": "connected" if is_ib_active and auth_status.get("connected") else "disconnected",
@@ -237,40 +182,12 @@ async def get_requests_history(hours: int = 24):
         List запросов с группировкой по часам
     """
     try:
-        now = datetime.now()
-        cutoff = now - timedelta(hours=hours)
-        
-        # Фильтруем запросы
-        filtered = [
-            r for r in _requests_log 
-            if datetime.fromisoformat(r["timestamp"]) > cutoff
-        ]
-        
-        # Группируем по часам и типам
-        hourly_stats = {}
-        
-        for req in filtered:
-            req_time = datetime.fromisoformat(req["timestamp"])
-            hour_key = req_time.strftime("%Y-%m-%d %H:00")
-            asset_type = req.get("asset_type", "unknown")
-            
-            if hour_key not in hourly_stats:
-                hourly_stats[hour_key] = {
-                    "stocks": 0,
-                    "options": 0,
-                    "futures": 0,
-                    "indices": 0,
-                    "forex": 0,
-                    "total": 0
-                }
-            
-            if asset_type in hourly_stats[hour_key]:
-                hourly_stats[hour_key][asset_type] += 1
-            hourly_stats[hour_key]["total"] += 1
+        # Сводка собирается из минутных корзин, без разбора отдельных запросов
+        hourly_stats = ib_request_metrics.get_hourly_breakdown(hours)
         
         return {
             "period_hours": hours,
-            "total_requests": len(filtered),
+            "total_requests": sum(stats["total"] for stats in hourly_stats.values()),
             "hourly_breakdown": hourly_stats
         }
         
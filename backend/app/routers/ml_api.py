@@ -10,6 +10,8 @@ from typing import Optional, List, Dict, Any
 from datetime import datetime
 import logging
 
+from app.services import vol_surface_cache
+
 logger = logging.getLogger(__name__)
 
 router = APIRouter(
@@ -109,13 +111,10 @@ async def predict_price(request: PredictPriceRequest):
         
         predictor = get_predictor()
         
-        # Пытаемся получить реальные данные из Polygon
+        # Пытаемся получить реальные данные из Polygon (цена кэшируется на 30 секунд)
         spot_price = None
         try:
-            from app.services.polygon_client import PolygonClient
-            polygon = PolygonClient()
-            stock_data = polygon.get_stock_price(request.ticker.upper())
-            spot_price = stock_data.get('price')
+            spot_price = await vol_surface_cache.get_spot_price(request.ticker)
         except Exception as e:
             logger.warning(f"⚠️ Polygon недоступен: {e}")
         
@@ -148,36 +147,19 @@ async def predict_price(request: PredictPriceRequest):
                 model_version=predictor.model_version
             )
         
-        # Получаем опционы с нескольких дат экспирации для построения Vol Surface
-        # ЗАЧЕМ: Для интерполяции нужны точки с разными T (временами до экспирации)
-        options_chain = []
-        try:
-            # Получаем доступные даты экспирации
-            expiration_dates = polygon.get_expiration_dates(request.ticker.upper())
-            
-            # Берём первые 5 дат для разнообразия по T
-            for exp_date in expiration_dates[:5]:
-                try:
-                    chain = polygon.get_options_chain(request.ticker.upper(), expiration_date=exp_date)
-                    options_chain.extend(chain)
-                except Exception as e:
-                    logger.warning(f"⚠️ Ошибка получения опционов для {exp_date}: {e}")
-                    continue
-            
-            logger.info(f"📊 Загружено {len(options_chain)} опционов для {request.ticker.upper()}")
-        except Exception as e:
-            logger.warning(f"⚠️ Не удалось получить опционную цепочку: {e}")
-        
-        # Строим реальную Volatility Surface из опционных данных
+        # Vol Surface из кэша по (тикер, дата, бакет цены)
+        # ЗАЧЕМ: Повторные прогнозы по тикеру (другие страйки/горизонты) не грузят
+        # пять опционных цепочек и не перестраивают surface заново
         surface = None
-        if options_chain and spot_price:
-            from ml.data.surface_builder import SurfaceBuilder
-            builder = SurfaceBuilder()
-            surface = builder.build_surface_from_chain(
-                options_chain=options_chain,
-                spot_price=spot_price,
-                reference_date=datetime.now().strftime("%Y-%m-%d")
-            )
+        options_chain = []
+        cached_surface = await vol_surface_cache.get_surface(
+            ticker=request.ticker,
+            spot_price=spot_price,
+            reference_date=today.strftime("%Y-%m-%d")
+        )
+        if cached_surface is not None:
+            surface = cached_surface["surface"]
+            options_chain = cached_surface["options_chain"]
         
         # Если не удалось построить surface — возвращаем ошибку
         if surface is None:
@@ -258,6 +240,15 @@ async def predict_price(request: PredictPriceRequest):
         )
 
 
+@router.get("/surface-cache")
+async def get_surface_cache_stats():
+    """
+    Состояние кэша Vol Surface
+    ЗАЧЕМ: Отладка — какие тикеры закэшированы и насколько свежие
+    """
+    return {"status": "success", **vol_surface_cache.get_cache_stats()}
+
+
 @router.get("/model-info", response_model=ModelInfoResponse)
 async def get_model_info():
     """
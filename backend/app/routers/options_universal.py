@@ -5,6 +5,7 @@
 
 Эндпоинты:
 - POST /tradingview/receive - приём данных от TradingView Extension
+- POST /tradingview/delta - приём изменившихся контрактов (дельта к версии цепочки)
 - GET /tradingview/chain/{ticker} - получение опционной цепочки
 - GET /tradingview/status - статус подключения к расширению
 - POST /calculate/pl - расчёт P&L для позиций
@@ -34,6 +35,16 @@ class OptionsChainData(BaseModel):
     chain: Optional[List[Dict]] = None  # Альтернативное имя для options
 
 
+class OptionsChainDelta(BaseModel):
+    """Частичное обновление цепочки: только изменившиеся контракты"""
+    ticker: str = Field(..., description="Тикер инструмента")
+    underlying_price: Optional[float] = Field(None, alias="price")
+    options: Optional[List[Dict]] = None
+    chain: Optional[List[Dict]] = None  # Альтернативное имя для options
+    removed: Optional[List[Dict]] = Field(None, description="Ключи удалённых контрактов (expiration, strike, option_type)")
+    base_version: Optional[int] = Field(None, description="Версия цепочки, к которой применяется дельта")
+
+
 class PositionData(BaseModel):
     """Модель данных одной опционной позиции"""
     option_type: Literal["call", "put"] = Field(..., description="Тип опциона")
@@ -78,10 +89,11 @@ class MockDataRequest(BaseModel):
 # === Эндпоинты для TradingView Extension ===
 
 @router.post("/tradingview/receive")
-async def receive_tradingview_data(data: OptionsChainData):
+def receive_tradingview_data(data: OptionsChainData):
     """
     Принять опционную цепочку от TradingView Extension
     ЗАЧЕМ: Основной эндпоинт для получения данных от браузерного расширения
+    Синхронный (threadpool): запись ждёт блокировку тикера до LOCK_WAIT_SECONDS
     """
     service = get_tradingview_service()
     
@@ -92,6 +104,30 @@ async def receive_tradingview_data(data: OptionsChainData):
     
     if result['status'] == 'error':
         raise HTTPException(status_code=400, detail=result['error'])
+    if result['status'] == 'busy':
+        raise HTTPException(status_code=503, detail=result['error'], headers={"Retry-After": "1"})
+    
+    return result
+
+
+@router.post("/tradingview/delta")
+def receive_tradingview_delta(data: OptionsChainDelta):
+    """
+    Принять изменившиеся контракты от TradingView Extension
+    ЗАЧЕМ: Частые пуши без пересборки всей цепочки
+    409 — версия не совпала или цепочки нет: расширение должно прислать полный снимок
+    503 — цепочку тикера сейчас обновляет другой запрос: повторить пуш
+    """
+    service = get_tradingview_service()
+    
+    result = service.receive_options_delta(data.ticker, data.model_dump(by_alias=True))
+    
+    if result['status'] == 'error':
+        raise HTTPException(status_code=400, detail=result['error'])
+    if result['status'] == 'resync_required':
+        raise HTTPException(status_code=409, detail=result)
+    if result['status'] == 'busy':
+        raise HTTPException(status_code=503, detail=result['error'], headers={"Retry-After": "1"})
     
     return result
 
@@ -0,0 +1,106 @@
+"""
+WebSocket поток P&L и Greeks для универсального калькулятора
+ЗАЧЕМ: Вместо опроса /calculate/curve и цены тикера калькулятор подписывается
+позициями и получает изменения, когда сдвигаются цена или IV
+Затрагивает: Frontend UniversalOptionsCalculator, services/pl_stream
+
+Протокол (JSON сообщения):
+    → {"type": "subscribe", "ticker": "AAPL", "positions": [...], ...параметры /calculate/curve}
+      повторный subscribe заменяет подписку (изменились позиции или параметры)
+    → {"type": "unsubscribe"} | {"type": "ping"}
+    ← {"type": "snapshot", "seq", "price", "source", "ivs", "pl_now", "curve", "greeks"}
+    ← {"type": "diff", "seq", "price", "source", "ivs", "pl_now",
+       "curve_changes": [[индекс точки, pl], ...]?, "greeks"?}
+    ← {"type": "error", "error": ...} | {"type": "pong"}
+    Соединение закрывается с кодом 1011, если обновление не удалось отправить
+    за SEND_TIMEOUT (клиент не читает) — клиент переподключается и подписывается заново
+"""
+
+import asyncio
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from pydantic import BaseModel, Field, ValidationError
+
+from app.services.pl_stream import SEND_TIMEOUT, Subscription, hub
+
+router = APIRouter(prefix="/api/universal", tags=["Universal Calculator"])
+
+
+class StreamPosition(BaseModel):
+    """Позиция подписки (как в /calculate/curve + экспирация для IV из цепочки TradingView)"""
+    option_type: Literal["call", "put"]
+    position_type: Literal["long", "short"]
+    strike: float
+    premium: float
+    quantity: int = 1
+    days_to_expiry: int = 30
+    iv: float = 0.25
+    expiration: Optional[str] = Field(None, description="YYYY-MM-DD — IV берётся из котировки цепочки")
+
+
+class PLStreamSubscribe(BaseModel):
+    """Подписка калькулятора на поток P&L"""
+    ticker: str
+    mode: Literal["stocks", "futures"] = "stocks"
+    positions: List[StreamPosition] = Field(..., max_length=50)
+    current_price: Optional[float] = Field(None, description="Цена, пока нет данных TradingView / Polygon")
+    price_range_percent: float = Field(0.2, gt=0, le=1)
+    num_points: int = Field(100, ge=2, le=500)
+    target_days: Optional[int] = None
+    point_value: Optional[float] = None
+    risk_free_rate: float = 0.05
+    dividend_yield: float = 0.0
+
+
+@router.websocket("/ws/pl")
+async def pl_stream(websocket: WebSocket):
+    """
+    Поток P&L и Greeks позиций калькулятора
+    ЗАЧЕМ: Пересчёт и отправка только при изменении цены / IV больше порога
+    """
+    await websocket.accept()
+    subscription: Optional[Subscription] = None
+    handler = asyncio.current_task()
+    send_failed = False
+
+    def on_send_failure():
+        # Хаб не смог отправить обновление — прерываем ожидание receive_json
+        nonlocal send_failed
+        send_failed = True
+        handler.cancel()
+
+    try:
+        while True:
+            message = await websocket.receive_json()
+            kind = message.get("type") if isinstance(message, dict) else None
+
+            if kind == "subscribe":
+                try:
+                    request = PLStreamSubscribe(**message)
+                except ValidationError as e:
+                    await websocket.send_json({"type": "error", "error": e.errors(include_url=False)})
+                    continue
+                if subscription is not None:
+                    hub.unsubscribe(subscription)
+                subscription = Subscription(websocket.send_json, request.model_dump(), on_send_failure)
+                await hub.subscribe(subscription)
+            elif kind == "unsubscribe":
+                if subscription is not None:
+                    hub.unsubscribe(subscription)
+                    subscription = None
+            elif kind == "ping":
+                await websocket.send_json({"type": "pong"})
+            else:
+                await websocket.send_json({"type": "error", "error": f"Неизвестный тип сообщения: {kind}"})
+    except WebSocketDisconnect:
+        pass
+    except asyncio.CancelledError:
+        if not send_failed:
+            raise
+        handler.uncancel()
+        # Если и close не уходит, исключение отдаёт соединение uvicorn — он закроет транспорт
+        await asyncio.wait_for(websocket.close(code=1011), SEND_TIMEOUT)
+    finally:
+        if subscription is not None:
+            hub.unsubscribe(subscription)
@@ -0,0 +1,50 @@
+"""
+API профилей запросов и списка самых медленных запросов (только для администратора)
+Доступ: заголовок X-Profile-Token или параметр token — PROFILING_TOKEN или JWT admin
+"""
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import FileResponse
+
+from app.services import request_profiler
+
+router = APIRouter(prefix=request_profiler.PROFILES_API_PREFIX, tags=["admin"])
+
+
+def verify_profiling_access(
+    token: Optional[str] = None,
+    x_profile_token: Optional[str] = Header(None)
+) -> None:
+    """Проверяет токен профилирования или роль admin"""
+    if not request_profiler.is_authorized(x_profile_token or token):
+        raise HTTPException(status_code=403, detail="Требуются права администратора")
+
+
+@router.get("", dependencies=[Depends(verify_profiling_access)])
+async def list_profiles():
+    """Сохранённые профили (новые первые)"""
+    return {"profiles": request_profiler.list_profiles()}
+
+
+@router.get("/slowest", dependencies=[Depends(verify_profiling_access)])
+async def get_slowest_requests(limit: int = 20):
+    """
+    Самые медленные запросы этого воркера за окно SLOW_REQUESTS_WINDOW_HOURS
+    profile_id указан у запросов, выполненных с профилированием
+    """
+    return {
+        "window_hours": request_profiler.SLOW_REQUESTS_WINDOW_HOURS,
+        "requests": request_profiler.get_slowest(limit)
+    }
+
+
+@router.get("/{profile_id}", dependencies=[Depends(verify_profiling_access)])
+async def get_profile(profile_id: str):
+    """Профиль: HTML flame graph или speedscope JSON (открывается на speedscope.app)"""
+    path = request_profiler.find_profile(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Профиль не найден")
+    if path.name.endswith(".html"):
+        return FileResponse(path, media_type="text/html")
+    return FileResponse(path, media_type="application/json", filename=path.name)
@@ -5,21 +5,33 @@ API роутер для классификации акций по группа
 
 Эндпоинты:
 - GET /api/stock/classify?symbol=AAPL — классификация акции
+- POST /api/stock/classify/batch — классификация watchlist
 - GET /api/stock/groups — список доступных групп
+- GET /api/stock/fundamentals/stats — состояние локального хранилища фундаментальных данных
+- POST /api/stock/fundamentals/refresh — внеплановое обновление хранилища (только admin)
+- POST /api/stock/fundamentals/purge — удаление данных из хранилища (только admin)
 """
 
-from fastapi import APIRouter, Query, HTTPException, Request
-from typing import Optional
+import asyncio
+
+from fastapi import APIRouter, Depends, Query, HTTPException, Request
+from pydantic import BaseModel, Field
+from typing import Optional, List
 
 from slowapi.util import get_remote_address
 from slowapi import Limiter
 
 from app.services.stock_classifier import (
     classify_stock,
+    classify_stocks,
     get_stock_groups,
     get_group_multipliers,
     clear_cache
 )
+from app.services.fundamentals_refresh import refresh_fundamentals, get_refresh_status
+from app.services.stock_features_cache import purge_fields
+from app.routers.admin import verify_admin
+from app.services import shared_state
 
 # ============================================================================
 # КОНФИГУРАЦИЯ РОУТЕРА
@@ -28,8 +40,46 @@ from app.services.stock_classifier import (
 router = APIRouter(prefix="/api/stock", tags=["stock-classifier"])
 
 # Rate limiter для защиты от злоупотреблений
-# ЗАЧЕМ: Finnhub имеет лимит 60 запросов/минуту
-limiter = Limiter(key_func=get_remote_address)
+# ЗАЧЕМ: Finnhub имеет лимит 60 запросов/минуту; хранилище общее для воркеров
+limiter = Limiter(
+    key_func=get_remote_address,
+    storage_uri=shared_state.limiter_storage_uri(),
+    in_memory_fallback_enabled=True
+)
+
+# Ссылки на фоновые задачи обновления (чтобы их не собрал GC)
+_background_tasks: set = set()
+
+# Максимум тикеров в одном пакетном запросе
+MAX_BATCH_SYMBOLS = 200
+
+
+class ClassifyBatchRequest(BaseModel):
+    """Список тикеров watchlist для пакетной классификации"""
+    symbols: List[str] = Field(..., min_length=1, max_length=MAX_BATCH_SYMBOLS)
+
+
+def _is_valid_symbol(symbol: str) -> bool:
+    """Тикер из букв (допускается точка: BRK.B)"""
+    return symbol.isalpha() or symbol.replace(".", "").isalpha()
+
+
+def _fallback_classification(symbol: str, error: str) -> dict:
+    """
+    Fallback на growth группу
+    ЗАЧЕМ: Калькулятор должен работать даже при ошибках API
+    """
+    return {
+        "symbol": symbol.upper(),
+        "group": "growth",
+        "down_mult": 0.75,
+        "up_mult": 0.9,
+        "label": "Рост/События",
+        "description": "Не удалось определить группу, используется значение по умолчанию",
+        "features": {},
+        "cached": False,
+        "error": error
+    }
 
 
 # ============================================================================
@@ -71,7 +121,7 @@ async def classify_stock_endpoint(
         # Очищаем и валидируем символ
         clean_symbol = symbol.upper().strip()
         
-        if not clean_symbol.isalpha() and not clean_symbol.replace(".", "").isalpha():
+        if not _is_valid_symbol(clean_symbol):
             raise HTTPException(
                 status_code=400,
                 detail="Некорректный формат тикера"
@@ -87,18 +137,40 @@ async def classify_stock_endpoint(
     except Exception as e:
         print(f"[stock_classifier_router] Ошибка классификации {symbol}: {e}")
         # Возвращаем fallback на growth группу
-        # ЗАЧЕМ: Калькулятор должен работать даже при ошибках API
-        return {
-            "symbol": symbol.upper(),
-            "group": "growth",
-            "down_mult": 0.75,
-            "up_mult": 0.9,
-            "label": "Рост/События",
-            "description": "Не удалось определить группу, используется значение по умолчанию",
-            "features": {},
-            "cached": False,
-            "error": str(e)
+        return _fallback_classification(symbol, str(e))
+
+
+@router.post("/classify/batch")
+@limiter.limit("10/minute")
+async def classify_batch_endpoint(request: Request, body: ClassifyBatchRequest):
+    """
+    Классифицирует список тикеров (watchlist) одним запросом
+    ЗАЧЕМ: Один пул соединений и ограниченный параллелизм вместо N отдельных запросов
+    
+    Returns:
+        {
+            "count": 2,
+            "results": [{...как /classify...}, ...],
+            "invalid": ["12$"]
         }
+    """
+    symbols = [s.upper().strip() for s in body.symbols]
+    valid = [s for s in symbols if s and _is_valid_symbol(s)]
+    invalid = [s for s in symbols if not (s and _is_valid_symbol(s))]
+    
+    results = await classify_stocks(valid)
+    
+    # Упавшие тикеры получают fallback, как в одиночном эндпоинте
+    results = [
+        _fallback_classification(r["symbol"], r["error"]) if "group" not in r else r
+        for r in results
+    ]
+    
+    return {
+        "count": len(results),
+        "results": results,
+        "invalid": invalid
+    }
 
 
 @router.get("/groups")
@@ -157,8 +229,9 @@ async def clear_cache_endpoint(
     symbol: Optional[str] = Query(None, description="Тикер для очистки (или все)")
 ):
     """
-    Очищает кэш классификации
+    Очищает кэш классификации и кэш полей Finnhub в памяти
     ЗАЧЕМ: Для принудительного обновления данных при необходимости
+    Локальное хранилище не очищается — это /fundamentals/purge (admin)
     
     Args:
         symbol: Если указан — очищает только этот тикер, иначе весь кэш
@@ -172,3 +245,56 @@ async def clear_cache_endpoint(
         "status": "ok",
         "cleared": symbol.upper() if symbol else "all"
     }
+
+
+@router.get("/fundamentals/stats")
+async def fundamentals_stats_endpoint():
+    """
+    Состояние локального хранилища фундаментальных данных
+    ЗАЧЕМ: Проверить, что ночное обновление отрабатывает и данные не устарели
+    """
+    return await asyncio.to_thread(get_refresh_status)
+
+
+@router.post("/fundamentals/refresh", dependencies=[Depends(verify_admin)])
+@limiter.limit("2/minute")
+async def fundamentals_refresh_endpoint(request: Request):
+    """
+    Запускает внеплановое обновление хранилища в фоне
+    ЗАЧЕМ: После первого деплоя или добавления тикеров в FUNDAMENTALS_UNIVERSE
+    не ждать ночного запуска
+    Требует прав администратора (параметр token — JWT admin): прогон расходует лимит Finnhub
+    
+    Returns:
+        {"status": "started"} или {"status": "running"}, если обновление уже идёт
+    """
+    status = await asyncio.to_thread(get_refresh_status)
+    if status["refresh_running"]:
+        return {"status": "running"}
+    
+    task = asyncio.create_task(refresh_fundamentals())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return {"status": "started"}
+
+
+@router.post("/fundamentals/purge", dependencies=[Depends(verify_admin)])
+@limiter.limit("2/minute")
+async def fundamentals_purge_endpoint(
+    request: Request,
+    symbol: Optional[str] = Query(None, description="Тикер (или всё хранилище)")
+):
+    """
+    Удаляет фундаментальные данные из локального хранилища
+    ЗАЧЕМ: Сбросить испорченные данные тикера; без symbol — всё хранилище,
+    после чего классификации идут в Finnhub, пока не пройдёт /fundamentals/refresh
+    Требует прав администратора (параметр token — JWT admin)
+    
+    Returns:
+        {"status": "ok", "purged": "AAPL" | "all"}
+    """
+    await asyncio.to_thread(purge_fields, symbol)
+    return {
+        "status": "ok",
+        "purged": symbol.upper() if symbol else "all"
+    }
@@ -74,6 +74,11 @@ def save_settings(settings: Dict[str, Any]) -> bool:
         
         with open(SETTINGS_FILE, 'w', encoding='utf-8') as f:
             json.dump(settings, f, ensure_ascii=False, indent=2)
+        
+        # Классификатор перечитает настройки сразу — кэш классификаций
+        # инвалидируется по новой версии настроек без перезапроса Finnhub
+        from app.services.stock_classifier import reload_settings
+        reload_settings()
         return True
     except Exception as e:
         print(f"[stock_groups_settings] Ошибка сохранения настроек: {e}")
@@ -9,6 +9,7 @@ from dotenv import load_dotenv
 import random
 import string
 from app.services.telegram_bot import TelegramBotManager
+from app.services.telegram_update_dispatcher import UpdateDispatcher
 from app.services.telegram_auth import JWTManager
 from app.database import get_db
 from app.models.user import User
@@ -32,11 +33,12 @@ jwt_manager = JWTManager(jwt_secret)
 polling_task = None
 last_update_id = 0
 
+# Сколько обновлений обрабатывается параллельно
+TELEGRAM_UPDATE_WORKERS = int(os.getenv("TELEGRAM_UPDATE_WORKERS", "8"))
+
 # Функция для создания БД сессии (для callback обработчиков)
 def get_db_session():
-    """Создаёт новую БД сессию с гарантией загрузки .env"""
-    # Повторно загружаем .env на всякий случай
-    load_dotenv(override=True)
+    """Создаёт новую БД сессию (.env уже загружен при импорте модуля)"""
     from app.database import SessionLocal as SL
     return SL()
 
@@ -75,24 +77,24 @@ async def telegram_webhook(update: TelegramUpdate):
                 # Получаем фото профиля пользователя через Telegram API
                 photo_url = None
                 try:
-                    async with aiohttp.ClientSession() as session:
-                        photos_url = f"https://api.telegram.org/bot{bot_token}/getUserProfilePhotos"
-                        async with session.get(photos_url, params={"user_id": user_id, "limit": 1}) as resp:
-                            if resp.status == 200:
-                                photos_data = await resp.json()
-                                if photos_data.get('ok') and photos_data.get('result', {}).get('photos'):
-                                    # Получаем file_id самого большого фото
-                                    photo = photos_data['result']['photos'][0][-1]  # Последнее = самое большое
-                                    file_id = photo['file_id']
+                    session = bot_manager.get_session()
+                    photos_url = f"https://api.telegram.org/bot{bot_token}/getUserProfilePhotos"
+                    async with session.get(photos_url, params={"user_id": user_id, "limit": 1}) as resp:
+                        if resp.status == 200:
+                            photos_data = await resp.json()
+                            if photos_data.get('ok') and photos_data.get('result', {}).get('photos'):
+                                # Получаем file_id самого большого фото
+                                photo = photos_data['result']['photos'][0][-1]  # Последнее = самое большое
+                                file_id = photo['file_id']
                                     
-                                    # Получаем file_path
-                                    file_url = f"https://api.telegram.org/bot{bot_token}/getFile"
-                                    async with session.get(file_url, params={"file_id": file_id}) as file_resp:
-                                        if file_resp.status == 200:
-                                            file_data = await file_resp.json()
-                                            if file_data.get('ok'):
-                                                file_path = file_data['result']['file_path']
-                                                photo_url = f"https://api.telegram.org/file/bot{bot_token}/{file_path}"
+                                # Получаем file_path
+                                file_url = f"https://api.telegram.org/bot{bot_token}/getFile"
+                                async with session.get(file_url, params={"file_id": file_id}) as file_resp:
+                                    if file_resp.status == 200:
+                                        file_data = await file_resp.json()
+                                        if file_data.get('ok'):
+                                            file_path = file_data['result']['file_path']
+                                            photo_url = f"https://api.telegram.org/file/bot{bot_token}/{file_path}"
                 except Exception as e:
                     print(f"⚠️ Не удалось получить фото профиля: {e}")
                 
@@ -388,25 +390,25 @@ async def process_telegram_update(update: Dict[str, Any]):
                     # Получаем фото профиля пользователя через Telegram API
                     photo_url = None
                     try:
-                        async with aiohttp.ClientSession() as session:
-                            photos_url = f"https://api.telegram.org/bot{bot_token}/getUserProfilePhotos"
-                            async with session.get(photos_url, params={"user_id": user_id, "limit": 1}) as resp:
-                                if resp.status == 200:
-                                    photos_data = await resp.json()
-                                    if photos_data.get('ok') and photos_data.get('result', {}).get('photos'):
-                                        # Получаем file_id самого большого фото
-                                        photo = photos_data['result']['photos'][0][-1]
-                                        file_id = photo['file_id']
+                        session = bot_manager.get_session()
+                        photos_url = f"https://api.telegram.org/bot{bot_token}/getUserProfilePhotos"
+                        async with session.get(photos_url, params={"user_id": user_id, "limit": 1}) as resp:
+                            if resp.status == 200:
+                                photos_data = await resp.json()
+                                if photos_data.get('ok') and photos_data.get('result', {}).get('photos'):
+                                    # Получаем file_id самого большого фото
+                                    photo = photos_data['result']['photos'][0][-1]
+                                    file_id = photo['file_id']
                                         
-                                        # Получаем file_path
-                                        file_url = f"https://api.telegram.org/bot{bot_token}/getFile"
-                                        async with session.get(file_url, params={"file_id": file_id}) as file_resp:
-                                            if file_resp.status == 200:
-                                                file_data = await file_resp.json()
-                                                if file_data.get('ok'):
-                                                    file_path = file_data['result']['file_path']
-                                                    photo_url = f"https://api.telegram.org/file/bot{bot_token}/{file_path}"
-                                                    print(f"📸 Фото профиля получено: {photo_url[:50]}...")
+                                    # Получаем file_path
+                                    file_url = f"https://api.telegram.org/bot{bot_token}/getFile"
+                                    async with session.get(file_url, params={"file_id": file_id}) as file_resp:
+                                        if file_resp.status == 200:
+                                            file_data = await file_resp.json()
+                                            if file_data.get('ok'):
+                                                file_path = file_data['result']['file_path']
+                                                photo_url = f"https://api.telegram.org/file/bot{bot_token}/{file_path}"
+                                                print(f"📸 Фото профиля получено: {photo_url[:50]}...")
                     except Exception as e:
                         print(f"⚠️ Не удалось получить фото профиля: {e}")
                     
@@ -674,8 +676,15 @@ Telegram ID: {user_id}
         print(f"Ошибка обработки обновления: {e}")
 
 
+# Пул воркеров: обновления одного чата / пользователя обрабатываются по порядку
+dispatcher = UpdateDispatcher(process_telegram_update, workers=TELEGRAM_UPDATE_WORKERS)
+
+
 async def telegram_polling():
-    """Polling для получения обновлений от Telegram"""
+    """
+    Long polling для получения обновлений от Telegram
+    Одна долгоживущая сессия, обработка — в пуле воркеров dispatcher
+    """
     global last_update_id
     
     if not bot_token:
@@ -683,45 +692,41 @@ async def telegram_polling():
         return
     
     print(f"🤖 Запуск Telegram polling с токеном: {bot_token[:20]}...")
+    url = f"https://api.telegram.org/bot{bot_token}/getUpdates"
     
     while True:
         try:
-            async with aiohttp.ClientSession() as session:
-                url = f"https://api.telegram.org/bot{bot_token}/getUpdates"
-                params = {
-                    "offset": last_update_id + 1,
-                    "timeout": 30
-                }
-                
-                print(f"🔄 Polling запрос: offset={last_update_id + 1}")
-                
-                async with session.get(url, params=params, timeout=aiohttp.ClientTimeout(total=35)) as resp:
-                    print(f"📡 Ответ от Telegram: status={resp.status}")
+            session = bot_manager.get_session()
+            params = {
+                "offset": last_update_id + 1,
+                "timeout": 30
+            }
+            
+            async with session.get(url, params=params, timeout=aiohttp.ClientTimeout(total=35)) as resp:
+                if resp.status == 200:
+                    data = await resp.json()
                     
-                    if resp.status == 200:
-                        data = await resp.json()
-                        print(f"📊 Ответ JSON: ok={data.get('ok')}, result_count={len(data.get('result', []))}")
-                        
-                        if data.get('ok'):
-                            updates = data.get('result', [])
-                            if updates:
-                                print(f"📨 Получено {len(updates)} обновлений")
-                            
-                            for update in updates:
-                                last_update_id = update['update_id']
-                                print(f"⚙️ Обработка обновления {update['update_id']} (offset будет {last_update_id + 1})")
-                                await process_telegram_update(update)
-                        else:
-                            print(f"❌ Ошибка от Telegram: {data.get('description', 'Unknown')}")
-                    elif resp.status == 409:
-                        error_data = await resp.json()
-                        print(f"❌ Conflict 409: {error_data.get('description', 'Unknown conflict')}")
-                        await asyncio.sleep(10)  # Ждём перед повтором
+                    if data.get('ok'):
+                        updates = data.get('result', [])
+                        if updates:
+                            print(f"📨 Получено {len(updates)} обновлений")
+                        
+                        for update in updates:
+                            last_update_id = update['update_id']
+                            await dispatcher.dispatch(update)
                     else:
-                        error_data = await resp.json()
-                        print(f"❌ Ошибка HTTP {resp.status}: {error_data.get('description', 'Unknown error')}")
-                        await asyncio.sleep(5)
+                        print(f"❌ Ошибка от Telegram: {data.get('description', 'Unknown')}")
+                elif resp.status == 409:
+                    error_data = await resp.json()
+                    print(f"❌ Conflict 409: {error_data.get('description', 'Unknown conflict')}")
+                    await asyncio.sleep(10)  # Ждём перед повтором
+                else:
+                    error_data = await resp.json()
+                    print(f"❌ Ошибка HTTP {resp.status}: {error_data.get('description', 'Unknown error')}")
+                    await asyncio.sleep(5)
         
+        except asyncio.CancelledError:
+            raise
         except asyncio.TimeoutError:
             print(f"⏱️ Timeout при polling (нормально)")
         except Exception as e:
@@ -737,14 +742,18 @@ async def start_polling():
     global polling_task
     
     if bot_token and admin_id:
+        dispatcher.start()
         polling_task = asyncio.create_task(telegram_polling())
         print("✅ Telegram polling запущен")
 
 
 async def stop_polling():
-    """Остановка polling"""
+    """Остановка polling: дообработать полученные обновления и закрыть сессию"""
     global polling_task
     
     if polling_task:
         polling_task.cancel()
+        polling_task = None
+        await dispatcher.stop()
+        await bot_manager.close()
         print("✅ Telegram polling остановлен")
@@ -5,7 +5,13 @@ router = APIRouter(prefix="/api/yahoo-proxy", tags=["yahoo-proxy"])
 
 from slowapi.util import get_remote_address
 from slowapi import Limiter
-limiter = Limiter(key_func=get_remote_address)
+from app.services import shared_state
+# Лимит общий для всех воркеров (Redis при SHARED_STATE_BACKEND=redis), как у лимитера в main
+limiter = Limiter(
+    key_func=get_remote_address,
+    storage_uri=shared_state.limiter_storage_uri(),
+    in_memory_fallback_enabled=True
+)
 
 @router.get("")
 @limiter.limit("1/minute")
@@ -0,0 +1,124 @@
+"""
+Плотная AI IV Surface: прогноз модели на сетке moneyness × время до экспирации
+ЗАЧЕМ: Фронтенд (useMLPredictor, useIVSurface) собирает карту IV по точкам —
+одна сетка за один инференс позволяет калькулятору интерполировать IV локально
+Затрагивает: /api/ai/iv-surface, AIPredictionService
+"""
+
+import logging
+from datetime import date
+from typing import Dict, Any, Tuple
+
+import numpy as np
+
+from app.services.ai_prediction_service import ai_service
+
+logger = logging.getLogger(__name__)
+
+# Шаг округления текущей IV для ключа кэша (0.5 пункта волатильности)
+# ЗАЧЕМ: Соседние значения IV дают практически одинаковую поверхность
+IV_BUCKET_STEP = 0.005
+
+# Максимум поверхностей в кэше процесса
+CACHE_MAX_ENTRIES = 256
+
+# Кэш поверхностей: ключ -> результат
+# Ключ содержит дату, поэтому поверхности автоматически устаревают на следующий день
+_surface_cache: Dict[Tuple, Dict[str, Any]] = {}
+
+
+def bucket_iv(current_iv: float) -> float:
+    """Округлить IV до шага бакета (не ниже одного шага)"""
+    bucket = round(round(current_iv / IV_BUCKET_STEP) * IV_BUCKET_STEP, 4)
+    return max(bucket, IV_BUCKET_STEP)
+
+
+def build_grid(moneyness_min: float, moneyness_max: float, moneyness_points: int,
+               ttm_min_days: float, ttm_max_days: float, ttm_points: int
+               ) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Узлы сетки: moneyness как K/S и время до экспирации в годах
+    """
+    moneyness = np.linspace(moneyness_min, moneyness_max, moneyness_points)
+    ttm = np.linspace(ttm_min_days, ttm_max_days, ttm_points) / 365.0
+    return moneyness, ttm
+
+
+def _store(key: Tuple, result: Dict[str, Any]) -> None:
+    """Сохранить поверхность, удалив записи прошлых дней и самые старые при переполнении"""
+    today = key[-1]
+    for stale_key in [k for k in _surface_cache if k[-1] != today]:
+        del _surface_cache[stale_key]
+
+    while len(_surface_cache) >= CACHE_MAX_ENTRIES:
+        # dict сохраняет порядок вставки — первый ключ самый старый
+        del _surface_cache[next(iter(_surface_cache))]
+
+    _surface_cache[key] = result
+
+
+async def get_iv_surface(ticker: str, option_type: str, current_iv: float,
+                         moneyness_min: float = 0.5, moneyness_max: float = 1.5,
+                         moneyness_points: int = 41, ttm_min_days: float = 1,
+                         ttm_max_days: float = 365, ttm_points: int = 20) -> Dict[str, Any]:
+    """
+    Получить AI IV Surface для тикера и типа опциона (с кэшированием на день)
+
+    Returns:
+        dict с полями moneyness (K/S), ttm (годы), shape [M, T] и iv —
+        плоский массив по строкам (индекс = i_moneyness * T + i_ttm)
+    """
+    ticker = ticker.upper()
+    type_name = 'CALL' if option_type.lower().startswith('c') else 'PUT'
+    iv_bucket = bucket_iv(current_iv)
+    today = date.today().isoformat()
+
+    key = (
+        ticker, type_name, iv_bucket,
+        moneyness_min, moneyness_max, moneyness_points,
+        ttm_min_days, ttm_max_days, ttm_points,
+        today
+    )
+
+    cached = _surface_cache.get(key)
+    if cached is not None:
+        return {**cached, "cached": True}
+
+    moneyness, ttm = build_grid(
+        moneyness_min, moneyness_max, moneyness_points,
+        ttm_min_days, ttm_max_days, ttm_points
+    )
+
+    # Модель принимает log(S/K), а сетка задана как K/S
+    surface = await ai_service.predict_iv_grid(
+        ticker=ticker,
+        type_str=type_name,
+        current_iv=iv_bucket,
+        moneyness_log=-np.log(moneyness),
+        ttm=ttm
+    )
+
+    used_ai = surface is not None
+    if not used_ai:
+        # Fallback — плоская поверхность с текущей IV
+        surface = np.full((moneyness_points, ttm_points), current_iv)
+
+    result = {
+        "ticker": ticker,
+        "type": type_name,
+        "iv_bucket": iv_bucket,
+        "date": today,
+        "used_ai": used_ai,
+        "moneyness": np.round(moneyness, 6).tolist(),
+        "ttm": np.round(ttm, 6).tolist(),
+        "shape": [moneyness_points, ttm_points],
+        "iv": np.round(surface.astype(np.float64).reshape(-1), 4).tolist(),
+    }
+
+    # Кэшируем только результат модели — fallback пересчитается, когда модель станет доступна
+    if used_ai:
+        _store(key, result)
+        logger.info(f"📊 AI IV surface {ticker} {type_name} iv={iv_bucket}: "
+                    f"{moneyness_points}×{ttm_points} points")
+
+    return {**result, "cached": False}
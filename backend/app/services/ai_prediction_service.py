@@ -1,8 +1,14 @@
-import onnxruntime as ort
 import numpy as np
 import os
+import time
+import asyncio
 import logging
-from typing import Optional, List
+from typing import Optional, List, Dict, Any, Tuple
+
+from app.services.onnx_session_factory import (
+    create_inference_session, INTRA_OP_THREADS, INTER_OP_THREADS
+)
+from app.services.prometheus_metrics import observe_onnx_inference
 
 # Настройка логгера
 logger = logging.getLogger(__name__)
@@ -22,9 +28,18 @@ X_STD = np.array([0.28651675423875517, 0.5812719472646916, 0.12222801581754388],
 Y_MEAN = 0.3901246440083509
 Y_STD = 0.21758850699903196
 
+# Размер фиктивного батча для прогрева сессии при старте
+WARMUP_BATCH_SIZE = int(os.getenv("AI_MODEL_WARMUP_BATCH", "256"))
+
 class AIPredictionService:
     _instance = None
     _session = None
+    _init_lock = None
+    # Состояние для /health
+    _load_time_ms = None
+    _warmup_time_ms = None
+    _loaded_from_cache = False
+    _load_error = None
     
     def __new__(cls):
         if cls._instance is None:
@@ -42,19 +57,78 @@ class AIPredictionService:
         if self._session is not None:
             return
 
-        try:
-            model_path = self._get_model_path()
-            if not os.path.exists(model_path):
-                logger.error(f"❌ Model file not found at: {model_path}")
+        # Lock создаётся лениво — внутри работающего event loop
+        if self._init_lock is None:
+            self._init_lock = asyncio.Lock()
+
+        async with self._init_lock:
+            # Сессию мог создать параллельный запрос, пока мы ждали lock
+            if self._session is not None:
                 return
 
-            # Создание сессии
-            # В python onnxruntime создание сессии синхронное, но быстрое
-            self._session = ort.InferenceSession(model_path)
-            logger.info("✅ AI Model loaded successfully")
-        except Exception as e:
-            logger.error(f"❌ Failed to load AI model: {e}")
-            self._session = None
+            try:
+                model_path = self._get_model_path()
+                if not os.path.exists(model_path):
+                    self._load_error = "Model file not found"
+                    logger.error(f"❌ Model file not found at: {model_path}")
+                    return
+
+                # Создание сессии в отдельном потоке, чтобы не блокировать event loop
+                start = time.perf_counter()
+                session, self._loaded_from_cache = await asyncio.to_thread(
+                    create_inference_session, model_path
+                )
+                self._load_time_ms = round((time.perf_counter() - start) * 1000, 2)
+                self._session = session
+                self._load_error = None
+                logger.info(
+                    f"✅ AI Model loaded successfully in {self._load_time_ms} ms "
+                    f"(cached graph: {self._loaded_from_cache})"
+                )
+            except Exception as e:
+                self._load_error = str(e)
+                logger.error(f"❌ Failed to load AI model: {e}")
+                self._session = None
+
+    async def warm_up(self):
+        """
+        Загрузка модели и прогон фиктивного батча
+        ЗАЧЕМ: Первый пользователь после деплоя не должен платить за загрузку модели
+        и первичную аллокацию памяти ORT. Вызывается при старте приложения.
+        """
+        await self.init_model()
+        if self._session is None:
+            return
+
+        scenarios = [
+            {
+                'ticker': TICKERS_LIST[i % len(TICKERS_LIST)],
+                'type': 'CALL' if i % 2 == 0 else 'PUT',
+                'stock_price': 100.0,
+                'strike': 80.0 + 40.0 * i / max(WARMUP_BATCH_SIZE - 1, 1),
+                'ttm': 0.25,
+                'current_iv': Y_MEAN
+            }
+            for i in range(max(WARMUP_BATCH_SIZE, 1))
+        ]
+
+        start = time.perf_counter()
+        await self.predict_iv_batch(scenarios)
+        self._warmup_time_ms = round((time.perf_counter() - start) * 1000, 2)
+        logger.info(f"🔥 AI Model warm-up ({len(scenarios)} rows) took {self._warmup_time_ms} ms")
+
+    def get_status(self) -> Dict[str, Any]:
+        """Статус модели для /health"""
+        return {
+            "ready": self._session is not None and self._warmup_time_ms is not None,
+            "loaded": self._session is not None,
+            "load_time_ms": self._load_time_ms,
+            "warmup_time_ms": self._warmup_time_ms,
+            "loaded_from_cache": self._loaded_from_cache,
+            "intra_op_threads": INTRA_OP_THREADS,
+            "inter_op_threads": INTER_OP_THREADS,
+            "error": self._load_error
+        }
 
     def is_ticker_supported(self, ticker: str) -> bool:
         """Проверка поддержки тикера моделью"""
@@ -78,60 +152,163 @@ class AIPredictionService:
         Returns:
             Предсказанная IV (десятичная дробь)
         """
-        # Если тикер не поддерживается или модель не загружена — возвращаем current_iv
-        if not self.is_ticker_supported(ticker):
-            return current_iv
+        results = await self.predict_iv_batch([{
+            'ticker': ticker,
+            'type': type_str,
+            'stock_price': stock_price,
+            'strike': strike,
+            'ttm': ttm,
+            'current_iv': current_iv
+        }])
+        return results[0]
+
+    async def predict_iv_batch(self, scenarios: List[Dict[str, Any]]) -> List[float]:
+        """
+        Пакетное прогнозирование IV: все сценарии за один вызов ONNX сессии.
+        ЗАЧЕМ: Калькулятор запрашивает IV для каждой ноги × цены × дня —
+        сотни HTTP запросов по одной строке заменяются одним инференсом.
+        
+        Args:
+            scenarios: Список словарей с ключами
+                ticker, type, stock_price, strike, ttm, current_iv
             
+        Returns:
+            Список предсказанных IV в том же порядке, что и scenarios.
+            Для неподдерживаемых тикеров и некорректных строк — current_iv.
+        """
+        results, _ = await self.predict_iv_batch_with_source(scenarios)
+        return results
+
+    async def predict_iv_batch_with_source(
+        self, scenarios: List[Dict[str, Any]]
+    ) -> Tuple[List[float], List[bool]]:
+        """
+        То же, что predict_iv_batch, плюс признак для каждой строки: посчитана ли IV моделью
+        ЗАЧЕМ: Без сессии ONNX (модель не загрузилась) или при ошибке инференса
+        возвращается current_iv — эндпоинт не должен отдавать used_ai=true
+        
+        Returns:
+            (IV по сценариям, used_ai по сценариям)
+        """
+        # Fallback по умолчанию — текущая IV каждого сценария
+        results = [float(s['current_iv']) for s in scenarios]
+        used_ai = [False] * len(scenarios)
+        if not scenarios:
+            return results, used_ai
+
+        # Отбираем строки, которые может обработать модель
+        valid_rows = [
+            i for i, s in enumerate(scenarios)
+            if self.is_ticker_supported(s['ticker'])
+            and s['strike'] > 0 and s['stock_price'] > 0
+        ]
+        if not valid_rows:
+            return results, used_ai
+
         if self._session is None:
             await self.init_model()
             if self._session is None:
-                return current_iv
+                return results, used_ai
 
         try:
-            # Подготовка индексов
-            ticker_idx = TICKERS_LIST.index(ticker.upper())
-            # 0=Call, 1=Put (как в JS версии: startsWith('c') ? 0 : 1)
-            type_idx = 0 if type_str.lower().startswith('c') else 1
-
-            # Логарифм moneyness
-            # Защита от деления на ноль
-            if strike <= 0 or stock_price <= 0:
-                return current_iv
-            moneyness_log = np.log(stock_price / strike)
-
-            # Вектор признаков: [moneyness_log, ttm, current_iv]
-            raw_cont = np.array([moneyness_log, ttm, current_iv], dtype=np.float32)
-
-            # Масштабирование (StandardScaler)
-            # (val - mean) / std
-            scaled_cont = (raw_cont - X_MEAN) / X_STD
-
-            # Формирование входных данных для ONNX
-            # Входы: ticker_idx (int64[1]), type_idx (int64[1]), continuous_features (float32[1, 3])
-            
-            inputs = {
-                'ticker_idx': np.array([ticker_idx], dtype=np.int64),
-                'type_idx': np.array([type_idx], dtype=np.int64),
-                'continuous_features': scaled_cont.reshape(1, 3).astype(np.float32)
-            }
+            rows = [scenarios[i] for i in valid_rows]
+            stock_price = np.array([r['stock_price'] for r in rows], dtype=np.float64)
+            strike = np.array([r['strike'] for r in rows], dtype=np.float64)
+
+            final_iv = self._run_inference(
+                ticker_idx=np.array([TICKERS_LIST.index(r['ticker'].upper()) for r in rows], dtype=np.int64),
+                type_idx=np.array([self._type_index(r['type']) for r in rows], dtype=np.int64),
+                moneyness_log=np.log(stock_price / strike),
+                ttm=np.array([r['ttm'] for r in rows], dtype=np.float64),
+                current_iv=np.array([r['current_iv'] for r in rows], dtype=np.float64)
+            )
+
+            for row, iv in zip(valid_rows, final_iv):
+                results[row] = float(iv)
+                used_ai[row] = True
+            return results, used_ai
 
-            # Инференс
-            outputs = self._session.run(None, inputs)
+        except Exception as e:
+            logger.error(f"AI Inference error: {e}")
+            return results, used_ai
+
+    async def predict_iv_grid(self, ticker: str, type_str: str, current_iv: float,
+                              moneyness_log: np.ndarray, ttm: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Прогноз IV на всей сетке log-moneyness × время до экспирации за один вызов модели.
+        ЗАЧЕМ: Калькулятор интерполирует IV локально вместо запросов по точкам.
+        
+        Args:
+            moneyness_log: Узлы log(S/K), длина M
+            ttm: Узлы времени до экспирации в годах, длина T
             
-            # Получаем предсказанное масштабированное значение
-            # output name usually 'predicted_iv' or similar, but run(None) returns list of outputs
-            predicted_scaled = outputs[0][0] # Assuming first output, first element
+        Returns:
+            Матрица IV формы [M, T] или None, если тикер не поддерживается / модель недоступна
+        """
+        if not self.is_ticker_supported(ticker):
+            return None
 
-            # Обратное масштабирование
-            final_iv = (predicted_scaled * Y_STD) + Y_MEAN
+        if self._session is None:
+            await self.init_model()
+            if self._session is None:
+                return None
+
+        try:
+            m_mesh, t_mesh = np.meshgrid(moneyness_log, ttm, indexing='ij')
+            size = m_mesh.size
 
-            # Ограничители (Sanity Check)
-            # IV не может быть меньше 1% и больше 300% (как в JS)
-            return float(max(0.01, min(3.0, final_iv)))
+            final_iv = self._run_inference(
+                ticker_idx=np.full(size, TICKERS_LIST.index(ticker.upper()), dtype=np.int64),
+                type_idx=np.full(size, self._type_index(type_str), dtype=np.int64),
+                moneyness_log=m_mesh.reshape(-1),
+                ttm=t_mesh.reshape(-1),
+                current_iv=np.full(size, current_iv, dtype=np.float64)
+            )
+            return final_iv.reshape(m_mesh.shape)
 
         except Exception as e:
             logger.error(f"AI Inference error: {e}")
-            return current_iv
+            return None
+
+    @staticmethod
+    def _type_index(type_str: str) -> int:
+        """0=Call, 1=Put (как в JS версии: startsWith('c') ? 0 : 1)"""
+        return 0 if type_str.lower().startswith('c') else 1
+
+    def _run_inference(self, ticker_idx: np.ndarray, type_idx: np.ndarray,
+                       moneyness_log: np.ndarray, ttm: np.ndarray,
+                       current_iv: np.ndarray) -> np.ndarray:
+        """
+        Один вызов ONNX сессии для N строк признаков.
+        Входы: ticker_idx (int64[N]), type_idx (int64[N]), continuous_features (float32[N, 3])
+        
+        Returns:
+            Массив IV длины N (после обратного масштабирования и ограничителей)
+        """
+        # Вектор признаков: [moneyness_log, ttm, current_iv]
+        raw_cont = np.column_stack([moneyness_log, ttm, current_iv]).astype(np.float32)
+
+        # Масштабирование (StandardScaler)
+        # (val - mean) / std
+        scaled_cont = (raw_cont - X_MEAN) / X_STD
+
+        inputs = {
+            'ticker_idx': ticker_idx,
+            'type_idx': type_idx,
+            'continuous_features': scaled_cont.astype(np.float32)
+        }
+
+        # Инференс — один вызов на весь батч
+        started = time.perf_counter()
+        outputs = self._session.run(None, inputs)
+        observe_onnx_inference(len(ticker_idx), time.perf_counter() - started)
+
+        # Выход модели: [N, 1] масштабированных значений
+        predicted_scaled = np.asarray(outputs[0], dtype=np.float32).reshape(-1)
+
+        # Обратное масштабирование и ограничители (Sanity Check)
+        # IV не может быть меньше 1% и больше 300% (как в JS)
+        return np.clip(predicted_scaled * Y_STD + Y_MEAN, 0.01, 3.0)
 
 # Глобальный экземпляр
 ai_service = AIPredictionService()
@@ -0,0 +1,120 @@
+"""
+Постраничная выдача истории анализов
+ЗАЧЕМ: Список истории отдаёт только лёгкие поля (без stock_data, metrics и полного
+текста анализа) и листается курсором (created_at, id) — страница стоит одинаково
+на любой глубине, а детали загружаются отдельно через /api/analysis/{id}
+Затрагивает: /api/analysis/history, модель AnalysisHistory
+"""
+
+import base64
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple, Union
+
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session
+
+from app.models.analysis_history import SQLITE_SORT_KEY, AnalysisHistory
+
+# Длина превью текста анализа в списке
+PREVIEW_LENGTH = 200
+MAX_PAGE_SIZE = 100
+
+
+# SQLite хранит TIMESTAMP строкой: server_default пишет 'YYYY-MM-DD HH:MM:SS',
+# а SQLAlchemy биндит datetime с микросекундами — прямое сравнение с курсором
+# не находит записи той же секунды. На SQLite сортируем и сравниваем по
+# нормализованной строке (SQLITE_SORT_KEY, есть индекс), в курсор кладём её же
+CursorValue = Union[datetime, str]
+
+
+def encode_cursor(created_at: CursorValue, analysis_id: str) -> str:
+    """Курсор следующей страницы: позиция последней выданной записи"""
+    value = created_at.isoformat() if isinstance(created_at, datetime) else created_at
+    raw = f"{value}|{analysis_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str, as_text: bool = False) -> Tuple[CursorValue, str]:
+    """
+    Разобрать курсор; ValueError при некорректном значении
+    as_text=True — дата строкой как в курсоре (сравнение с нормализованной строкой SQLite)
+    """
+    try:
+        created_at, analysis_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        parsed = datetime.fromisoformat(created_at)
+        return (created_at if as_text else parsed), analysis_id
+    except Exception:
+        raise ValueError("Некорректный курсор")
+
+
+def get_history_page(
+    db: Session,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    ticker: Optional[str] = None,
+    offset: int = 0
+) -> Dict[str, Any]:
+    """
+    Страница истории (новые первые)
+
+    Args:
+        limit: Размер страницы (не больше MAX_PAGE_SIZE)
+        cursor: next_cursor предыдущей страницы
+        ticker: Фильтр по тикеру (индекс ticker, created_at)
+        offset: Устаревшая пагинация, учитывается только без курсора
+
+    Returns:
+        {"data": [...краткие записи...], "count": int, "next_cursor": str | None}
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    is_sqlite = db.get_bind().dialect.name == "sqlite"
+    sort_key = SQLITE_SORT_KEY if is_sqlite else AnalysisHistory.created_at
+
+    query = db.query(
+        AnalysisHistory.id,
+        AnalysisHistory.ticker,
+        AnalysisHistory.created_at,
+        AnalysisHistory.ai_model,
+        AnalysisHistory.ai_provider,
+        AnalysisHistory.execution_time_ms,
+        func.substr(AnalysisHistory.ai_analysis, 1, PREVIEW_LENGTH).label("preview"),
+        sort_key.label("sort_key")
+    )
+
+    if ticker:
+        query = query.filter(AnalysisHistory.ticker == ticker.upper())
+
+    if cursor:
+        cursor_created_at, cursor_id = decode_cursor(cursor, as_text=is_sqlite)
+        # Внешнее условие sort_key <= курсор — диапазон по индексу: страница начинается
+        # поиском позиции, а не обходом индекса от начала
+        query = query.filter(and_(
+            sort_key <= cursor_created_at,
+            or_(sort_key < cursor_created_at, AnalysisHistory.id < cursor_id)
+        ))
+    elif offset:
+        query = query.offset(offset)
+
+    # id — вторичный ключ сортировки, чтобы записи с одинаковой датой не терялись между страницами
+    rows = query.order_by(
+        sort_key.desc(), AnalysisHistory.id.desc()
+    ).limit(limit + 1).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    data = [{
+        "id": str(row.id),
+        "ticker": row.ticker,
+        "created_at": row.created_at.isoformat() if row.created_at else None,
+        "ai_model": row.ai_model,
+        "ai_provider": row.ai_provider,
+        "execution_time_ms": row.execution_time_ms,
+        "preview": row.preview
+    } for row in rows]
+
+    next_cursor = None
+    if has_more and rows[-1].sort_key is not None:
+        next_cursor = encode_cursor(rows[-1].sort_key, rows[-1].id)
+
+    return {"data": data, "count": len(data), "next_cursor": next_cursor}
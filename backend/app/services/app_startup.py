@@ -0,0 +1,145 @@
+"""
+Запуск приложения: проверки БД и Redis в lifespan, замеры фаз старта
+ЗАЧЕМ: Импорт app.main выполнял init_db() и блокирующий ping Redis, а прогрев
+модели задерживал приём запросов — рестарт под PM2 и новые воркеры поднимались
+секундами. Теперь импорт только регистрирует маршруты, проверки БД и Redis идут
+параллельно в startup, а длительность каждой фазы пишется в лог и в /health
+Затрагивает: main (startup_event, redis_client, /health), database.init_db, shared_state,
+crypto_snapshot_store, ai_prediction_service.warm_up
+
+STARTUP_MODE:
+    lazy  — прогрев ONNX модели в фоне, воркер принимает запросы сразу (по умолчанию);
+            /health отвечает 503 "starting", пока прогрев не завершён, — балансировщик
+            и health check PM2 не шлют трафик на холодный воркер
+    eager — прогрев до приёма запросов (первый запрос не ждёт модель)
+"""
+
+import asyncio
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+STARTUP_MODE = os.getenv("STARTUP_MODE", "lazy").lower()
+
+# Фаза -> длительность, мс (в порядке завершения)
+timings: Dict[str, float] = {}
+# Фоновые задачи старта (ссылки, чтобы их не собрал GC)
+_background_tasks: set = set()
+# Прогрев модели завершён (успешно или с ошибкой — тогда работает fallback на текущую IV)
+_warmup_finished = False
+
+
+@contextmanager
+def phase(name: str):
+    """Замерить фазу старта"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = round((time.perf_counter() - started) * 1000, 1)
+
+
+def record(name: str, started: float) -> None:
+    """Записать фазу, начатую в started (perf_counter), — для фаз вне одного блока"""
+    timings[name] = round((time.perf_counter() - started) * 1000, 1)
+
+
+# Аренда переноса снимков: дольше самого переноса, отпускается сразу после него
+BACKFILL_LEASE_SECONDS = 600
+
+
+def init_database() -> None:
+    """Создание таблиц и перенос снимков криптовалют старого формата"""
+    from app.database import SessionLocal, init_db
+    from app.services.crypto_snapshot_store import backfill_legacy_snapshots
+    from app.services.scheduler_lease import LeaseLock
+
+    with phase("db"):
+        try:
+            init_db()
+            print("✅ Database initialized")
+        except Exception as e:
+            print(f"⚠️ Database initialization failed: {e}")
+            return
+
+        # Перенос выполняет один воркер — остальные не дублируют записи позиций
+        lease = LeaseLock("crypto_snapshot_backfill", ttl_seconds=BACKFILL_LEASE_SECONDS)
+        if not lease.acquire():
+            logger.info("Crypto snapshot backfill: выполняет другой воркер")
+            return
+        try:
+            with SessionLocal() as db:
+                backfill_legacy_snapshots(db)
+        except Exception as e:
+            print(f"⚠️ Crypto snapshot backfill failed: {e}")
+        finally:
+            lease.release()
+
+
+def connect_redis():
+    """
+    Выбор бэкенда общего состояния (SHARED_STATE_BACKEND) с проверкой Redis
+    Returns: Redis клиент или None, если кэши в памяти процесса
+    """
+    from app.services import shared_state
+
+    with phase("redis"):
+        shared_state.get_backend()
+        client = shared_state.redis_client()
+        if client is not None:
+            print("✅ Redis подключен")
+        return client
+
+
+async def run_probes():
+    """
+    БД и Redis параллельно в потоках — старт ждёт самую долгую проверку, а не сумму
+
+    Returns:
+        Redis клиент или None
+    """
+    with phase("probes"):
+        _, redis_client = await asyncio.gather(
+            asyncio.to_thread(init_database),
+            asyncio.to_thread(connect_redis)
+        )
+    return redis_client
+
+
+async def _warm_up_model() -> None:
+    global _warmup_finished
+    from app.services.ai_prediction_service import ai_service
+
+    started = time.perf_counter()
+    try:
+        await ai_service.warm_up()
+    except Exception as e:
+        print(f"⚠️ AI model warm-up failed: {e}")
+    record("ai_warmup", started)
+    _warmup_finished = True
+
+
+def is_ready() -> bool:
+    """Воркер готов к трафику: прогрев модели завершён (в lazy — фоновая задача)"""
+    return _warmup_finished
+
+
+async def warm_up_model() -> None:
+    """Прогрев ONNX модели: сразу (eager) или фоновой задачей (lazy)"""
+    if STARTUP_MODE == "eager":
+        await _warm_up_model()
+        return
+    task = asyncio.create_task(_warm_up_model())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+def report(total_started: float) -> None:
+    """Итог старта в лог (фоновые фазы дописываются в timings по завершении)"""
+    record("startup_total", total_started)
+    phases = ", ".join(f"{name}={ms:.0f}ms" for name, ms in timings.items())
+    logger.info("🚀 Startup (%s): %s", STARTUP_MODE, phases, extra={"startup": dict(timings)})
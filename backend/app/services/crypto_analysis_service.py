@@ -10,7 +10,7 @@ from sqlalchemy.orm import Session
 from datetime import datetime
 
 from app.models.crypto_rating import CryptoSnapshot, CryptoAnalysis
-from app.services.coinmarketcap_service import coinmarketcap_service
+from app.services import crypto_snapshot_store
 
 logger = logging.getLogger(__name__)
 
@@ -34,17 +34,20 @@ class CryptoAnalysisService:
         try:
             logger.info("Creating new crypto snapshot...")
             
-            # Получаем данные с CoinMarketCap
+            # Получаем данные с CoinMarketCap (клиент создаётся при первом снимке, не при импорте)
+            from app.services.coinmarketcap_service import coinmarketcap_service
             crypto_list = coinmarketcap_service.fetch_top_400_cryptos()
             
-            # Создаем снимок в БД
+            # Создаем снимок в БД; состав пишется в таблицу позиций, а не JSON копией
             snapshot = CryptoSnapshot(
-                crypto_list=crypto_list,
+                crypto_list=[],
                 task_id=task_id,
                 created_at=datetime.utcnow()
             )
             
             db.add(snapshot)
+            db.flush()
+            crypto_snapshot_store.save_snapshot_ranks(db, snapshot, crypto_list)
             db.commit()
             db.refresh(snapshot)
             
@@ -58,36 +61,24 @@ class CryptoAnalysisService:
     
     def compare_snapshots(
         self, 
-        first_snapshot: CryptoSnapshot, 
-        second_snapshot: CryptoSnapshot
+        db: Session,
+        first_snapshot_id: int, 
+        second_snapshot_id: int
     ) -> Tuple[List[Dict], List[Dict]]:
         """
-        Сравнить два снимка и найти различия
+        Сравнить два снимка и найти различия (SQL запрос по таблице позиций)
         
         Args:
-            first_snapshot: Первый снимок
-            second_snapshot: Второй снимок
+            db: Сессия БД
+            first_snapshot_id: ID первого снимка
+            second_snapshot_id: ID второго снимка
             
         Returns:
             Tuple[List[Dict], List[Dict]]: (выпавшие из топа, вошедшие в топ)
         """
-        # Создаем множества символов для быстрого поиска
-        first_symbols = {crypto['symbol'] for crypto in first_snapshot.crypto_list}
-        second_symbols = {crypto['symbol'] for crypto in second_snapshot.crypto_list}
-        
-        # Находим выпавшие (были в первом, нет во втором)
-        dropped_symbols = first_symbols - second_symbols
-        dropped_cryptos = [
-            crypto for crypto in first_snapshot.crypto_list 
-            if crypto['symbol'] in dropped_symbols
-        ]
-        
-        # Находим вошедшие (не было в первом, есть во втором)
-        added_symbols = second_symbols - first_symbols
-        added_cryptos = [
-            crypto for crypto in second_snapshot.crypto_list 
-            if crypto['symbol'] in added_symbols
-        ]
+        dropped_cryptos, added_cryptos = crypto_snapshot_store.diff_snapshots(
+            db, first_snapshot_id, second_snapshot_id
+        )
         
         logger.info(f"Comparison: {len(dropped_cryptos)} dropped, {len(added_cryptos)} added")
         
@@ -115,22 +106,19 @@ class CryptoAnalysisService:
         try:
             logger.info(f"Creating analysis for snapshots {first_snapshot_id} and {second_snapshot_id}")
             
-            # Получаем снимки
-            first_snapshot = db.query(CryptoSnapshot).filter(
-                CryptoSnapshot.id == first_snapshot_id
-            ).first()
-            
-            second_snapshot = db.query(CryptoSnapshot).filter(
-                CryptoSnapshot.id == second_snapshot_id
-            ).first()
+            # Проверяем, что оба снимка существуют
+            found = db.query(CryptoSnapshot.id).filter(
+                CryptoSnapshot.id.in_([first_snapshot_id, second_snapshot_id])
+            ).count()
             
-            if not first_snapshot or not second_snapshot:
+            if found < len({first_snapshot_id, second_snapshot_id}):
                 raise ValueError("Snapshot not found")
             
             # Сравниваем снимки
             dropped_cryptos, added_cryptos = self.compare_snapshots(
-                first_snapshot, 
-                second_snapshot
+                db,
+                first_snapshot_id, 
+                second_snapshot_id
             )
             
             # Создаем анализ
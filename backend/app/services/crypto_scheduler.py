@@ -1,7 +1,11 @@
 """
 Планировщик задач для мониторинга криптовалют
 ЗАЧЕМ: Циклический сбор данных по расписанию
-Затрагивает: APScheduler, модели БД, email уведомления
+Затрагивает: APScheduler, модели БД, email уведомления, scheduler_lease
+
+Режимы (CRYPTO_SCHEDULER_MODE):
+- local — задачи в памяти процесса (только для одного воркера)
+- distributed — задачи в БД, выполняет один воркер-владелец аренды
 """
 
 import logging
@@ -18,9 +22,13 @@ from app.database import SessionLocal
 from app.models.crypto_rating import CryptoScheduledTask, CryptoSnapshot
 from app.services.crypto_analysis_service import crypto_analysis_service
 from app.services.email_service import email_service
+from app.services.scheduler_lease import create_leader_scheduler
 
 logger = logging.getLogger(__name__)
 
+SCHEDULER_MODE = os.getenv("CRYPTO_SCHEDULER_MODE", "local")
+LEASE_TTL_SECONDS = int(os.getenv("CRYPTO_SCHEDULER_LEASE_TTL", "60"))
+
 
 class CryptoScheduler:
     """
@@ -28,9 +36,17 @@ class CryptoScheduler:
     """
     
     def __init__(self):
-        self.scheduler = BackgroundScheduler()
-        self.scheduler.start()
-        logger.info("CryptoScheduler initialized")
+        self.elector = None
+        if SCHEDULER_MODE == "distributed":
+            self.scheduler, self.elector = create_leader_scheduler("crypto_scheduler", LEASE_TTL_SECONDS)
+        else:
+            self.scheduler = BackgroundScheduler()
+            self.scheduler.start()
+        logger.info(f"CryptoScheduler initialized ({SCHEDULER_MODE} mode)")
+    
+    def _can_run(self) -> bool:
+        """Задачу выполняет только владелец аренды (защита от двойного запуска при смене лидера)"""
+        return self.elector is None or self.elector.lock.is_held()
     
     def create_monitoring_task(
         self,
@@ -115,7 +131,7 @@ class CryptoScheduler:
             
             # Добавляем задачу в планировщик
             job = self.scheduler.add_job(
-                func=self._execute_first_snapshot,
+                func=run_first_snapshot,
                 trigger=trigger,
                 args=[task.id],
                 id=f"first_snapshot_{task.id}",
@@ -136,6 +152,9 @@ class CryptoScheduler:
         """
         Выполнить первый снимок
         """
+        if not self._can_run():
+            logger.warning(f"Skipping first snapshot for task {task_id}: scheduler lease not held")
+            return
         db = SessionLocal()
         try:
             logger.info(f"Executing first snapshot for task {task_id}")
@@ -176,7 +195,7 @@ class CryptoScheduler:
             
             # Добавляем задачу
             job = self.scheduler.add_job(
-                func=self._execute_second_snapshot,
+                func=run_second_snapshot,
                 trigger=trigger,
                 args=[task.id, first_snapshot_id],
                 id=f"second_snapshot_{task.id}_{first_snapshot_id}",
@@ -193,6 +212,9 @@ class CryptoScheduler:
         """
         Выполнить второй снимок и создать анализ
         """
+        if not self._can_run():
+            logger.warning(f"Skipping second snapshot for task {task_id}: scheduler lease not held")
+            return
         db = SessionLocal()
         try:
             logger.info(f"Executing second snapshot for task {task_id}")
@@ -252,6 +274,9 @@ class CryptoScheduler:
             ).all()
             
             for task in active_tasks:
+                # В распределённом режиме задачи уже в общем job store
+                if self.scheduler.get_job(f"first_snapshot_{task.id}"):
+                    continue
                 try:
                     self._schedule_first_snapshot(task, db)
                     logger.info(f"Restored task {task.id}")
@@ -295,9 +320,20 @@ class CryptoScheduler:
         """
         Остановить планировщик
         """
+        if self.elector:
+            self.elector.stop()
         self.scheduler.shutdown()
         logger.info("CryptoScheduler shut down")
 
 
+# Функции задач на уровне модуля — job store в БД хранит ссылку на функцию по имени
+def run_first_snapshot(task_id: int):
+    crypto_scheduler._execute_first_snapshot(task_id)
+
+
+def run_second_snapshot(task_id: int, first_snapshot_id: int):
+    crypto_scheduler._execute_second_snapshot(task_id, first_snapshot_id)
+
+
 # Singleton instance
 crypto_scheduler = CryptoScheduler()
@@ -0,0 +1,225 @@
+"""
+Хранилище состава снимков криптовалют в виде таблицы позиций
+ЗАЧЕМ: Снимок — это 400 строк (snapshot_id, symbol, rank) вместо JSON копии списка;
+сравнение снимков, история входа/выхода тикера и списки снимков считаются
+индексными SQL запросами, а не загрузкой и разбором JSON в Python
+Затрагивает: crypto_analysis_service, /api/crypto-rating/*, модели crypto_rating
+"""
+
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+
+from app.models.crypto_rating import (
+    CryptoAsset,
+    CryptoMembershipPeriod,
+    CryptoSnapshot,
+    CryptoSnapshotRank,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _dedupe(crypto_list: List[Dict]) -> List[Dict]:
+    """
+    Убрать повторяющиеся символы (у CoinMarketCap бывают одинаковые тикеры)
+    Остаётся первое вхождение — с лучшим рангом
+    """
+    seen = set()
+    result = []
+    for crypto in crypto_list:
+        if crypto['symbol'] not in seen:
+            seen.add(crypto['symbol'])
+            result.append(crypto)
+    return result
+
+
+def _previous_snapshot_id(db: Session, snapshot: CryptoSnapshot) -> Optional[int]:
+    """ID предыдущего снимка по времени создания"""
+    row = db.query(CryptoSnapshot.id).filter(
+        CryptoSnapshot.id != snapshot.id,
+        CryptoSnapshot.created_at <= snapshot.created_at
+    ).order_by(CryptoSnapshot.created_at.desc(), CryptoSnapshot.id.desc()).first()
+    return row[0] if row else None
+
+
+def _snapshot_symbols(db: Session, snapshot_id: int) -> set:
+    rows = db.query(CryptoSnapshotRank.symbol).filter(CryptoSnapshotRank.snapshot_id == snapshot_id)
+    return {row[0] for row in rows}
+
+
+def save_snapshot_ranks(db: Session, snapshot: CryptoSnapshot, crypto_list: List[Dict]) -> int:
+    """
+    Записать состав снимка и обновить периоды членства (без commit)
+
+    Args:
+        snapshot: Снимок, уже добавленный в сессию (нужен id)
+        crypto_list: Список [{"symbol", "name"}] в порядке рейтинга
+
+    Returns:
+        Количество записанных позиций
+    """
+    crypto_list = _dedupe(crypto_list)
+    symbols = [crypto['symbol'] for crypto in crypto_list]
+
+    # Справочник названий: добавляем новые, обновляем переименованные
+    assets = {
+        asset.symbol: asset
+        for asset in db.query(CryptoAsset).filter(CryptoAsset.symbol.in_(symbols))
+    }
+    for crypto in crypto_list:
+        asset = assets.get(crypto['symbol'])
+        if asset is None:
+            db.add(CryptoAsset(symbol=crypto['symbol'], name=crypto['name']))
+        elif asset.name != crypto['name']:
+            asset.name = crypto['name']
+
+    if crypto_list:
+        db.execute(insert(CryptoSnapshotRank), [
+            {"snapshot_id": snapshot.id, "symbol": symbol, "rank": rank}
+            for rank, symbol in enumerate(symbols, start=1)
+        ])
+
+    # Периоды членства: дельта относительно предыдущего снимка
+    previous_id = _previous_snapshot_id(db, snapshot)
+    previous_symbols = _snapshot_symbols(db, previous_id) if previous_id else set()
+    current_symbols = set(symbols)
+
+    for symbol in current_symbols - previous_symbols:
+        db.add(CryptoMembershipPeriod(symbol=symbol, entered_snapshot_id=snapshot.id))
+
+    dropped = previous_symbols - current_symbols
+    if dropped:
+        db.query(CryptoMembershipPeriod).filter(
+            CryptoMembershipPeriod.symbol.in_(dropped),
+            CryptoMembershipPeriod.left_snapshot_id.is_(None)
+        ).update({CryptoMembershipPeriod.left_snapshot_id: snapshot.id}, synchronize_session=False)
+
+    return len(symbols)
+
+
+def get_snapshot_items(db: Session, snapshot_id: int) -> List[Dict]:
+    """Состав снимка в порядке рейтинга: [{"symbol", "name"}]"""
+    rows = db.query(CryptoSnapshotRank.symbol, CryptoAsset.name).join(
+        CryptoAsset, CryptoAsset.symbol == CryptoSnapshotRank.symbol
+    ).filter(
+        CryptoSnapshotRank.snapshot_id == snapshot_id
+    ).order_by(CryptoSnapshotRank.rank)
+    return [{"symbol": symbol, "name": name} for symbol, name in rows]
+
+
+def get_snapshot_counts(db: Session, snapshot_ids: Optional[List[int]] = None) -> Dict[int, int]:
+    """Количество криптовалют по снимкам одним GROUP BY запросом"""
+    query = db.query(CryptoSnapshotRank.snapshot_id, func.count())
+    if snapshot_ids is not None:
+        query = query.filter(CryptoSnapshotRank.snapshot_id.in_(snapshot_ids))
+    return dict(query.group_by(CryptoSnapshotRank.snapshot_id).all())
+
+
+def _missing_in(db: Session, source_id: int, target_id: int) -> List[Dict]:
+    """Криптовалюты снимка source_id, которых нет в target_id (в порядке рейтинга source)"""
+    target = db.query(CryptoSnapshotRank.symbol).filter(
+        CryptoSnapshotRank.snapshot_id == target_id
+    )
+    rows = db.query(CryptoSnapshotRank.symbol, CryptoAsset.name).join(
+        CryptoAsset, CryptoAsset.symbol == CryptoSnapshotRank.symbol
+    ).filter(
+        CryptoSnapshotRank.snapshot_id == source_id,
+        CryptoSnapshotRank.symbol.notin_(target)
+    ).order_by(CryptoSnapshotRank.rank)
+    return [{"symbol": symbol, "name": name} for symbol, name in rows]
+
+
+def diff_snapshots(db: Session, first_id: int, second_id: int) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Сравнить два снимка
+
+    Returns:
+        (выпавшие из топа, вошедшие в топ)
+    """
+    return _missing_in(db, first_id, second_id), _missing_in(db, second_id, first_id)
+
+
+def get_symbol_history(db: Session, symbol: str) -> List[Dict]:
+    """
+    Когда криптовалюта входила в топ и выпадала из него
+
+    Returns:
+        [{"entered_snapshot_id", "entered_at", "left_snapshot_id", "left_at"}] по времени
+    """
+    periods = db.query(CryptoMembershipPeriod).filter(
+        CryptoMembershipPeriod.symbol == symbol
+    ).order_by(CryptoMembershipPeriod.entered_snapshot_id).all()
+
+    snapshot_ids = {p.entered_snapshot_id for p in periods} | {p.left_snapshot_id for p in periods if p.left_snapshot_id}
+    dates = dict(
+        db.query(CryptoSnapshot.id, CryptoSnapshot.created_at).filter(CryptoSnapshot.id.in_(snapshot_ids))
+    ) if snapshot_ids else {}
+
+    return [{
+        "entered_snapshot_id": p.entered_snapshot_id,
+        "entered_at": dates.get(p.entered_snapshot_id),
+        "left_snapshot_id": p.left_snapshot_id,
+        "left_at": dates.get(p.left_snapshot_id)
+    } for p in periods]
+
+
+def rebuild_membership(db: Session) -> None:
+    """
+    Пересчитать периоды членства по всем снимкам (без commit)
+    ЗАЧЕМ: После удаления снимка или переноса старых данных
+    """
+    db.query(CryptoMembershipPeriod).delete(synchronize_session=False)
+
+    snapshot_ids = [row[0] for row in db.query(CryptoSnapshot.id).order_by(
+        CryptoSnapshot.created_at, CryptoSnapshot.id
+    )]
+    open_periods: Dict[str, CryptoMembershipPeriod] = {}
+    for snapshot_id in snapshot_ids:
+        current = _snapshot_symbols(db, snapshot_id)
+        for symbol in current - open_periods.keys():
+            period = CryptoMembershipPeriod(symbol=symbol, entered_snapshot_id=snapshot_id)
+            db.add(period)
+            open_periods[symbol] = period
+        for symbol in open_periods.keys() - current:
+            open_periods.pop(symbol).left_snapshot_id = snapshot_id
+
+
+def delete_snapshot(db: Session, snapshot: CryptoSnapshot) -> None:
+    """
+    Удалить снимок вместе с составом (без commit)
+    Периоды членства ссылаются на снимок — пересчитываются без него
+    """
+    db.query(CryptoMembershipPeriod).delete(synchronize_session=False)
+    db.delete(snapshot)
+    db.flush()
+    rebuild_membership(db)
+
+
+def backfill_legacy_snapshots(db: Session) -> int:
+    """
+    Перенести снимки старого формата (JSON список) в таблицу позиций
+    JSON колонка после переноса очищается
+
+    Returns:
+        Количество перенесённых снимков
+    """
+    legacy = db.query(CryptoSnapshot).filter(
+        ~CryptoSnapshot.ranks.any()
+    ).order_by(CryptoSnapshot.created_at, CryptoSnapshot.id).all()
+    legacy = [s for s in legacy if s.crypto_list]
+    if not legacy:
+        return 0
+
+    for snapshot in legacy:
+        save_snapshot_ranks(db, snapshot, snapshot.crypto_list)
+        snapshot.crypto_list = []
+        db.flush()
+
+    # Снимки переносились не обязательно по порядку относительно уже новых — пересчёт
+    rebuild_membership(db)
+    db.commit()
+    logger.info(f"Migrated {len(legacy)} legacy crypto snapshots to rank table")
+    return len(legacy)
@@ -0,0 +1,177 @@
+"""
+Траектории рангов криптовалют по серии снимков
+ЗАЧЕМ: Вместо попарных сравнений двух снимков — одна матрица рангов
+(снимок × символ), по которой векторно считаются входы/выходы из топа,
+изменение ранга и скорость движения для всех символов сразу
+Затрагивает: crypto_snapshot_store (таблица позиций), /api/crypto-rating/trajectories
+"""
+
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.models.crypto_rating import CryptoAsset, CryptoSnapshot, CryptoSnapshotRank
+from app.services.prometheus_metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+# Максимум снимков в одном расчёте (5 лет еженедельных снимков)
+MAX_SNAPSHOTS = 260
+# Сколько рассчитанных диапазонов держать в памяти
+CACHE_MAX_ENTRIES = 32
+
+# Кэш: кортеж ID снимков -> результат
+# ЗАЧЕМ: Снимки неизменяемы, поэтому набор ID однозначно определяет результат
+_trajectory_cache: "OrderedDict[Tuple[int, ...], Dict[str, Any]]" = OrderedDict()
+
+
+def _select_snapshots(
+    db: Session,
+    from_snapshot_id: Optional[int],
+    to_snapshot_id: Optional[int],
+    limit: int
+) -> List[Tuple[int, Any]]:
+    """Снимки диапазона по времени создания: [(id, created_at)], последние limit штук"""
+    query = db.query(CryptoSnapshot.id, CryptoSnapshot.created_at)
+    for snapshot_id, is_start in ((from_snapshot_id, True), (to_snapshot_id, False)):
+        if snapshot_id is None:
+            continue
+        bound = db.query(CryptoSnapshot.created_at).filter(CryptoSnapshot.id == snapshot_id).scalar()
+        if bound is None:
+            raise ValueError(f"Snapshot {snapshot_id} not found")
+        query = query.filter(
+            CryptoSnapshot.created_at >= bound if is_start else CryptoSnapshot.created_at <= bound
+        )
+    rows = query.order_by(CryptoSnapshot.created_at.desc(), CryptoSnapshot.id.desc()).limit(limit).all()
+    return list(reversed(rows))
+
+
+def _rank_velocity(ranks: np.ndarray, present: np.ndarray, days: np.ndarray) -> np.ndarray:
+    """
+    Наклон линейной регрессии ранга по времени для каждого столбца (рангов в неделю)
+    Отсутствующие в топе точки не участвуют; меньше двух точек — NaN
+    """
+    weights = present.astype(np.float64)
+    t = days[:, None] * weights
+    r = np.where(present, ranks, 0.0)
+    n = weights.sum(axis=0)
+    st, sr = t.sum(axis=0), r.sum(axis=0)
+    stt, sty = (t * t).sum(axis=0), (t * r).sum(axis=0)
+    denom = n * stt - st * st
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = np.where((n >= 2) & (denom > 0), (n * sty - st * sr) / denom, np.nan)
+    return slope * 7
+
+
+def _compute(snapshots: List[Tuple[int, Any]], rank_rows: List[Tuple[int, str, int]],
+             names: Dict[str, str]) -> Dict[str, Any]:
+    """Матрица рангов и метрики по всем символам"""
+    snapshot_index = {snapshot_id: i for i, (snapshot_id, _) in enumerate(snapshots)}
+    symbols = sorted({symbol for _, symbol, _ in rank_rows})
+    symbol_index = {symbol: j for j, symbol in enumerate(symbols)}
+
+    ranks = np.full((len(snapshots), len(symbols)), np.nan)
+    if rank_rows:
+        rows = np.array([snapshot_index[s] for s, _, _ in rank_rows])
+        cols = np.array([symbol_index[sym] for _, sym, _ in rank_rows])
+        ranks[rows, cols] = [rank for _, _, rank in rank_rows]
+    present = ~np.isnan(ranks)
+
+    # Переходы между соседними снимками: вход (не было -> есть), выход (было -> нет)
+    entries = present[1:] & ~present[:-1]
+    exits = ~present[1:] & present[:-1]
+
+    # Первое и последнее появление символа в диапазоне
+    first_idx = present.argmax(axis=0)
+    last_idx = len(snapshots) - 1 - present[::-1].argmax(axis=0)
+    cols = np.arange(len(symbols))
+    first_rank = ranks[first_idx, cols]
+    last_rank = ranks[last_idx, cols]
+
+    start = snapshots[0][1]
+    days = np.array([(created_at - start).total_seconds() / 86400 for _, created_at in snapshots])
+    velocity = _rank_velocity(ranks, present, days)
+    best = np.nanmin(np.where(present, ranks, np.inf), axis=0)
+    worst = np.nanmax(np.where(present, ranks, -np.inf), axis=0)
+
+    snapshot_ids = [snapshot_id for snapshot_id, _ in snapshots]
+    result_symbols = []
+    for j, symbol in enumerate(symbols):
+        events = [
+            {"type": "entered", "snapshot_id": snapshot_ids[i + 1]} for i in np.flatnonzero(entries[:, j])
+        ] + [
+            {"type": "left", "snapshot_id": snapshot_ids[i + 1]} for i in np.flatnonzero(exits[:, j])
+        ]
+        events.sort(key=lambda e: snapshot_index[e["snapshot_id"]])
+        result_symbols.append({
+            "symbol": symbol,
+            "name": names.get(symbol, symbol),
+            "ranks": [None if np.isnan(v) else int(v) for v in ranks[:, j]],
+            "in_latest": bool(present[-1, j]),
+            "first_rank": int(first_rank[j]),
+            "last_rank": int(last_rank[j]),
+            # Положительное значение — рост в рейтинге (номер уменьшился)
+            "rank_change": int(first_rank[j] - last_rank[j]),
+            "best_rank": int(best[j]),
+            "worst_rank": int(worst[j]),
+            "velocity_per_week": None if np.isnan(velocity[j]) else round(float(-velocity[j]), 2),
+            "events": events
+        })
+
+    # Сначала текущий топ по рангу, затем выпавшие по последнему рангу
+    result_symbols.sort(key=lambda s: (not s["in_latest"], s["last_rank"]))
+
+    return {
+        "snapshots": [{"id": snapshot_id, "created_at": created_at} for snapshot_id, created_at in snapshots],
+        "symbols": result_symbols,
+        "summary": {
+            "snapshot_count": len(snapshots),
+            "symbol_count": len(symbols),
+            "entries": int(entries.sum()),
+            "exits": int(exits.sum())
+        }
+    }
+
+
+def get_trajectories(
+    db: Session,
+    from_snapshot_id: Optional[int] = None,
+    to_snapshot_id: Optional[int] = None,
+    limit: int = MAX_SNAPSHOTS
+) -> Dict[str, Any]:
+    """
+    Траектории рангов по диапазону снимков (не больше limit последних)
+
+    Returns:
+        {"snapshots": [...], "symbols": [...], "summary": {...}, "cached": bool}
+    """
+    snapshots = _select_snapshots(db, from_snapshot_id, to_snapshot_id, min(limit, MAX_SNAPSHOTS))
+    if not snapshots:
+        return {"snapshots": [], "symbols": [], "summary": {"snapshot_count": 0}, "cached": False}
+
+    key = tuple(snapshot_id for snapshot_id, _ in snapshots)
+    cached = _trajectory_cache.get(key)
+    record_cache("crypto_trajectories", cached is not None)
+    if cached is not None:
+        _trajectory_cache.move_to_end(key)
+        return {**cached, "cached": True}
+
+    # Один запрос за всеми позициями диапазона
+    rank_rows = db.query(
+        CryptoSnapshotRank.snapshot_id, CryptoSnapshotRank.symbol, CryptoSnapshotRank.rank
+    ).filter(CryptoSnapshotRank.snapshot_id.in_(key)).all()
+    symbols = {symbol for _, symbol, _ in rank_rows}
+    names = dict(
+        db.query(CryptoAsset.symbol, CryptoAsset.name).filter(CryptoAsset.symbol.in_(symbols))
+    ) if symbols else {}
+
+    result = _compute(snapshots, rank_rows, names)
+    _trajectory_cache[key] = result
+    while len(_trajectory_cache) > CACHE_MAX_ENTRIES:
+        _trajectory_cache.popitem(last=False)
+
+    logger.info(f"Trajectories computed: {len(snapshots)} snapshots, {len(symbols)} symbols")
+    return {**result, "cached": False}
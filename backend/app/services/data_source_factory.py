@@ -3,11 +3,16 @@ Data Source Factory
 Фабрика для выбора источника данных (Mock, IB, Polygon, Yahoo или Hybrid)
 """
 import os
-from typing import Union
-from app.services.polygon_client import PolygonClient
-from app.services.yahoo_client import YahooClient
-from app.services.hybrid_client import HybridClient
-from app.services.mock_data_provider import MockDataProvider
+from typing import TYPE_CHECKING, Union
+
+# Клиенты импортируются в get_client — только выбранный источник
+# ЗАЧЕМ: yahoo_client тянет pandas, mock_data_provider — генератор цепочек;
+# импорт всех при старте воркера стоил больше секунды
+if TYPE_CHECKING:
+    from app.services.polygon_client import PolygonClient
+    from app.services.yahoo_client import YahooClient
+    from app.services.hybrid_client import HybridClient
+    from app.services.mock_data_provider import MockDataProvider
 
 # Импортируем IBClient если доступен
 try:
@@ -33,7 +38,7 @@ class DataSourceFactory:
     """
     
     @staticmethod
-    def get_client() -> Union[MockDataProvider, 'IBClient', PolygonClient, YahooClient, HybridClient]:
+    def get_client() -> Union['MockDataProvider', 'IBClient', 'PolygonClient', 'YahooClient', 'HybridClient']:
         """
         Получить клиент на основе настроек в .env
         
@@ -46,6 +51,7 @@ class DataSourceFactory:
         
         # Mock данные для локальной разработки и тестового сервера
         if data_source == "mock" or app_env in ["local", "test"]:
+            from app.services.mock_data_provider import MockDataProvider
             return MockDataProvider()
         
         # IB Client ТОЛЬКО если явно указано DATA_SOURCE=ib
@@ -54,13 +60,16 @@ class DataSourceFactory:
         
         # Polygon для тестов с Polygon API
         if data_source == "polygon":
+            from app.services.polygon_client import PolygonClient
             return PolygonClient()
         
         # Yahoo для тестов с Yahoo
         if data_source == "yahoo":
+            from app.services.yahoo_client import YahooClient
             return YahooClient()
         
         # По умолчанию - Hybrid (Polygon + Yahoo) - PRODUCTION ИСПОЛЬЗУЕТ ЭТО!
+        from app.services.hybrid_client import HybridClient
         return HybridClient()
     
     @staticmethod
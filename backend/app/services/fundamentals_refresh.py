@@ -0,0 +1,148 @@
+"""
+Ночное обновление фундаментальных данных отслеживаемых тикеров
+ЗАЧЕМ: Профиль, метрики и earnings обновляются пакетно вне торговых часов,
+поэтому днём классификация читает их из локального хранилища
+Затрагивает: fundamentals_store, stock_features_cache, stock_classifier (загрузчики Finnhub),
+main.py (startup/shutdown), /api/stock/fundamentals/*, shared_state (один запуск на все воркеры)
+"""
+
+import os
+import time
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from app.services import fundamentals_store, shared_state
+from app.services.stock_features_cache import get_http_client, store_field
+
+# APScheduler импортируется при запуске планировщика, а не при import app.main
+if TYPE_CHECKING:
+    from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+logger = logging.getLogger(__name__)
+
+# Час запуска (по локальному времени сервера) и включение планировщика
+REFRESH_HOUR = int(os.getenv("FUNDAMENTALS_REFRESH_HOUR", "3"))
+REFRESH_ENABLED = os.getenv("FUNDAMENTALS_REFRESH_ENABLED", "true").lower() == "true"
+# Запросов к Finnhub в минуту во время обновления (лимит бесплатного плана — 60)
+REFRESH_RATE_PER_MINUTE = int(os.getenv("FUNDAMENTALS_REFRESH_RPM", "50"))
+# Тикеры, которые обновляются всегда, даже если их давно не запрашивали
+UNIVERSE = [
+    s.strip().upper() for s in os.getenv("FUNDAMENTALS_UNIVERSE", "").split(",") if s.strip()
+]
+
+_scheduler: Optional["AsyncIOScheduler"] = None
+_refresh_lock = asyncio.Lock()
+_last_run: Dict[str, Any] = {}
+
+
+def _get_fetchers() -> Dict[str, Any]:
+    """Загрузчики Finnhub по полям (импорт внутри — stock_classifier импортирует кэш полей)"""
+    from app.services.stock_classifier import (
+        _fetch_company_profile,
+        _fetch_basic_financials,
+        _fetch_earnings_calendar
+    )
+    return {
+        "profile": _fetch_company_profile,
+        "metrics": _fetch_basic_financials,
+        "earnings": _fetch_earnings_calendar,
+    }
+
+
+def get_refresh_universe() -> List[str]:
+    """Отслеживаемые тикеры плюс FUNDAMENTALS_UNIVERSE"""
+    return list(dict.fromkeys(UNIVERSE + fundamentals_store.get_tracked_symbols()))
+
+
+async def refresh_fundamentals(symbols: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Последовательно перезагрузить поля всех тикеров с равномерным темпом
+    ЗАЧЕМ: Обновление не должно выбирать лимит Finnhub, нужный живым запросам
+
+    Returns:
+        Статистика прогона (тикеры, обновлённые поля, ошибки, длительность)
+    """
+    if _refresh_lock.locked():
+        return {"skipped": True, "reason": "refresh already running"}
+
+    async with _refresh_lock:
+        symbols = symbols or get_refresh_universe()
+        fetchers = _get_fetchers()
+        interval = 60.0 / REFRESH_RATE_PER_MINUTE
+        client = get_http_client()
+        start = time.time()
+        updated, failed = 0, 0
+
+        logger.info(f"🗄️ Обновление фундаментальных данных: {len(symbols)} тикеров")
+        for symbol in symbols:
+            for field, fetcher in fetchers.items():
+                try:
+                    value = await fetcher(symbol, client)
+                    # None у профиля/метрик — ошибка API, старые данные не затираем
+                    if value is not None or field == "earnings":
+                        await asyncio.to_thread(store_field, symbol, field, value, time.time())
+                        updated += 1
+                    else:
+                        failed += 1
+                except Exception as e:
+                    logger.warning(f"⚠️ {symbol} {field}: {e}")
+                    failed += 1
+                await asyncio.sleep(interval)
+
+        _last_run.update({
+            "finished_at": time.time(),
+            "symbols": len(symbols),
+            "updated_fields": updated,
+            "failed_fields": failed,
+            "duration_seconds": round(time.time() - start, 1)
+        })
+        logger.info(f"✅ Фундаментальные данные обновлены: {updated} полей, ошибок: {failed}")
+        return dict(_last_run)
+
+
+async def _scheduled_refresh() -> None:
+    """Ночной прогон: планировщик есть в каждом воркере, обновляет тот, кто занял дату"""
+    if not shared_state.claim("fundamentals_refresh", time.strftime("%Y-%m-%d"), ttl=6 * 3600):
+        logger.info("🗄️ Обновление фундаментальных данных выполняет другой воркер")
+        return
+    await refresh_fundamentals()
+
+
+def start_fundamentals_scheduler() -> None:
+    """Запустить ночное обновление (вызывается из startup event)"""
+    global _scheduler
+    if not REFRESH_ENABLED or _scheduler is not None:
+        return
+    from apscheduler.schedulers.asyncio import AsyncIOScheduler
+    from apscheduler.triggers.cron import CronTrigger
+
+    _scheduler = AsyncIOScheduler()
+    _scheduler.add_job(
+        _scheduled_refresh,
+        CronTrigger(hour=REFRESH_HOUR, minute=0),
+        id="fundamentals_refresh",
+        max_instances=1,
+        coalesce=True
+    )
+    _scheduler.start()
+    logger.info(f"🗄️ Ночное обновление фундаментальных данных в {REFRESH_HOUR:02d}:00")
+
+
+def stop_fundamentals_scheduler() -> None:
+    """Остановить планировщик при завершении приложения"""
+    global _scheduler
+    if _scheduler is not None:
+        _scheduler.shutdown(wait=False)
+        _scheduler = None
+
+
+def get_refresh_status() -> Dict[str, Any]:
+    """Состояние хранилища и последнего обновления"""
+    return {
+        **fundamentals_store.get_stats(),
+        "refresh_enabled": REFRESH_ENABLED,
+        "refresh_hour": REFRESH_HOUR,
+        "refresh_running": _refresh_lock.locked(),
+        "last_run": _last_run or None
+    }
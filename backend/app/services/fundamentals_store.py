@@ -0,0 +1,143 @@
+"""
+Локальное хранилище фундаментальных данных Finnhub (SQLite)
+ЗАЧЕМ: Профиль, метрики и earnings меняются редко — храним их на диске между
+перезапусками, чтобы классификация читала локально, а рестарт не вызывал
+лавину запросов к Finnhub
+Затрагивает: stock_features_cache (read-through), fundamentals_refresh (ночное обновление)
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+# Путь к файлу базы (отдельно от основной БД приложения)
+FUNDAMENTALS_DB_PATH = os.getenv(
+    "FUNDAMENTALS_DB_PATH",
+    os.path.join(os.path.dirname(__file__), "..", "..", "fundamentals.db")
+)
+
+# Тикеры, не запрашивавшиеся дольше этого срока, выпадают из ночного обновления
+TRACK_DAYS = int(os.getenv("FUNDAMENTALS_TRACK_DAYS", "30"))
+
+_connection: Optional[sqlite3.Connection] = None
+_lock = threading.Lock()
+
+# Дата последней отметки тикера — пишем в БД не чаще раза в день
+_touched_today: Dict[str, str] = {}
+
+
+def _get_connection() -> sqlite3.Connection:
+    """Одно соединение на процесс, схема создаётся при первом обращении"""
+    global _connection
+    if _connection is None:
+        _connection = sqlite3.connect(FUNDAMENTALS_DB_PATH, check_same_thread=False)
+        _connection.execute("PRAGMA journal_mode=WAL")
+        _connection.execute("PRAGMA synchronous=NORMAL")
+        _connection.executescript("""
+            CREATE TABLE IF NOT EXISTS fundamentals (
+                symbol TEXT NOT NULL,
+                field TEXT NOT NULL,
+                payload TEXT,
+                fetched_at REAL NOT NULL,
+                PRIMARY KEY (symbol, field)
+            );
+            CREATE TABLE IF NOT EXISTS tracked_symbols (
+                symbol TEXT PRIMARY KEY,
+                last_requested_at REAL NOT NULL
+            );
+        """)
+        _connection.commit()
+    return _connection
+
+
+def get_field(symbol: str, field: str) -> Optional[Tuple[Any, float]]:
+    """
+    Прочитать поле тикера
+
+    Returns:
+        (value, fetched_at) или None, если данных нет
+    """
+    with _lock:
+        row = _get_connection().execute(
+            "SELECT payload, fetched_at FROM fundamentals WHERE symbol = ? AND field = ?",
+            (symbol.upper(), field)
+        ).fetchone()
+    if row is None:
+        return None
+    return json.loads(row[0]) if row[0] is not None else None, row[1]
+
+
+def put_field(symbol: str, field: str, value: Any, fetched_at: Optional[float] = None) -> None:
+    """Сохранить (перезаписать) поле тикера"""
+    payload = json.dumps(value) if value is not None else None
+    with _lock:
+        connection = _get_connection()
+        connection.execute(
+            "INSERT OR REPLACE INTO fundamentals (symbol, field, payload, fetched_at) VALUES (?, ?, ?, ?)",
+            (symbol.upper(), field, payload, fetched_at or time.time())
+        )
+        connection.commit()
+
+
+def touch_symbol(symbol: str) -> None:
+    """
+    Отметить тикер как используемый (входит в ночное обновление)
+    ЗАЧЕМ: Отслеживаемая вселенная = тикеры, которые реально классифицируют
+    """
+    symbol = symbol.upper()
+    today = date.today().isoformat()
+    if _touched_today.get(symbol) == today:
+        return
+    with _lock:
+        connection = _get_connection()
+        connection.execute(
+            "INSERT OR REPLACE INTO tracked_symbols (symbol, last_requested_at) VALUES (?, ?)",
+            (symbol, time.time())
+        )
+        connection.commit()
+    _touched_today[symbol] = today
+
+
+def get_tracked_symbols() -> List[str]:
+    """Тикеры, запрошенные за последние TRACK_DAYS дней"""
+    since = time.time() - TRACK_DAYS * 24 * 3600
+    with _lock:
+        rows = _get_connection().execute(
+            "SELECT symbol FROM tracked_symbols WHERE last_requested_at >= ? ORDER BY symbol",
+            (since,)
+        ).fetchall()
+    return [row[0] for row in rows]
+
+
+def delete_symbol(symbol: Optional[str] = None) -> None:
+    """Удалить данные тикера (или все данные) — для принудительного обновления"""
+    with _lock:
+        connection = _get_connection()
+        if symbol is None:
+            connection.execute("DELETE FROM fundamentals")
+        else:
+            connection.execute("DELETE FROM fundamentals WHERE symbol = ?", (symbol.upper(),))
+        connection.commit()
+
+
+def get_stats() -> Dict[str, Any]:
+    """Состояние хранилища для отладки"""
+    with _lock:
+        connection = _get_connection()
+        rows = connection.execute(
+            "SELECT field, COUNT(*), MIN(fetched_at) FROM fundamentals GROUP BY field"
+        ).fetchall()
+        tracked = connection.execute("SELECT COUNT(*) FROM tracked_symbols").fetchone()[0]
+    now = time.time()
+    return {
+        "db_path": os.path.abspath(FUNDAMENTALS_DB_PATH),
+        "tracked_symbols": tracked,
+        "fields": {
+            field: {"count": count, "oldest_age_hours": round((now - oldest) / 3600, 1)}
+            for field, count, oldest in rows
+        }
+    }
@@ -6,6 +6,7 @@ Google Gemini AI Client
 import os
 import time
 import google.generativeai as genai
+from app.services.prometheus_metrics import track_upstream
 from typing import Dict
 
 
@@ -131,7 +132,8 @@ class GeminiClient:
             # Отправить в Gemini
             gemini_start = time.time()
             print(f"🚀 Sending request to Gemini API...")
-            response = self.model.generate_content(formatted_prompt)
+            with track_upstream("gemini"):
+                response = self.model.generate_content(formatted_prompt)
             gemini_end = time.time()
             print(f"🎯 Gemini API response received in: {gemini_end - gemini_start:.2f}s")
             
@@ -0,0 +1,127 @@
+"""
+Фоновая запись истории анализов
+ЗАЧЕМ: Сохранение анализа не должно блокировать event loop и ответ пользователю.
+Записи ставятся в очередь, один писатель сохраняет их пачками в одной транзакции —
+на SQLite параллельные сохранения больше не конкурируют за блокировку записи.
+Ответ отдаётся до commit (save_status="pending"): неудачная пачка повторяется
+с нарастающей паузой, затем записи сохраняются по одной — сбой одной записи
+или короткая недоступность БД не теряют всю пачку
+Затрагивает: /analyze/step3-ai, /api/analysis/save, AnalysisHistory, database (sync/async engine)
+"""
+
+import asyncio
+import logging
+import uuid
+from typing import Any, Dict, List, Optional
+
+from app.database import DB_ASYNC_ENABLED, SessionLocal, get_async_session_maker
+from app.models.analysis_history import AnalysisHistory
+
+logger = logging.getLogger(__name__)
+
+# Максимум записей в одной транзакции
+BATCH_SIZE = 50
+# Попытки записи пачки и пауза перед первым повтором (дальше удваивается), секунды
+WRITE_ATTEMPTS = 3
+RETRY_BASE_DELAY = 1.0
+
+_queue: Optional[asyncio.Queue] = None
+_writer_task: Optional[asyncio.Task] = None
+
+
+def _write_batch_sync(batch: List[Dict[str, Any]]) -> None:
+    """Сохранить пачку через синхронную сессию (выполняется в потоке)"""
+    db = SessionLocal()
+    try:
+        db.add_all([AnalysisHistory(**record) for record in batch])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+async def _write_batch(batch: List[Dict[str, Any]]) -> None:
+    """Сохранить пачку через async engine или синхронную сессию в потоке"""
+    if DB_ASYNC_ENABLED:
+        async with get_async_session_maker()() as session:
+            session.add_all([AnalysisHistory(**record) for record in batch])
+            await session.commit()
+    else:
+        await asyncio.to_thread(_write_batch_sync, batch)
+
+
+async def _write_with_retry(batch: List[Dict[str, Any]]) -> None:
+    """
+    Сохранить пачку: WRITE_ATTEMPTS попыток с удвоением паузы, затем по одной записи
+    ЗАЧЕМ: Ответ с ID уже ушёл клиенту — запись нельзя молча потерять
+    """
+    delay = RETRY_BASE_DELAY
+    for attempt in range(1, WRITE_ATTEMPTS + 1):
+        try:
+            await _write_batch(batch)
+            logger.info("💾 Saved %d analysis record(s)", len(batch))
+            return
+        except Exception as e:
+            logger.warning("⚠️ Failed to save %d analysis record(s), attempt %d/%d: %s",
+                           len(batch), attempt, WRITE_ATTEMPTS, e)
+            if attempt < WRITE_ATTEMPTS:
+                await asyncio.sleep(delay)
+                delay *= 2
+
+    # Пачка не записалась — по одной, чтобы одна некорректная запись не тянула остальные
+    for record in batch:
+        try:
+            await _write_batch([record])
+        except Exception as e:
+            logger.error("❌ Analysis %s (%s) not saved: %s", record["id"], record.get("ticker"), e)
+
+
+async def _writer_loop() -> None:
+    """Забирать записи из очереди и сохранять пачками"""
+    while True:
+        batch = [await _queue.get()]
+        while len(batch) < BATCH_SIZE and not _queue.empty():
+            batch.append(_queue.get_nowait())
+        try:
+            await _write_with_retry(batch)
+        finally:
+            for _ in batch:
+                _queue.task_done()
+
+
+def start_history_writer() -> None:
+    """Запустить писателя (вызывается из startup event)"""
+    global _queue, _writer_task
+    if _writer_task is None:
+        _queue = asyncio.Queue()
+        _writer_task = asyncio.create_task(_writer_loop())
+
+
+async def stop_history_writer() -> None:
+    """Дописать очередь и остановить писателя (вызывается из shutdown event)"""
+    global _writer_task
+    if _writer_task is None:
+        return
+    await _queue.join()
+    _writer_task.cancel()
+    _writer_task = None
+
+
+async def enqueue_analysis(**fields: Any) -> Dict[str, str]:
+    """
+    Поставить анализ в очередь на сохранение
+
+    ID генерируется сразу, поэтому ссылку на анализ можно вернуть до записи в БД.
+    Без запущенного писателя (или если он остановился) запись сохраняется сразу.
+
+    Returns:
+        {"id": ID анализа, "save_status": "pending" (в очереди) | "saved" (уже в БД)}
+    """
+    record = {"id": str(uuid.uuid4()), **fields}
+    if _writer_task is None or _writer_task.done():
+        await _write_batch([record])
+        return {"id": record["id"], "save_status": "saved"}
+    _queue.put_nowait(record)
+    return {"id": record["id"], "save_status": "pending"}
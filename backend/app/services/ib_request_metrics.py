@@ -0,0 +1,210 @@
+"""
+Счётчики запросов к IB Gateway
+ЗАЧЕМ: Лог запросов был списком с pop(0), а статистика на каждый вызов заново
+разбирала все ISO-метки. Теперь запрос увеличивает счётчик своей минуты (O(1)),
+статистика суммирует минутные корзины, а последние ошибки хранятся в кольцевом
+буфере. С IB_METRICS_BACKEND=redis счётчики общие для всех воркеров (по умолчанию
+режим берётся из SHARED_STATE_BACKEND, подключение — из shared_state)
+Затрагивает: routers/ib_monitoring (/status, /requests/history, log_request), Redis
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+ASSET_TYPES = ("stocks", "options", "futures", "indices", "forex")
+
+# Размер кольцевого буфера ошибок
+MAX_LOG_SIZE = 1000
+# Сколько часов хранятся минутные корзины (/requests/history не заглядывает дальше)
+RETENTION_HOURS = int(os.getenv("IB_METRICS_RETENTION_HOURS", "24"))
+
+REDIS_PREFIX = "ib_metrics"
+
+
+def _empty_counts() -> Dict[str, int]:
+    counts = {asset_type: 0 for asset_type in ASSET_TYPES}
+    counts["total"] = 0
+    return counts
+
+
+def _add_bucket(counts: Dict[str, int], bucket: Dict[str, int]) -> None:
+    """Добавить корзину {"<asset>:ok|fail": n} к сводке по типам активов"""
+    for field, value in bucket.items():
+        asset_type = field.rsplit(":", 1)[0]
+        value = int(value)
+        if asset_type in counts:
+            counts[asset_type] += value
+        counts["total"] += value
+
+
+class MemoryRequestMetrics:
+    """Счётчики в памяти процесса (по умолчанию)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # минута (epoch // 60) -> {"<asset>:ok|fail": n}
+        self._buckets: Dict[int, Dict[str, int]] = {}
+        self._errors: deque = deque(maxlen=MAX_LOG_SIZE)
+        self._last_success: Optional[str] = None
+
+    def record(self, asset_type: str, success: bool, error: Optional[str], now: float) -> None:
+        minute = int(now // 60)
+        field = f"{asset_type}:{'ok' if success else 'fail'}"
+        with self._lock:
+            bucket = self._buckets.get(minute)
+            if bucket is None:
+                bucket = self._buckets[minute] = {}
+                self._prune(minute)
+            bucket[field] = bucket.get(field, 0) + 1
+            if success:
+                self._last_success = datetime.fromtimestamp(now).isoformat()
+            elif error:
+                self._errors.append({
+                    "timestamp": datetime.fromtimestamp(now).isoformat(),
+                    "asset_type": asset_type,
+                    "error": error
+                })
+
+    def _prune(self, current_minute: int) -> None:
+        """Удалить корзины старше RETENTION_HOURS (раз в минуту, при открытии новой)"""
+        oldest = current_minute - RETENTION_HOURS * 60
+        for minute in [m for m in self._buckets if m < oldest]:
+            del self._buckets[minute]
+
+    def buckets(self, first_minute: int, last_minute: int) -> Dict[int, Dict[str, int]]:
+        with self._lock:
+            return {
+                minute: dict(bucket) for minute, bucket in self._buckets.items()
+                if first_minute <= minute <= last_minute
+            }
+
+    def recent_errors(self, limit: int) -> List[Dict]:
+        with self._lock:
+            return list(self._errors)[-limit:]
+
+    def last_success(self) -> Optional[str]:
+        return self._last_success
+
+
+class RedisRequestMetrics:
+    """
+    Счётчики в Redis: хеш на минуту (HINCRBY + EXPIRE), ошибки — список с LTRIM
+    Один pipeline на запрос и один на статистику
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.ttl = RETENTION_HOURS * 3600 + 120
+
+    def record(self, asset_type: str, success: bool, error: Optional[str], now: float) -> None:
+        minute = int(now // 60)
+        key = f"{REDIS_PREFIX}:m:{minute}"
+        timestamp = datetime.fromtimestamp(now).isoformat()
+        pipe = self.client.pipeline(transaction=False)
+        pipe.hincrby(key, f"{asset_type}:{'ok' if success else 'fail'}", 1)
+        pipe.expire(key, self.ttl)
+        if success:
+            pipe.set(f"{REDIS_PREFIX}:last_success", timestamp)
+        elif error:
+            errors_key = f"{REDIS_PREFIX}:errors"
+            pipe.lpush(errors_key, json.dumps({
+                "timestamp": timestamp, "asset_type": asset_type, "error": error
+            }))
+            pipe.ltrim(errors_key, 0, MAX_LOG_SIZE - 1)
+        pipe.execute()
+
+    def buckets(self, first_minute: int, last_minute: int) -> Dict[int, Dict[str, int]]:
+        minutes = range(first_minute, last_minute + 1)
+        pipe = self.client.pipeline(transaction=False)
+        for minute in minutes:
+            pipe.hgetall(f"{REDIS_PREFIX}:m:{minute}")
+        return {
+            minute: {field: int(value) for field, value in bucket.items()}
+            for minute, bucket in zip(minutes, pipe.execute()) if bucket
+        }
+
+    def recent_errors(self, limit: int) -> List[Dict]:
+        # LPUSH кладёт новые в начало — разворачиваем в хронологический порядок
+        raw = self.client.lrange(f"{REDIS_PREFIX}:errors", 0, limit - 1)
+        return [json.loads(item) for item in reversed(raw)]
+
+    def last_success(self) -> Optional[str]:
+        return self.client.get(f"{REDIS_PREFIX}:last_success")
+
+
+def _create_backend():
+    from app.services import shared_state
+
+    mode = os.getenv("IB_METRICS_BACKEND", shared_state.SHARED_STATE_BACKEND).lower()
+    if mode == "memory":
+        return MemoryRequestMetrics()
+    # Тот же Redis, что у общего состояния (REDIS_URL / REDIS_HOST / REDIS_PORT)
+    client = shared_state.redis_client()
+    if client is None:
+        if mode == "redis":
+            logger.warning("IB metrics: Redis недоступен, счётчики в памяти процесса")
+        return MemoryRequestMetrics()
+    logger.info("IB metrics: Redis backend")
+    return RedisRequestMetrics(client)
+
+
+_backend = None
+
+
+def _get_backend():
+    """Бэкенд создаётся при первом запросе — к этому моменту startup уже выбрал Redis"""
+    global _backend
+    if _backend is None:
+        _backend = _create_backend()
+    return _backend
+
+
+def record_request(asset_type: str, success: bool = True, error: Optional[str] = None) -> None:
+    """Учесть запрос; сбой Redis не должен ломать сам запрос к IB"""
+    try:
+        _get_backend().record(asset_type, success, error, time.time())
+    except Exception as e:
+        logger.error(f"IB metrics: не удалось записать запрос: {e}")
+
+
+def get_window_stats(minutes: int = 60) -> Dict[str, int]:
+    """Количество запросов по типам активов за последние N минут (включая текущую)"""
+    current = int(time.time() // 60)
+    counts = _empty_counts()
+    for bucket in _get_backend().buckets(current - minutes + 1, current).values():
+        _add_bucket(counts, bucket)
+    return counts
+
+
+def get_hourly_breakdown(hours: int = 24) -> Dict[str, Dict[str, int]]:
+    """
+    Сводка по часам за последние N часов (не больше RETENTION_HOURS)
+
+    Returns:
+        {"YYYY-MM-DD HH:00": {"stocks": n, ..., "total": n}}
+    """
+    hours = max(1, min(hours, RETENTION_HOURS))
+    current = int(time.time() // 60)
+    hourly: Dict[str, Dict[str, int]] = {}
+    for minute, bucket in sorted(_get_backend().buckets(current - hours * 60 + 1, current).items()):
+        hour_key = datetime.fromtimestamp(minute * 60).strftime("%Y-%m-%d %H:00")
+        _add_bucket(hourly.setdefault(hour_key, _empty_counts()), bucket)
+    return hourly
+
+
+def get_recent_errors(limit: int = 10) -> List[Dict]:
+    """Последние ошибки (старые первые)"""
+    return _get_backend().recent_errors(limit)
+
+
+def get_last_success() -> Optional[str]:
+    """ISO-время последнего успешного запроса"""
+    return _get_backend().last_success()
@@ -22,7 +22,7 @@ class IVRankCalculator:
         if not self.api_key:
             raise ValueError("POLYGON_API_KEY не найден в .env файле")
         
-        self.base_url = "https://api.polygon.io"
+        self.base_url = os.getenv("POLYGON_BASE_URL", "https://api.polygon.io").rstrip("/")
     
     def calculate_iv_rank(self, ticker: str, current_iv: float) -> Optional[Dict]:
         """
@@ -0,0 +1,112 @@
+"""
+Настройка логирования backend: уровни по модулям, структурированный вывод, сэмплинг
+ЗАЧЕМ: Горячие пути (опционные цепочки, классификатор акций, даты экспирации,
+анализ) писали print с f-строками на каждый запрос — форматирование и
+небуферизованная запись в stdout под PM2 даже когда вывод никому не нужен.
+Теперь сообщения идут через logging с ленивым %-форматированием: отладочные
+строки отсекаются проверкой уровня, запись в stdout — в фоновом потоке
+(QueueHandler), построчные логи по элементам — с сэмплингом
+Затрагивает: main (setup_logging при старте), options_service, polygon_client,
+stock_classifier
+
+Переменные окружения:
+    LOG_LEVEL=INFO                        — общий уровень
+    LOG_LEVELS=app.services.options_service=DEBUG,httpx=WARNING — уровни модулей
+    LOG_FORMAT=text|json                  — json: одна строка JSON на запись (+ поля extra)
+    LOG_SAMPLE_RATE=0.01                  — доля записей с extra={"sampled": True}
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from typing import Dict, Optional
+
+# Доля пропускаемых записей по элементам (контракты, символы)
+SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.01"))
+
+# Атрибуты LogRecord; всё остальное пришло через extra и попадает в JSON
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+# Библиотеки, пишущие INFO на каждый запрос/задачу (переопределяются через LOG_LEVELS)
+DEFAULT_LEVELS = {"httpx": "WARNING", "httpcore": "WARNING", "apscheduler": "WARNING"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна строка JSON: время, уровень, логгер, сообщение и поля extra"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and key != "sampled":
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает долю SAMPLE_RATE записей, помеченных extra={"sampled": True}"""
+
+    def __init__(self, rate: float = SAMPLE_RATE):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, "sampled", False):
+            return random.random() < self.rate
+        return True
+
+
+def parse_levels(spec: str) -> Dict[str, str]:
+    """'a.b=DEBUG, c=WARNING' -> {'a.b': 'DEBUG', 'c': 'WARNING'}"""
+    levels = {}
+    for item in spec.split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging() -> None:
+    """
+    Настроить корневой логгер (вызывается один раз при импорте main)
+    Повторный вызов только обновляет уровни
+    """
+    global _listener
+    root = logging.getLogger()
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    levels = {**DEFAULT_LEVELS, **parse_levels(os.getenv("LOG_LEVELS", ""))}
+    for name, level in levels.items():
+        logging.getLogger(name).setLevel(level)
+    if _listener is not None:
+        return
+
+    handler = logging.StreamHandler(sys.stdout)
+    if os.getenv("LOG_FORMAT", "text").lower() == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    # Запись в stdout — в потоке QueueListener, запрос только кладёт запись в очередь
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter())
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(queue_handler)
+
+    _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
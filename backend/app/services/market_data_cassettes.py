@@ -0,0 +1,253 @@
+"""
+Запись и воспроизведение ответов внешних источников рыночных данных
+ЗАЧЕМ: Медленный или неверный анализ воспроизводится на тех же входных данных:
+в режиме record каждый запрос клиентов к Polygon / Yahoo / Finnhub и его ответ
+(с временем ответа) пишутся в сжатые кассеты по тикеру и дате, в режиме replay
+ответы отдаются из кассет без сети — детерминированно и с исходными задержками
+Затрагивает: requests (PolygonClient, OptionsService, IVRankCalculator, yfinance),
+httpx.AsyncClient (Finnhub: stock_features_cache, прокси), main (install_cassettes)
+
+Файлы: <MARKET_DATA_CASSETTE_DIR>/<YYYY-MM-DD>/<TICKER>.jsonl.gz
+"""
+
+import asyncio
+import base64
+import gzip
+import json
+import logging
+import os
+import re
+import threading
+import time
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+logger = logging.getLogger(__name__)
+
+CASSETTE_MODE = os.getenv("MARKET_DATA_CASSETTE_MODE", "off").lower()
+CASSETTE_DIR = Path(os.getenv(
+    "MARKET_DATA_CASSETTE_DIR",
+    Path(__file__).resolve().parent.parent.parent / "cassettes"
+))
+# Дата кассет для replay (по умолчанию сегодняшняя)
+CASSETTE_DATE = os.getenv("MARKET_DATA_CASSETTE_DATE")
+# Воспроизводить записанное время ответа
+REPLAY_LATENCY = os.getenv("MARKET_DATA_CASSETTE_LATENCY", "true").lower() == "true"
+
+DEFAULT_HOSTS = (
+    "api.polygon.io,finnhub.io,query1.finance.yahoo.com,"
+    "query2.finance.yahoo.com,fc.yahoo.com"
+)
+# Параметры-секреты не пишутся в кассету и не входят в ключ запроса
+SECRET_PARAMS = {"apikey", "token", "api_key", "crumb"}
+
+_TICKER_PATTERNS = [
+    re.compile(r"/(?:ticker|tickers|snapshot/options|last/trade|chart|options|quoteSummary)/([A-Za-z0-9.:^=-]+)")
+]
+_TICKER_PARAMS = ("underlying_ticker", "ticker", "symbol", "symbols")
+# Параметры окна «от текущей даты» (Finnhub from/to, Yahoo period1/period2) —
+# единственное, что запасной ключ отбрасывает. Даты, выбирающие данные
+# (expiration_date, expiration_date.gte/.lte, Yahoo date=), остаются в ключе
+CURRENT_DATE_PARAMS = {"from", "to", "period1", "period2", "timestamp"}
+
+
+def _cassette_hosts() -> set:
+    hosts = set(os.getenv("MARKET_DATA_CASSETTE_HOSTS", DEFAULT_HOSTS).split(","))
+    # Локальный фейковый Polygon (POLYGON_BASE_URL) тоже записывается
+    if os.getenv("POLYGON_BASE_URL"):
+        hosts.add(urlsplit(os.getenv("POLYGON_BASE_URL")).netloc)
+    return {host.strip() for host in hosts if host.strip()}
+
+
+def request_key(method: str, url: str, body: Optional[bytes] = None) -> Tuple[str, str]:
+    """
+    Ключи запроса: точный (метод, URL без секретов, параметры отсортированы, тело)
+    и запасной (без CURRENT_DATE_PARAMS) — для запросов с окном от текущей даты;
+    запрос с другим тикером или экспирацией в параметрах в запасной ключ не попадает
+    """
+    parts = urlsplit(url)
+    params = sorted(
+        (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if name.lower() not in SECRET_PARAMS
+    )
+    exact = f"{method.upper()} {parts.netloc}{parts.path}?{urlencode(params)}"
+    if body:
+        exact += f" #{body.decode('utf-8', 'replace')}"
+    undated = [(name, value) for name, value in params if name not in CURRENT_DATE_PARAMS]
+    return exact, f"{method.upper()} {parts.netloc}{parts.path}?{urlencode(undated)}"
+
+
+def ticker_of(url: str) -> str:
+    """Тикер запроса (имя файла кассеты); _misc — если определить нельзя"""
+    parts = urlsplit(url)
+    params = dict(parse_qsl(parts.query))
+    for name in _TICKER_PARAMS:
+        if params.get(name):
+            return params[name].split(",")[0].upper()
+    for pattern in _TICKER_PATTERNS:
+        match = pattern.search(parts.path)
+        if match:
+            # O:SPY251219C00450000 -> SPY
+            symbol = match.group(1)
+            option = re.match(r"O:([A-Z.]+)\d{6}[CP]\d{8}$", symbol)
+            return (option.group(1) if option else symbol).upper()
+    return "_misc"
+
+
+class CassetteStore:
+    """Кассеты одного дня: запись — дозапись gzip-членов, replay — индекс по ключам"""
+
+    def __init__(self, root: Path, day: Optional[str] = None):
+        self.root = Path(root)
+        self.day = day or date.today().isoformat()
+        self._lock = threading.Lock()
+        self._index: Optional[Dict[str, List[Dict]]] = None
+        self._cursors: Dict[str, int] = {}
+
+    def record(self, method: str, url: str, body: Optional[bytes], status: int,
+               headers: Dict[str, str], content: bytes, elapsed_ms: float) -> None:
+        exact, _ = request_key(method, url, body)
+        entry = {
+            "key": exact,
+            "status": status,
+            # Тело уже распаковано клиентом — content-encoding не сохраняем
+            "headers": {k: v for k, v in headers.items() if k.lower() == "content-type"},
+            "body": base64.b64encode(content).decode(),
+            "elapsed_ms": round(elapsed_ms, 1),
+            "recorded_at": datetime.now().isoformat()
+        }
+        path = self.root / self.day / f"{ticker_of(url)}.jsonl.gz"
+        with self._lock:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with gzip.open(path, "at", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def _load(self) -> Dict[str, List[Dict]]:
+        index: Dict[str, List[Dict]] = {}
+        for path in sorted((self.root / self.day).glob("*.jsonl.gz")):
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    entry = json.loads(line)
+                    exact = entry["key"]
+                    # Запасной ключ из точного: "METHOD host/path?query[ #body]"
+                    method, target = exact.split(" #", 1)[0].split(" ", 1)
+                    _, fallback = request_key(method, f"//{target}")
+                    index.setdefault(exact, []).append(entry)
+                    index.setdefault(fallback, []).append(entry)
+        logger.info(f"Cassettes {self.day}: {len(index)} keys loaded")
+        return index
+
+    def replay(self, method: str, url: str, body: Optional[bytes]) -> Optional[Dict]:
+        """
+        Записанный ответ; повторные одинаковые запросы получают ответы в порядке
+        записи (последний повторяется). None — запрос не записан
+        """
+        with self._lock:
+            if self._index is None:
+                self._index = self._load()
+            for key in request_key(method, url, body):
+                entries = self._index.get(key)
+                if entries:
+                    position = self._cursors.get(key, 0)
+                    self._cursors[key] = position + 1
+                    return entries[min(position, len(entries) - 1)]
+        return None
+
+
+_store: Optional[CassetteStore] = None
+_hosts: set = set()
+_installed = False
+
+
+def _should_handle(url: str) -> bool:
+    return urlsplit(url).netloc in _hosts
+
+
+def _decode(entry: Dict) -> bytes:
+    return base64.b64decode(entry["body"])
+
+
+def _install_requests() -> None:
+    import requests
+
+    original_send = requests.Session.send
+
+    def send(session, request, **kwargs):
+        if not _should_handle(request.url):
+            return original_send(session, request, **kwargs)
+        body = request.body.encode() if isinstance(request.body, str) else request.body
+        if CASSETTE_MODE == "replay":
+            entry = _store.replay(request.method, request.url, body)
+            if entry is None:
+                raise requests.ConnectionError(f"Cassette miss: {request.method} {request.url.split('?')[0]}")
+            if REPLAY_LATENCY:
+                time.sleep(entry["elapsed_ms"] / 1000)
+            response = requests.Response()
+            response.status_code = entry["status"]
+            response._content = _decode(entry)
+            response.headers.update(entry["headers"])
+            response.url = request.url
+            response.request = request
+            response.encoding = "utf-8"
+            return response
+        started = time.perf_counter()
+        response = original_send(session, request, **kwargs)
+        _store.record(request.method, request.url, body, response.status_code,
+                      dict(response.headers), response.content, (time.perf_counter() - started) * 1000)
+        return response
+
+    requests.Session.send = send
+
+
+def _install_httpx() -> None:
+    import httpx
+
+    original_send = httpx.AsyncClient.send
+
+    async def send(client, request, **kwargs):
+        url = str(request.url)
+        if not _should_handle(url):
+            return await original_send(client, request, **kwargs)
+        body = request.content or None
+        if CASSETTE_MODE == "replay":
+            entry = _store.replay(request.method, url, body)
+            if entry is None:
+                raise httpx.ConnectError(f"Cassette miss: {request.method} {url.split('?')[0]}", request=request)
+            if REPLAY_LATENCY:
+                await asyncio.sleep(entry["elapsed_ms"] / 1000)
+            return httpx.Response(entry["status"], headers=entry["headers"], content=_decode(entry), request=request)
+        started = time.perf_counter()
+        response = await original_send(client, request, **kwargs)
+        content = await response.aread()
+        _store.record(request.method, url, body, response.status_code,
+                      dict(response.headers), content, (time.perf_counter() - started) * 1000)
+        return response
+
+    httpx.AsyncClient.send = send
+
+
+def install_cassettes() -> bool:
+    """
+    Включить запись или воспроизведение (MARKET_DATA_CASSETTE_MODE=record|replay)
+    Вызывается один раз при старте процесса; в режиме off ничего не меняет
+
+    Returns:
+        True, если перехват запросов включён
+    """
+    global _store, _installed, _hosts
+    if _installed or CASSETTE_MODE not in ("record", "replay"):
+        return _installed
+    _hosts = _cassette_hosts()
+    day = CASSETTE_DATE if CASSETTE_MODE == "replay" else None
+    _store = CassetteStore(CASSETTE_DIR, day)
+    _install_requests()
+    try:
+        _install_httpx()
+    except ImportError:
+        pass
+    _installed = True
+    logger.warning(f"Market data cassettes: {CASSETTE_MODE} ({CASSETTE_DIR / _store.day}), hosts: {sorted(_hosts)}")
+    return True
+
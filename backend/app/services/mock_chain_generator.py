@@ -0,0 +1,218 @@
+"""
+Детерминированный генератор синтетических опционных цепочек
+ЗАЧЕМ: Нагрузочные тесты API без платных источников данных. Цепочка размера SPY
+(десятки экспираций, тысячи контрактов) с улыбкой волатильности и греками
+Блэка-Шоулза; одинаковые входные параметры всегда дают одинаковые данные
+Затрагивает: MockDataProvider (MOCK_SYNTHETIC_CHAINS, _auto_create_mock_data)
+"""
+
+import math
+import zlib
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+import numpy as np
+
+RISK_FREE_RATE = 0.045
+
+# Сколько ближайших недельных экспираций, месячных и квартальных (LEAPS) генерировать
+WEEKLY_EXPIRATIONS = 8
+MONTHLY_EXPIRATIONS = 12
+QUARTERLY_EXPIRATIONS = 8
+
+
+def _seed(*parts) -> int:
+    """Стабильный между процессами seed (hash() для строк рандомизирован)"""
+    return zlib.crc32("|".join(str(part) for part in parts).encode())
+
+
+def _third_friday(year: int, month: int) -> date:
+    first = date(year, month, 1)
+    return first + timedelta(days=(4 - first.weekday()) % 7 + 14)
+
+
+def _add_months(day: date, months: int) -> tuple:
+    index = day.year * 12 + day.month - 1 + months
+    return index // 12, index % 12 + 1
+
+
+def generate_expirations(as_of: date) -> List[str]:
+    """
+    Даты экспирации (YYYY-MM-DD): недельные пятницы, месячные третьи пятницы
+    на год вперёд и квартальные LEAPS ещё на два года
+    """
+    dates = set()
+    friday = as_of + timedelta(days=(4 - as_of.weekday()) % 7 or 7)
+    for week in range(WEEKLY_EXPIRATIONS):
+        dates.add(friday + timedelta(weeks=week))
+    for month in range(MONTHLY_EXPIRATIONS + 1):
+        dates.add(_third_friday(*_add_months(as_of, month)))
+    quarters, month = 0, MONTHLY_EXPIRATIONS
+    while quarters < QUARTERLY_EXPIRATIONS:
+        month += 1
+        year, calendar_month = _add_months(as_of, month)
+        if calendar_month % 3 == 0:
+            dates.add(_third_friday(year, calendar_month))
+            quarters += 1
+    return sorted(day.isoformat() for day in dates if day > as_of)
+
+
+def synthetic_spot(ticker: str) -> float:
+    """Цена базового актива для тикера без mock файла (10..510)"""
+    return round(10 + _seed(ticker) % 50000 / 100, 2)
+
+
+def synthetic_base_iv(ticker: str) -> float:
+    """ATM волатильность тикера (0.15..0.65)"""
+    return 0.15 + _seed(ticker, "iv") % 50 / 100
+
+
+def _strike_step(spot: float) -> float:
+    if spot < 25:
+        return 0.5
+    if spot < 100:
+        return 1.0
+    if spot < 250:
+        return 2.5
+    return 1.0 if spot < 1000 else 5.0
+
+
+@lru_cache(maxsize=512)
+def _generate_chain_cached(
+    ticker: str, spot: float, expiration_date: str, as_of: date, base_iv: float
+) -> tuple:
+    # scipy.stats импортируется больше секунды — только когда цепочка действительно нужна
+    from scipy.stats import norm
+
+    expiry = date.fromisoformat(expiration_date)
+    days = max((expiry - as_of).days, 1)
+    t = days / 365.0
+    rng = np.random.default_rng(_seed(ticker, expiration_date, as_of))
+
+    # Диапазон страйков шире для дальних экспираций: ±(4σ√T), но не меньше ±10%
+    step = _strike_step(spot)
+    width = min(max(4 * base_iv * math.sqrt(t), 0.10), 0.60) * spot
+    strikes = np.arange(
+        math.ceil((spot - width) / step) * step, spot + width + step / 2, step
+    )
+    strikes = strikes[strikes > 0]
+
+    # Улыбка: наклон (путы дороже) + кривизна по moneyness, нормированному на √T;
+    # срочная структура — ближние экспирации чуть дешевле
+    moneyness = np.log(strikes / spot) / math.sqrt(t)
+    term = 1 + 0.1 * min(math.log1p(t * 4), 1.0)
+    iv = base_iv * term * (1 - 0.18 * moneyness + 0.12 * moneyness ** 2)
+    iv = np.clip(iv, 0.05, 3.0)
+
+    sqrt_t = math.sqrt(t)
+    d1 = (np.log(spot / strikes) + (RISK_FREE_RATE + iv ** 2 / 2) * t) / (iv * sqrt_t)
+    d2 = d1 - iv * sqrt_t
+    discount = math.exp(-RISK_FREE_RATE * t)
+    pdf_d1 = norm.pdf(d1)
+    cdf_d1, cdf_d2 = norm.cdf(d1), norm.cdf(d2)
+
+    call_price = spot * cdf_d1 - strikes * discount * cdf_d2
+    put_price = call_price - spot + strikes * discount
+    gamma = pdf_d1 / (spot * iv * sqrt_t)
+    vega = spot * pdf_d1 * sqrt_t / 100
+    decay = -spot * pdf_d1 * iv / (2 * sqrt_t)
+    call_theta = (decay - RISK_FREE_RATE * strikes * discount * cdf_d2) / 365
+    put_theta = (decay + RISK_FREE_RATE * strikes * discount * (1 - cdf_d2)) / 365
+    call_rho = strikes * t * discount * cdf_d2 / 100
+    put_rho = -strikes * t * discount * (1 - cdf_d2) / 100
+
+    # Открытый интерес и объём: пик у денег, круглые страйки популярнее, дальние серии тоньше
+    distance = np.abs(strikes / spot - 1) / (base_iv * sqrt_t + 0.01)
+    popularity = np.exp(-distance ** 2 / 2) * np.where(strikes % (step * 5) == 0, 2.0, 1.0)
+    liquidity = 20000 / (1 + days / 30)
+
+    exp_code = expiry.strftime("%y%m%d")
+    contracts = []
+    for side, prices, deltas, thetas, rhos in (
+        ("CALL", call_price, cdf_d1, call_theta, call_rho),
+        ("PUT", put_price, cdf_d1 - 1, put_theta, put_rho),
+    ):
+        open_interest = (liquidity * popularity * rng.uniform(0.5, 1.5, len(strikes))).astype(int)
+        volume = (open_interest * rng.uniform(0.05, 0.4, len(strikes))).astype(int)
+        for i, strike in enumerate(strikes):
+            mid = max(float(prices[i]), 0.01)
+            spread = max(0.01, round(mid * 0.02, 2))
+            occ = f"O:{ticker}{exp_code}{side[0]}{int(round(strike * 1000)):08d}"
+            contracts.append({
+                "ticker": occ,
+                "underlying": ticker,
+                "expiration_date": expiration_date,
+                "strike": float(strike),
+                "type": side,
+                "option_type": side.lower(),
+                "contract_type": side.lower(),
+                "conid": _seed(occ) % 900000000,
+                "bid": round(max(mid - spread / 2, 0.0), 2),
+                "ask": round(mid + spread / 2, 2),
+                "last": round(mid, 2),
+                "last_price": round(mid, 2),
+                "volume": int(volume[i]),
+                "open_interest": int(open_interest[i]),
+                "iv": round(float(iv[i]), 4),
+                "implied_volatility": round(float(iv[i]), 4),
+                "delta": round(float(deltas[i]), 4),
+                "gamma": round(float(gamma[i]), 5),
+                "theta": round(float(thetas[i]), 4),
+                "vega": round(float(vega[i]), 4),
+                "rho": round(float(rhos[i]), 4),
+            })
+    return tuple(contracts)
+
+
+def generate_chain(
+    ticker: str,
+    spot: float,
+    expiration_date: str,
+    as_of: Optional[date] = None,
+    base_iv: Optional[float] = None
+) -> List[Dict]:
+    """
+    Опционная цепочка одной экспирации (коллы и путы по всем страйкам)
+
+    Контракты содержат поля mock формата (type, iv, last, conid) и нормализованного
+    формата клиентов (option_type, implied_volatility, last_price, expiration_date),
+    поэтому подходят и для MockDataProvider, и для calculate_all_metrics.
+    Результат кэшируется; возвращаются копии контрактов.
+    """
+    as_of = as_of or date.today()
+    base_iv = base_iv if base_iv is not None else synthetic_base_iv(ticker)
+    chain = _generate_chain_cached(ticker, round(spot, 2), expiration_date, as_of, base_iv)
+    return [dict(contract) for contract in chain]
+
+
+def generate_full_chain(ticker: str, spot: float, as_of: Optional[date] = None) -> List[Dict]:
+    """Цепочка по всем экспирациям generate_expirations"""
+    as_of = as_of or date.today()
+    contracts = []
+    for expiration in generate_expirations(as_of):
+        contracts.extend(generate_chain(ticker, spot, expiration, as_of))
+    return contracts
+
+
+def generate_quote(ticker: str, spot: Optional[float] = None) -> Dict:
+    """Котировка акции в формате mock файла stocks/<TICKER>.json"""
+    price = spot if spot is not None else synthetic_spot(ticker)
+    change = round(price * ((_seed(ticker, "chg") % 400) / 10000 - 0.02), 2)
+    return {
+        "ticker": ticker,
+        "price": price,
+        "bid": round(price - 0.01, 2),
+        "ask": round(price + 0.01, 2),
+        "high": round(price * 1.01, 2),
+        "low": round(price * 0.99, 2),
+        "volume": 1000000 + _seed(ticker, "vol") % 50000000,
+        "previous_close": round(price - change, 2),
+        "open": round(price - change / 2, 2),
+        "change": change,
+        "change_percent": round(change / (price - change) * 100, 2),
+        "market_cap": None,
+        "pe_ratio": None,
+        "dividend_yield": None,
+        "_source": "Synthetic generator",
+    }
@@ -1,16 +1,29 @@
 """
 Mock Data Provider - предоставляет mock данные для локальной разработки и тестирования
 Использует JSON файлы из backend/mock_data/
+С MOCK_SYNTHETIC_CHAINS=true тикеры без файлов обслуживаются синтетическими
+цепочками размера SPY (mock_chain_generator) — для нагрузочных тестов API
 """
 
 import os
+import copy
 import json
-from typing import Dict, List
+import threading
+from typing import Dict, List, Optional, Tuple
 import logging
-from datetime import datetime, timedelta
+from datetime import date, datetime
+
+from app.services import mock_chain_generator
 
 logger = logging.getLogger(__name__)
 
+# Разобранные JSON файлы: путь -> (mtime_ns, данные)
+# Общие для всех экземпляров — DataSourceFactory создаёт провайдер на каждый запрос
+_json_cache: Dict[str, Tuple[int, Dict]] = {}
+# Списки экспираций: директория -> (mtime_ns, {тикер: [экспирации]})
+_expirations_cache: Dict[str, Tuple[int, Dict[str, List[str]]]] = {}
+_cache_lock = threading.Lock()
+
 
 class MockDataProvider:
     """
@@ -18,12 +31,14 @@ class MockDataProvider:
     Читает данные из JSON файлов вместо реальных API запросов
     """
     
-    def __init__(self, mock_data_dir: str = None):
+    def __init__(self, mock_data_dir: str = None, synthetic: Optional[bool] = None):
         """
         Инициализация провайдера
         
         Args:
             mock_data_dir: Путь к директории с mock данными
+            synthetic: Генерировать данные для тикеров без файлов
+                (по умолчанию из MOCK_SYNTHETIC_CHAINS)
         """
         if mock_data_dir is None:
             # По умолчанию используем backend/mock_data
@@ -31,21 +46,31 @@ class MockDataProvider:
             mock_data_dir = os.path.join(base_dir, 'mock_data')
         
         self.mock_data_dir = mock_data_dir
+        if synthetic is None:
+            synthetic = os.getenv("MOCK_SYNTHETIC_CHAINS", "false").lower() == "true"
+        self.synthetic = synthetic
         logger.info(f"MockDataProvider initialized with dir: {mock_data_dir}")
     
     def _load_json(self, file_path: str) -> Dict:
         """
-        Загрузить JSON файл
+        Загрузить JSON файл (из кэша, пока не изменился mtime файла)
         
         Args:
             file_path: Путь к файлу
             
         Returns:
-            Dict с данными из файла
+            Dict с данными из файла (общий объект кэша — не изменять)
         """
         try:
+            mtime = os.stat(file_path).st_mtime_ns
+            cached = _json_cache.get(file_path)
+            if cached and cached[0] == mtime:
+                return cached[1]
             with open(file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+                data = json.load(f)
+            with _cache_lock:
+                _json_cache[file_path] = (mtime, data)
+            return data
         except FileNotFoundError:
             # Извлекаем имя файла для более понятного сообщения
             filename = os.path.basename(file_path)
@@ -83,62 +108,91 @@ class MockDataProvider:
         file_path = os.path.join(self.mock_data_dir, 'stocks', f'{ticker}.json')
         logger.info(f"Loading stock price for {ticker} from mock data")
         
+        if self.synthetic and not os.path.exists(file_path):
+            return mock_chain_generator.generate_quote(ticker)
+        
         try:
-            return self._load_json(file_path)
+            return dict(self._load_json(file_path))
         except FileNotFoundError:
             # Автоматически создаем mock данные для нового тикера
             logger.warning(f"Mock data not found for {ticker}, creating template...")
             self._auto_create_mock_data(ticker)
             # Пробуем загрузить снова
-            return self._load_json(file_path)
+            return dict(self._load_json(file_path))
     
-    def get_expiration_dates(self, ticker: str) -> List[str]:
+    def _list_expirations(self) -> Dict[str, List[str]]:
+        """Экспирации всех тикеров из имён файлов (перечитывается при изменении директории)"""
+        options_dir = os.path.join(self.mock_data_dir, 'options_chains')
+        mtime = os.stat(options_dir).st_mtime_ns
+        cached = _expirations_cache.get(options_dir)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        
+        by_ticker: Dict[str, List[str]] = {}
+        for filename in os.listdir(options_dir):
+            if filename.endswith('.json') and '_' in filename:
+                # Формат: TICKER_EXPIRATION.json
+                ticker, expiration = filename[:-len('.json')].split('_', 1)
+                by_ticker.setdefault(ticker, []).append(expiration)
+        for expirations in by_ticker.values():
+            expirations.sort()
+        with _cache_lock:
+            _expirations_cache[options_dir] = (mtime, by_ticker)
+        return by_ticker
+    
+    def get_expiration_dates(self, ticker: str, max_pages: Optional[int] = None) -> List[str]:
         """
         Получить список дат экспирации опционов из mock данных
         
         Args:
             ticker: Тикер акции
+            max_pages: Не используется (совместимость с PolygonClient)
             
         Returns:
             List дат экспирации в формате MMMYY
+            (YYYY-MM-DD для синтетических цепочек)
         """
-        options_dir = os.path.join(self.mock_data_dir, 'options_chains')
-        
-        # Поиск всех файлов options chains для данного тикера
-        expirations = []
         try:
-            for filename in os.listdir(options_dir):
-                if filename.startswith(f'{ticker}_') and filename.endswith('.json'):
-                    # Извлекаем дату экспирации из имени файла
-                    # Формат: TICKER_EXPIRATION.json -> EXPIRATION
-                    expiration = filename.replace(f'{ticker}_', '').replace('.json', '')
-                    expirations.append(expiration)
-            
-            logger.info(f"Found {len(expirations)} expirations for {ticker} in mock data")
-            return sorted(expirations)
+            expirations = list(self._list_expirations().get(ticker, []))
         except FileNotFoundError:
-            logger.warning(f"Options chains directory not found: {options_dir}")
-            return []
+            logger.warning(f"Options chains directory not found: {self.mock_data_dir}")
+            expirations = []
+        
+        if not expirations and self.synthetic:
+            return mock_chain_generator.generate_expirations(date.today())
+        logger.info(f"Found {len(expirations)} expirations for {ticker} in mock data")
+        return expirations
     
-    def get_options_chain(self, ticker: str, expiration: str) -> List[Dict]:
+    def get_options_chain(self, ticker: str, expiration: Optional[str] = None) -> List[Dict]:
         """
         Получить опционную цепочку из mock данных
         
         Args:
             ticker: Тикер акции
-            expiration: Дата экспирации в формате MMMYY (например, NOV25)
+            expiration: Дата экспирации в формате MMMYY (например, NOV25);
+                без неё — все экспирации тикера
             
         Returns:
             List опционов с данными
         """
+        if expiration is None:
+            options = []
+            for exp in self.get_expiration_dates(ticker):
+                options.extend(self.get_options_chain(ticker, exp))
+            return options
+        
         file_path = os.path.join(
             self.mock_data_dir, 
             'options_chains', 
             f'{ticker}_{expiration}.json'
         )
+        if self.synthetic and not os.path.exists(file_path):
+            spot = self.get_stock_price(ticker)['price']
+            return mock_chain_generator.generate_chain(ticker, spot, expiration)
+        
         logger.info(f"Loading options chain for {ticker} {expiration} from mock data")
         data = self._load_json(file_path)
-        return data.get('options', [])
+        return [dict(option) for option in data.get('options', [])]
     
     def get_metrics(self, ticker: str) -> Dict:
         """
@@ -153,7 +207,7 @@ class MockDataProvider:
         file_path = os.path.join(self.mock_data_dir, 'analyzers', f'{ticker}.json')
         logger.info(f"Loading metrics for {ticker} from mock data")
         data = self._load_json(file_path)
-        return data.get('step2_metrics', {})
+        return dict(data.get('step2_metrics', {}))
     
     def get_analyzer_data(self, ticker: str) -> Dict:
         """
@@ -167,7 +221,7 @@ class MockDataProvider:
         """
         file_path = os.path.join(self.mock_data_dir, 'analyzers', f'{ticker}.json')
         logger.info(f"Loading analyzer data for {ticker} from mock data")
-        return self._load_json(file_path)
+        return copy.deepcopy(self._load_json(file_path))
     
     def search_contract(self, ticker: str) -> int:
         """
@@ -256,50 +310,18 @@ class MockDataProvider:
             "_notes": f"Auto-generated mock data for {ticker}. Replace with real values if needed."
         }
         
-        # Options chain template
-        exp_date = (datetime.now() + timedelta(days=30)).strftime("%Y-%m-%d")
-        strikes = [price - 5, price - 2.5, price, price + 2.5, price + 5]
-        options = []
-        
-        for i, strike in enumerate(strikes):
-            # CALL
-            options.append({
-                "strike": strike,
-                "type": "CALL",
-                "conid": abs(hash(ticker + str(strike))) % 900000,
-                "bid": max(0.1, price - strike + 2.0),
-                "ask": max(0.2, price - strike + 2.2),
-                "last": max(0.15, price - strike + 2.1),
-                "volume": 500,
-                "open_interest": 2000,
-                "iv": 0.25,
-                "delta": 0.5,
-                "gamma": 0.05,
-                "theta": -0.15,
-                "vega": 0.12,
-                "rho": 0.05
-            })
-            # PUT
-            options.append({
-                "strike": strike,
-                "type": "PUT",
-                "conid": abs(hash(ticker + str(strike) + "P")) % 900000,
-                "bid": max(0.1, strike - price + 2.0),
-                "ask": max(0.2, strike - price + 2.2),
-                "last": max(0.15, strike - price + 2.1),
-                "volume": 450,
-                "open_interest": 1800,
-                "iv": 0.26,
-                "delta": -0.5,
-                "gamma": 0.05,
-                "theta": -0.14,
-                "vega": 0.12,
-                "rho": -0.05
-            })
+        # Options chain: синтетическая цепочка ближайшей экспирации через 3+ недели
+        as_of = date.today()
+        exp_date = next(
+            exp for exp in mock_chain_generator.generate_expirations(as_of)
+            if (date.fromisoformat(exp) - as_of).days >= 21
+        )
+        expiration = date.fromisoformat(exp_date).strftime("%b%y").upper()
+        options = mock_chain_generator.generate_chain(ticker, price, exp_date, as_of)
         
         options_data = {
             "ticker": ticker,
-            "expiration": "DEC25",
+            "expiration": expiration,
             "expiration_date": exp_date,
             "underlying_price": price,
             "options": options,
@@ -331,7 +353,7 @@ class MockDataProvider:
         with open(os.path.join(stocks_dir, f'{ticker}.json'), 'w') as f:
             json.dump(stock_data, f, indent=2)
         
-        with open(os.path.join(options_dir, f'{ticker}_DEC25.json'), 'w') as f:
+        with open(os.path.join(options_dir, f'{ticker}_{expiration}.json'), 'w') as f:
             json.dump(options_data, f, indent=2)
         
         with open(os.path.join(analyzers_dir, f'{ticker}.json'), 'w') as f:
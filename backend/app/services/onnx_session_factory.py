@@ -0,0 +1,110 @@
+"""
+Фабрика ONNX Runtime сессий с явными настройками и кэшем оптимизированного графа
+ЗАЧЕМ: Первый запрос после деплоя не должен платить за оптимизацию графа,
+а воркеры не должны конкурировать за все ядра CPU с дефолтными потоками ORT
+Затрагивает: AIPredictionService (прогноз IV), /health
+"""
+
+import os
+import logging
+from typing import TYPE_CHECKING, Optional, Tuple
+
+# onnxruntime импортируется в функциях — import app.main не грузит рантайм,
+# он нужен только при создании сессии (прогрев модели)
+if TYPE_CHECKING:
+    import onnxruntime as ort
+
+logger = logging.getLogger(__name__)
+
+# Настройки ONNX Runtime (переопределяются через .env)
+# ЗАЧЕМ: Явное число потоков вместо дефолта ORT (все ядра на каждый воркер)
+INTRA_OP_THREADS = int(os.getenv("AI_MODEL_INTRA_OP_THREADS", "1"))
+INTER_OP_THREADS = int(os.getenv("AI_MODEL_INTER_OP_THREADS", "1"))
+
+PROVIDERS = ['CPUExecutionProvider']
+
+
+def get_optimized_model_path(model_path: str) -> str:
+    """
+    Путь к закэшированной оптимизированной модели
+    ЗАЧЕМ: Оптимизация графа выполняется один раз, при следующих стартах грузим готовый граф
+    """
+    cache_dir = os.getenv(
+        "AI_MODEL_CACHE_DIR",
+        os.path.join(os.path.dirname(model_path), '.cache')
+    )
+    base_name = os.path.splitext(os.path.basename(model_path))[0]
+    return os.path.join(cache_dir, f"{base_name}.optimized.onnx")
+
+
+def build_session_options(already_optimized: bool) -> "ort.SessionOptions":
+    """Настройки сессии: потоки и уровень оптимизации графа"""
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = INTRA_OP_THREADS
+    options.inter_op_num_threads = INTER_OP_THREADS
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    if already_optimized:
+        # Граф уже оптимизирован — повторная оптимизация не нужна
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+    else:
+        # EXTENDED — максимальный уровень, при котором сохранённый граф
+        # не содержит аппаратно-зависимых преобразований (NCHWc)
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED
+    return options
+
+
+def _load_cached_session(optimized_path: str, model_path: str) -> Optional["ort.InferenceSession"]:
+    """Загрузить оптимизированную модель из кэша, если она новее исходной"""
+    import onnxruntime as ort
+
+    if not os.path.exists(optimized_path):
+        return None
+    if os.path.getmtime(optimized_path) < os.path.getmtime(model_path):
+        return None
+
+    try:
+        return ort.InferenceSession(
+            optimized_path,
+            sess_options=build_session_options(already_optimized=True),
+            providers=PROVIDERS
+        )
+    except Exception as e:
+        logger.warning(f"⚠️ Optimized model cache is invalid, rebuilding: {e}")
+        return None
+
+
+def create_inference_session(model_path: str) -> Tuple["ort.InferenceSession", bool]:
+    """
+    Синхронное создание сессии с использованием кэша оптимизированной модели
+
+    Returns:
+        (session, loaded_from_cache)
+    """
+    import onnxruntime as ort
+
+    optimized_path = get_optimized_model_path(model_path)
+
+    session = _load_cached_session(optimized_path, model_path)
+    if session is not None:
+        return session, True
+
+    options = build_session_options(already_optimized=False)
+    try:
+        os.makedirs(os.path.dirname(optimized_path), exist_ok=True)
+        options.optimized_model_filepath = optimized_path
+        # Веса исходной модели лежат во внешнем .data файле — сохраняем их рядом
+        # с оптимизированной моделью, чтобы кэш был самодостаточным
+        options.add_session_config_entry(
+            "session.optimized_model_external_initializers_file_name",
+            f"{os.path.basename(optimized_path)}.data"
+        )
+        options.add_session_config_entry(
+            "session.optimized_model_external_initializers_min_size_in_bytes", "1024"
+        )
+    except OSError as e:
+        logger.warning(f"⚠️ Cannot write optimized model cache: {e}")
+
+    session = ort.InferenceSession(model_path, sess_options=options, providers=PROVIDERS)
+    return session, False
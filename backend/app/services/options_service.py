@@ -3,11 +3,14 @@ Options Service
 Сервис для работы с опционными данными через Polygon.io API
 """
 
+import logging
 import os
 import requests
 from typing import Dict, List, Optional
 from datetime import datetime, timedelta
 
+logger = logging.getLogger(__name__)
+
 
 class OptionsService:
     """Сервис для получения опционных данных"""
@@ -17,7 +20,7 @@ class OptionsService:
         if not self.api_key:
             raise ValueError("POLYGON_API_KEY не найден в .env файле")
         
-        self.base_url = "https://api.polygon.io"
+        self.base_url = os.getenv("POLYGON_BASE_URL", "https://api.polygon.io").rstrip("/")
     
     def get_option_expirations(self, ticker: str) -> List[str]:
         """
@@ -78,7 +81,7 @@ class OptionsService:
             return future_expirations  # Возвращаем все даты
             
         except Exception as e:
-            print(f"Error fetching option expirations: {e}")
+            logger.error("Error fetching option expirations: %s", e)
             return []
     
     def get_options_chain(
@@ -110,7 +113,7 @@ class OptionsService:
                 params["expiration_date.gte"] = expiration_date
                 params["expiration_date.lte"] = expiration_date
             
-            print(f"🔍 Fetching options chain for {ticker}, date: {expiration_date}")
+            logger.debug("🔍 Fetching options chain for %s, date: %s", ticker, expiration_date)
             
             all_contracts = []
             page = 0
@@ -141,25 +144,22 @@ class OptionsService:
                     break
                     
                 page += 1
-                if page > 0:
-                    print(f"   Fetching page {page + 1}...")
+                logger.debug("   Fetching page %d...", page + 1)
 
-            print(f"📦 Snapshot API response status: {data.get('status')}")
-            
             if not all_contracts:
-                print(f"⚠️ No contracts found, generating mock data for {ticker}")
+                logger.warning("⚠️ No contracts found, generating mock data for %s", ticker)
                 return self._generate_mock_options(ticker, expiration_date)
                 
             contracts = all_contracts
-            print(f"📊 Found {len(contracts)} contracts total")
+            logger.info("📊 %s %s: %d contracts (status %s)",
+                        ticker, expiration_date, len(contracts), data.get('status'))
             
             # Извлекаем полные данные из snapshot
             options_list = []
             
             # Логирование первых 3 контрактов для отладки real-time данных
-            print(f"\n{'='*80}")
-            print(f"📊 BACKEND: Обработка опционов для {ticker} {expiration_date}")
-            print(f"{'='*80}")
+            # ЗАЧЕМ: Проверка уровня один раз на цепочку, а не на каждый контракт
+            debug_contracts = 3 if logger.isEnabledFor(logging.DEBUG) else 0
             
             for idx, contract in enumerate(contracts):
                 details = contract.get("details", {})
@@ -200,14 +200,14 @@ class OptionsService:
                 )
                 
                 # Логируем первые 3 контракта
-                if idx < 3:
-                    print(f"\n🔹 CONTRACT #{idx + 1}: {contract_type.upper()} Strike ${strike}")
-                    print(f"   - bid: {bid:.2f} (orig: {last_quote.get('bid', 0)})")
-                    print(f"   - ask: {ask:.2f} (orig: {last_quote.get('ask', 0)})")
-                    print(f"   - last: {last_price}")
-                    print(f"   - is_realtime: {is_realtime}")
-                    print(f"   - volume: {day_data.get('volume', 0)}")
-                    print(f"   - open_interest: {contract.get('open_interest', 0)}")
+                if idx < debug_contracts:
+                    logger.debug(
+                        "🔹 CONTRACT #%d: %s Strike $%s bid=%.2f (orig %s) ask=%.2f (orig %s) "
+                        "last=%s is_realtime=%s volume=%s open_interest=%s",
+                        idx + 1, contract_type.upper(), strike, bid, last_quote.get('bid', 0),
+                        ask, last_quote.get('ask', 0), last_price, is_realtime,
+                        day_data.get('volume', 0), contract.get('open_interest', 0)
+                    )
                 
                 # Полные данные опциона с real-time ценами
                 option_data = {
@@ -245,12 +245,10 @@ class OptionsService:
                 
                 options_list.append(option_data)
             
-            print(f"{'='*80}\n")
-            
             return options_list
             
         except Exception as e:
-            print(f"Error fetching options chain: {e}")
+            logger.error("Error fetching options chain for %s: %s", ticker, e)
             return []
     
     def _get_option_price(self, option_ticker: str) -> Dict:
@@ -288,7 +286,7 @@ class OptionsService:
             }
             
         except Exception as e:
-            print(f"Error fetching option price for {option_ticker}: {e}")
+            logger.error("Error fetching option price for %s: %s", option_ticker, e)
             return {"price": 0}
     
     def calculate_pl(
@@ -422,18 +420,18 @@ class OptionsService:
             strike_formatted = f"{int(strike * 1000):08d}"  # 230 -> 00230000
             
             option_ticker = f"O:{ticker}{exp_date}{option_letter}{strike_formatted}"
-            print(f"🔍 Fetching details for: {option_ticker}")
+            logger.debug("🔍 Fetching details for: %s", option_ticker)
             
             # Получаем snapshot для bid/ask/volume/oi
-            snapshot_url = f"https://api.polygon.io/v3/snapshot/options/{ticker}/{option_ticker}"
+            snapshot_url = f"{self.base_url}/v3/snapshot/options/{ticker}/{option_ticker}"
             params = {"apiKey": self.api_key}
             
             snapshot_response = requests.get(snapshot_url, params=params, timeout=10)
-            print(f"📡 Snapshot response status: {snapshot_response.status_code}")
+            logger.debug("📡 Snapshot response status: %s", snapshot_response.status_code)
             
             if snapshot_response.status_code == 200:
                 snapshot_data = snapshot_response.json()
-                print(f"📦 Snapshot data: {snapshot_data}")
+                logger.debug("📦 Snapshot data: %s", snapshot_data)
                 results = snapshot_data.get('results', {})
                 
                 day_data = results.get('day', {})
@@ -454,19 +452,14 @@ class OptionsService:
                     ask = premium * 1.02
                 
                 # Логирование для отладки
-                print(f"\n{'='*80}")
-                print(f"📊 BACKEND: Детали опциона {option_ticker}")
-                print(f"   - bid: {bid}")
-                print(f"   - ask: {ask}")
-                print(f"   - last: {premium}")
-                print(f"{'='*80}\n")
+                logger.debug("📊 Детали опциона %s: bid=%s ask=%s last=%s", option_ticker, bid, ask, premium)
                 
                 # Получаем Greeks из snapshot данных
                 greeks = results.get('greeks', {})
                 
                 # Получаем implied_volatility из results (Polygon API возвращает его в корне results)
                 implied_volatility = results.get('implied_volatility', 0)
-                print(f"📊 Implied Volatility from API: {implied_volatility}")
+                logger.debug("📊 Implied Volatility from API: %s", implied_volatility)
                 
                 # Если Greeks отсутствуют, генерируем mock данные для тестирования
                 if not greeks or all(v == 0 for v in greeks.values()):
@@ -495,7 +488,7 @@ class OptionsService:
                 # Если IV не пришла от API или равна 0, используем mock значение 25%
                 if implied_volatility == 0 or implied_volatility is None:
                     implied_volatility = 0.25
-                    print(f"⚠️ Using mock IV: {implied_volatility}")
+                    logger.warning("⚠️ Using mock IV: %s", implied_volatility)
                 
                 return {
                     "strike": strike,
@@ -513,7 +506,7 @@ class OptionsService:
                     "implied_volatility": implied_volatility
                 }
             else:
-                print(f"❌ Snapshot failed with status: {snapshot_response.status_code}")
+                logger.error("❌ Snapshot failed with status: %s", snapshot_response.status_code)
                 # Fallback - возвращаем базовые данные с mock Greeks
                 # Mock Greeks для тестирования
                 current_price = 245.27  # Примерная текущая цена AAPL
@@ -547,7 +540,7 @@ class OptionsService:
                 }
                 
         except Exception as e:
-            print(f"Error fetching option details: {e}")
+            logger.error("Error fetching option details: %s", e)
             # Возвращаем данные с mock Greeks при ошибке
             current_price = 245.27  # Примерная текущая цена AAPL
             moneyness = strike / current_price  # ATM = 1.0, ITM < 1.0, OTM > 1.0
@@ -646,12 +639,12 @@ class OptionsService:
             # Шаг 1: Получаем ближайшие даты экспирации
             expirations = self.get_option_expirations(ticker)
             if not expirations:
-                print(f"⚠️ No expirations found for {ticker}")
+                logger.warning("⚠️ No expirations found for %s", ticker)
                 return {"surface": {}, "expirations": [], "data_points": 0}
             
             # Берём только первые N дат
             selected_expirations = expirations[:num_expirations]
-            print(f"📊 Loading IV Surface for {ticker}, dates: {selected_expirations}")
+            logger.debug("📊 Loading IV Surface for %s, dates: %s", ticker, selected_expirations)
             
             # Шаг 2: Загружаем опционы для каждой даты
             surface = {}
@@ -682,7 +675,7 @@ class OptionsService:
                         surface[strike][days_to_exp] = iv_decimal
                         total_points += 1
             
-            print(f"✅ IV Surface loaded: {len(surface)} strikes, {total_points} data points")
+            logger.debug("✅ IV Surface loaded: %s strikes, %s data points", len(surface), total_points)
             
             return {
                 "surface": surface,
@@ -691,5 +684,5 @@ class OptionsService:
             }
             
         except Exception as e:
-            print(f"❌ Error fetching IV Surface: {e}")
+            logger.error("❌ Error fetching IV Surface: %s", e)
             return {"surface": {}, "expirations": [], "data_points": 0}
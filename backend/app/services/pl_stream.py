@@ -0,0 +1,275 @@
+"""
+Поток P&L и Greeks калькулятора по WebSocket: пересчёт только при изменении входов
+ЗАЧЕМ: Открытый калькулятор опрашивал /calculate/curve и цену тикера по таймеру и
+каждый раз пересчитывал всю кривую, даже если ничего не изменилось. Теперь клиент
+подписывается позициями, хаб раз в PL_STREAM_INTERVAL читает входы по тикеру один
+раз на всех подписчиков (цепочка TradingView или кэш цен Polygon) и пересчитывает
+подписку, только если цена или IV сдвинулись больше порога; клиенту уходят
+изменившиеся точки кривой и Greeks
+Затрагивает: routers/pl_stream (/api/universal/ws/pl), calculators, tradingview_service,
+ticker_price_cache (цена обновляется хабом раз в PRICE_TTL, а не каждым клиентом)
+
+Кривая P&L зависит от сетки цен и IV, но не от текущей цены — сетка привязана к
+цене на момент подписки и сдвигается (новый snapshot), только когда цена ушла
+дальше половины диапазона. Движение цены меняет лишь Greeks и P&L в текущей точке.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.calculators import FuturesPLCalculator, StocksPLCalculator
+from app.services import ticker_price_cache
+from app.services.tradingview_chain_store import ChainIndex
+from app.services.tradingview_service import get_tradingview_service
+
+logger = logging.getLogger(__name__)
+
+# Период проверки входов, секунды
+PL_STREAM_INTERVAL = float(os.getenv("PL_STREAM_INTERVAL", "1.0"))
+# Относительное изменение цены, после которого пересчитываются Greeks (0.001 = 0.1%)
+PRICE_THRESHOLD = float(os.getenv("PL_STREAM_PRICE_THRESHOLD", "0.001"))
+# Абсолютное изменение IV позиции, после которого пересчитывается кривая (0.005 = 0.5 п.п.)
+IV_THRESHOLD = float(os.getenv("PL_STREAM_IV_THRESHOLD", "0.005"))
+# Изменение точки кривой меньше этого (в $) не отправляется
+CURVE_EPSILON = 0.01
+GREEKS_EPSILON = 1e-4
+# Медленный клиент не должен задерживать рассылку остальным
+SEND_TIMEOUT = 2.0
+
+Send = Callable[[Dict], Awaitable[None]]
+
+
+class Subscription:
+    """Подписка одного калькулятора: позиции, параметры кривой и последнее отправленное"""
+
+    def __init__(self, send: Send, params: Dict[str, Any],
+                 on_failure: Optional[Callable[[], None]] = None):
+        self.send = send
+        # Вызывается, если отправка не прошла: соединение нужно закрыть (роутер)
+        self.on_failure = on_failure
+        self.ticker = params['ticker'].upper()
+        self.positions: List[Dict] = params['positions']
+        self.price_range_percent = params['price_range_percent']
+        self.num_points = params['num_points']
+        self.target_days = params.get('target_days')
+        # Цена от клиента — пока нет ни цепочки, ни кэша цен
+        self.fallback_price: Optional[float] = params.get('current_price')
+        if params['mode'] == 'stocks':
+            self.calculator = StocksPLCalculator(
+                risk_free_rate=params['risk_free_rate'],
+                dividend_yield=params['dividend_yield']
+            )
+        else:
+            self.calculator = FuturesPLCalculator(
+                point_value=params.get('point_value') or 50,
+                risk_free_rate=params['risk_free_rate']
+            )
+        self.seq = 0
+        self.price: Optional[float] = None
+        self.ivs: Optional[List[float]] = None
+        self.anchor: Optional[float] = None
+        self.curve: List[Dict] = []
+        self.greeks: Dict[str, float] = {}
+        # Пересчёт идёт в потоке — первый snapshot из subscribe и тик хаба не должны пересечься
+        self.lock = asyncio.Lock()
+
+    def update(self, price: float, ivs: List[float], source: str) -> Optional[Dict]:
+        """
+        Пересчитать то, что зависит от сдвинувшихся входов
+
+        Returns:
+            Сообщение snapshot / diff или None, если входы в пределах порогов
+        """
+        price_moved = self.price is None or abs(price - self.price) > self.price * PRICE_THRESHOLD
+        iv_moved = self.ivs is None or any(abs(new - old) > IV_THRESHOLD for new, old in zip(ivs, self.ivs))
+        if not (price_moved or iv_moved):
+            return None
+        # Запоминаем значения только при пересечении порога — медленный дрейф накапливается
+        self.price, self.ivs = price, ivs
+        positions = [{**position, 'iv': iv} for position, iv in zip(self.positions, ivs)]
+
+        reanchor = self.anchor is None or abs(price - self.anchor) > self.anchor * self.price_range_percent / 2
+        curve_changes = None
+        if reanchor or (iv_moved and self.target_days):
+            self.anchor = price if reanchor else self.anchor
+            curve = self.calculator.generate_pl_curve(
+                positions=positions,
+                current_price=self.anchor,
+                price_range_percent=self.price_range_percent,
+                num_points=self.num_points,
+                target_days=self.target_days
+            )
+            if not reanchor:
+                curve_changes = [
+                    [i, point['pl']] for i, (point, old) in enumerate(zip(curve, self.curve))
+                    if abs(point['pl'] - old['pl']) >= CURVE_EPSILON
+                ]
+            self.curve = curve
+
+        summary = self.calculator.calculate_portfolio_pl(
+            positions=positions,
+            current_price=price,
+            target_price=price,
+            target_days=self.target_days
+        )
+        greeks = summary['total_greeks']
+        greeks_changed = any(abs(greeks[k] - self.greeks.get(k, 0)) >= GREEKS_EPSILON for k in greeks)
+        self.greeks = greeks
+        self.seq += 1
+
+        message = {
+            'type': 'snapshot' if reanchor else 'diff',
+            'seq': self.seq,
+            'ticker': self.ticker,
+            'price': price,
+            'source': source,
+            'ivs': ivs,
+            'pl_now': summary['total_pl_with_time'] if self.target_days else summary['total_pl_at_expiry'],
+            'timestamp': time.time()
+        }
+        if reanchor:
+            message.update(curve=self.curve, greeks=greeks)
+        else:
+            if curve_changes:
+                message['curve_changes'] = curve_changes
+            if greeks_changed:
+                message['greeks'] = greeks
+        return message
+
+
+class PLStreamHub:
+    """Подписки воркера и общий цикл проверки входов (одна задача на все соединения)"""
+
+    def __init__(self):
+        self._subscriptions: Dict[int, Subscription] = {}
+        self._task: Optional[asyncio.Task] = None
+        # Тикер -> задача запроса цены у Polygon (ссылка, чтобы задачу не собрал GC)
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        # Тикер -> monotonic время, раньше которого цену не запрашиваем повторно
+        self._refresh_after: Dict[str, float] = {}
+
+    def subscription_count(self) -> int:
+        return len(self._subscriptions)
+
+    async def subscribe(self, subscription: Subscription) -> None:
+        """Добавить подписку и сразу отправить snapshot (клиент не ждёт интервал)"""
+        self._subscriptions[id(subscription)] = subscription
+        await self._push(subscription, await self._read_inputs(subscription.ticker))
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscriptions.pop(id(subscription), None)
+
+    async def _read_inputs(self, ticker: str) -> Dict[str, Any]:
+        """
+        Цена и индекс цепочки тикера: свежая цепочка TradingView, иначе кэш цен Polygon
+        Индекс берётся один раз на тикер за тик (одна сверка версии в shared_state),
+        IV всех позиций подписчиков читаются из него без обращений к Redis
+        """
+        # shared_state (Redis) читается в потоке; фоновый запрос цены ставится из event loop
+        inputs = await asyncio.to_thread(self._load_inputs, ticker)
+        if inputs.pop('price_stale'):
+            self._refresh_price(ticker)
+        return inputs
+
+    @staticmethod
+    def _load_inputs(ticker: str) -> Dict[str, Any]:
+        service = get_tradingview_service()
+        index = service.get_chain_index(ticker)
+        if index is not None and index.underlying_price and service.is_fresh(index):
+            return {'price': index.underlying_price, 'source': 'tradingview', 'index': index,
+                    'price_stale': False}
+
+        record = ticker_price_cache.get_cached(ticker)
+        price = record['data'].get('price') if record else None
+        # Устаревшая цепочка всё ещё даёт IV позиций
+        return {'price': price, 'source': 'polygon' if price else None, 'index': index,
+                'price_stale': not ticker_price_cache.is_fresh(record)}
+
+    def _refresh_price(self, ticker: str) -> None:
+        """Обновить цену в фоне — один запрос на тикер для всех подписчиков"""
+        if ticker in self._refreshing or time.monotonic() < self._refresh_after.get(ticker, 0):
+            return
+
+        async def refresh():
+            try:
+                await asyncio.to_thread(ticker_price_cache.fetch_price, ticker)
+            except Exception as e:
+                logger.warning("PL stream: price refresh failed for %s: %s", ticker, e)
+            finally:
+                # И после ошибки — не чаще раза в PRICE_TTL (Polygon лежит или лимит)
+                self._refresh_after[ticker] = time.monotonic() + ticker_price_cache.PRICE_TTL
+                self._refreshing.pop(ticker, None)
+
+        self._refreshing[ticker] = asyncio.create_task(refresh())
+
+    @staticmethod
+    def _position_ivs(subscription: Subscription, index: Optional[ChainIndex]) -> List[float]:
+        """IV позиций: из котировки цепочки, если у позиции указана экспирация"""
+        ivs = []
+        for position in subscription.positions:
+            iv = position['iv']
+            if index is not None and position.get('expiration'):
+                quote = index.quote(position['expiration'], position['strike'], position['option_type'])
+                if quote and quote.get('implied_volatility', 0) > 0:
+                    iv = quote['implied_volatility']
+            ivs.append(iv)
+        return ivs
+
+    def _recompute(self, subscription: Subscription, price: float,
+                   inputs: Dict[str, Any]) -> Optional[Dict]:
+        return subscription.update(
+            price, self._position_ivs(subscription, inputs['index']), inputs['source'] or 'client'
+        )
+
+    async def _push(self, subscription: Subscription, inputs: Dict[str, Any]) -> None:
+        price = inputs['price'] or subscription.fallback_price
+        if not price:
+            return
+        async with subscription.lock:
+            # Кривая и Greeks (numpy) считаются в потоке — event loop обслуживает остальные сокеты
+            message = await asyncio.to_thread(self._recompute, subscription, price, inputs)
+            if message is None:
+                return
+            try:
+                await asyncio.wait_for(subscription.send(message), SEND_TIMEOUT)
+            except Exception as e:
+                # Клиент отключился или не читает; таймаут мог оборвать send посреди кадра —
+                # соединение больше не годится, роутер закрывает его (иначе сокет висел бы открытым)
+                logger.debug("PL stream: send failed for %s: %s", subscription.ticker, e)
+                self.unsubscribe(subscription)
+                if subscription.on_failure is not None:
+                    subscription.on_failure()
+
+    async def _push_safe(self, subscription: Subscription, inputs: Dict[str, Any]) -> None:
+        try:
+            await self._push(subscription, inputs)
+        except Exception as e:
+            logger.exception("PL stream: update failed for %s: %s", subscription.ticker, e)
+
+    async def _run(self) -> None:
+        while self._subscriptions:
+            await asyncio.sleep(PL_STREAM_INTERVAL)
+            subscriptions = list(self._subscriptions.values())
+            tickers = list({subscription.ticker for subscription in subscriptions})
+            results = await asyncio.gather(
+                *(self._read_inputs(ticker) for ticker in tickers), return_exceptions=True
+            )
+            inputs_by_ticker: Dict[str, Dict[str, Any]] = {}
+            for ticker, result in zip(tickers, results):
+                if isinstance(result, Exception):
+                    logger.warning("PL stream: inputs failed for %s: %s", ticker, result)
+                else:
+                    inputs_by_ticker[ticker] = result
+            # Подписки пересчитываются параллельно в потоках; медленный клиент не задерживает остальных
+            await asyncio.gather(*(
+                self._push_safe(subscription, inputs_by_ticker[subscription.ticker])
+                for subscription in subscriptions if subscription.ticker in inputs_by_ticker
+            ))
+
+
+hub = PLStreamHub()
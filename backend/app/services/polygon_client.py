@@ -3,11 +3,14 @@ Polygon.io API Client
 Получение опционных данных и цен акций
 """
 
+import logging
 import os
 import requests
 from typing import Dict, List, Optional
 from datetime import datetime, timedelta
 
+logger = logging.getLogger(__name__)
+
 
 class PolygonClient:
     """Клиент для работы с Polygon.io API"""
@@ -18,7 +21,7 @@ class PolygonClient:
         if not self.api_key:
             raise ValueError("POLYGON_API_KEY не найден в .env файле")
         
-        self.base_url = "https://api.polygon.io"
+        self.base_url = os.getenv("POLYGON_BASE_URL", "https://api.polygon.io").rstrip("/")
     
     def get_stock_price(self, ticker: str) -> Dict:
         """
@@ -144,7 +147,7 @@ class PolygonClient:
         
         try:
             # Сначала пробуем reference API с пагинацией для получения ВСЕХ контрактов
-            print(f"🔍 Получаем ВСЕ даты экспирации через reference API для {ticker}")
+            logger.debug("🔍 Получаем ВСЕ даты экспирации через reference API для %s", ticker)
             
             # Получаем текущую дату и дату через 2 года для максимального охвата
             today = datetime.now().date()
@@ -155,7 +158,7 @@ class PolygonClient:
             page = 1
             
             while page <= max_pages:
-                print(f"📄 Загружаем страницу {page}/{max_pages} дат экспирации для {ticker}")
+                logger.debug("📄 Загружаем страницу %d/%d дат экспирации для %s", page, max_pages, ticker)
                 
                 params = {
                     "apiKey": self.api_key,
@@ -176,15 +179,15 @@ class PolygonClient:
                 data = response.json()
                 
                 if data.get("status") != "OK":
-                    print(f"⚠️ Статус не OK на странице {page}")
+                    logger.warning("⚠️ Статус не OK на странице %d (%s)", page, ticker)
                     break
                 
                 results = data.get("results", [])
                 if not results:
-                    print(f"✅ Нет больше данных на странице {page}")
+                    logger.debug("✅ Нет больше данных на странице %d", page)
                     break
                 
-                print(f"📊 Страница {page}: получено {len(results)} контрактов")
+                logger.debug("📊 Страница %d: получено %d контрактов", page, len(results))
                 
                 # Собираем уникальные даты экспирации с этой страницы
                 page_dates = set()
@@ -198,15 +201,15 @@ class PolygonClient:
                         except ValueError:
                             continue
                 
-                print(f"📅 Найдено {len(page_dates)} уникальных дат на странице {page}")
+                logger.debug("📅 Найдено %d уникальных дат на странице %d", len(page_dates), page)
                 
                 # Проверяем, есть ли новые даты
                 new_dates = page_dates - all_dates
                 if new_dates:
-                    print(f"➕ Добавлено {len(new_dates)} новых дат")
+                    logger.debug("➕ Добавлено %d новых дат", len(new_dates))
                     all_dates.update(page_dates)
                 else:
-                    print(f"🔄 Нет новых дат на странице {page}, но продолжаем...")
+                    logger.debug("🔄 Нет новых дат на странице %d, но продолжаем...", page)
                 
                 # Проверяем, есть ли следующая страница
                 next_cursor = data.get("next_url")
@@ -216,9 +219,9 @@ class PolygonClient:
                     parsed_url = urlparse(next_cursor)
                     cursor_params = parse_qs(parsed_url.query)
                     next_cursor = cursor_params.get("cursor", [None])[0]
-                    print(f"🔗 Найден cursor для следующей страницы: {next_cursor[:20]}...")
+                    logger.debug("🔗 Найден cursor для следующей страницы: %.20s...", next_cursor)
                 else:
-                    print(f"🏁 Достигнут конец данных на странице {page}")
+                    logger.debug("🏁 Достигнут конец данных на странице %d", page)
                     break
                 
                 page += 1
@@ -229,17 +232,16 @@ class PolygonClient:
             
             if all_dates:
                 sorted_dates = sorted(list(all_dates))
-                print(f"🎯 Reference API: найдено {len(sorted_dates)} дат экспирации для {ticker} за {page-1} страниц")
+                logger.info("🎯 Reference API: найдено %d дат экспирации для %s за %d страниц", len(sorted_dates), ticker, page - 1)
                 return sorted_dates
             else:
-                print(f"⚠️ Reference API не вернул дат, пробуем fallback")
+                logger.warning("⚠️ Reference API не вернул дат для %s, используем snapshot API", ticker)
             
             # Если reference API не сработал, используем fallback на snapshot API
-            print(f"⚠️ Reference API не дал результатов, используем snapshot API")
             
             # Делаем несколько запросов с разными параметрами
             for request_num in range(3):
-                print(f"📄 Fallback запрос {request_num + 1}/3 для {ticker}")
+                logger.debug("📄 Fallback запрос %d/3 для %s", request_num + 1, ticker)
                 
                 # Получаем опционную цепочку
                 url = f"{self.base_url}/v3/snapshot/options/{ticker}"
@@ -254,13 +256,13 @@ class PolygonClient:
                 data = response.json()
                 
                 if data.get("status") != "OK":
-                    print(f"⚠️ Статус не OK в fallback запросе {request_num + 1}")
+                    logger.warning("⚠️ Статус не OK в fallback запросе %d (%s)", request_num + 1, ticker)
                     continue
                 
                 results = data.get("results", [])
                 
                 if not results:
-                    print(f"✅ Нет данных в fallback запросе {request_num + 1}")
+                    logger.debug("✅ Нет данных в fallback запросе %d", request_num + 1)
                     break
                 
                 # Собрать уникальные даты экспирации с этого запроса
@@ -276,15 +278,15 @@ class PolygonClient:
                         except ValueError:
                             continue
                 
-                print(f"📅 Найдено {len(request_dates)} дат в fallback запросе {request_num + 1}")
+                logger.debug("📅 Найдено %d дат в fallback запросе %d", len(request_dates), request_num + 1)
                 
                 # Добавляем новые даты
                 new_dates = request_dates - all_dates
                 if new_dates:
-                    print(f"➕ Добавлено {len(new_dates)} новых дат")
+                    logger.debug("➕ Добавлено %d новых дат", len(new_dates))
                     all_dates.update(request_dates)
                 else:
-                    print(f"🔄 Нет новых дат в fallback запросе {request_num + 1}")
+                    logger.debug("🔄 Нет новых дат в fallback запросе %d", request_num + 1)
                     break
                 
                 # Пауза между запросами
@@ -293,12 +295,12 @@ class PolygonClient:
             
             # Отсортировать по возрастанию
             sorted_dates = sorted(list(all_dates))
-            print(f"🎯 Итого найдено {len(sorted_dates)} дат экспирации для {ticker}")
+            logger.info("🎯 Итого найдено %d дат экспирации для %s", len(sorted_dates), ticker)
             
             return sorted_dates
             
         except Exception as e:
-            print(f"❌ Error getting expiration dates: {e}")
+            logger.error("❌ Error getting expiration dates for %s: %s", ticker, e)
             return []
     
     def get_options_chain(self, ticker: str, expiration_date: str = None) -> List[Dict]:
@@ -497,7 +499,7 @@ class PolygonClient:
             List словарей с OHLC данными
         """
         try:
-            print(f"📊 Запрос исторических данных для {ticker}, period={period}, interval={interval}")
+            logger.debug("📊 Запрос исторических данных для %s, period=%s, interval=%s", ticker, period, interval)
             
             # Определяем временной диапазон
             end_date = datetime.now()
@@ -514,7 +516,7 @@ class PolygonClient:
             days = period_map.get(period, 30)
             start_date = end_date - timedelta(days=days)
             
-            print(f"📅 Диапазон: {start_date.strftime('%Y-%m-%d')} - {end_date.strftime('%Y-%m-%d')}")
+            logger.debug("📅 Диапазон: %s - %s", start_date.date(), end_date.date())
             
             # Определяем множитель и timespan для Polygon API
             interval_map = {
@@ -538,26 +540,26 @@ class PolygonClient:
                 "limit": 50000
             }
             
-            print(f"🔗 URL: {url}")
-            print(f"📡 Отправка запроса к Polygon API...")
+            logger.debug("🔗 URL: %s", url)
+            logger.debug("📡 Отправка запроса к Polygon API...")
             
             response = requests.get(url, params=params, timeout=30)
             response.raise_for_status()
             
             data = response.json()
             
-            print(f"📦 Ответ от API: status={data.get('status')}, resultsCount={data.get('resultsCount', 0)}")
+            logger.debug("📦 Ответ от API: status=%s, resultsCount=%s", data.get('status'), data.get('resultsCount', 0))
             
             if data.get("status") != "OK":
-                print(f"⚠️ Статус не OK: {data}")
+                logger.warning("⚠️ Статус не OK: %s", data)
                 return []
             
             if not data.get("results"):
-                print(f"⚠️ Нет результатов в ответе")
+                logger.warning("⚠️ Нет результатов в ответе")
                 return []
             
             results = data["results"]
-            print(f"✅ Получено {len(results)} свечей")
+            logger.debug("✅ Получено %s свечей", len(results))
             
             # Преобразуем в нужный формат
             historical_data = []
@@ -571,11 +573,11 @@ class PolygonClient:
                     "volume": bar["v"]
                 })
             
-            print(f"✅ Данные преобразованы, возвращаем {len(historical_data)} свечей")
+            logger.info("✅ Данные преобразованы, возвращаем %s свечей", len(historical_data))
             return historical_data
             
         except Exception as e:
-            print(f"❌ Error getting historical data: {e}")
+            logger.error("❌ Error getting historical data: %s", e)
             import traceback
             traceback.print_exc()
             return []
@@ -679,7 +681,7 @@ class PolygonClient:
             }
             
         except requests.exceptions.RequestException as e:
-            print(f"⚠️ Ошибка получения дивидендов для {ticker}: {e}")
+            logger.warning("⚠️ Ошибка получения дивидендов для %s: %s", ticker, e)
             return {
                 "ticker": ticker,
                 "dividend_yield": 0.0,
@@ -689,7 +691,7 @@ class PolygonClient:
                 "ex_dividend_date": None
             }
         except Exception as e:
-            print(f"⚠️ Ошибка парсинга дивидендов для {ticker}: {e}")
+            logger.warning("⚠️ Ошибка парсинга дивидендов для %s: %s", ticker, e)
             return {
                 "ticker": ticker,
                 "dividend_yield": 0.0,
@@ -755,7 +757,7 @@ class PolygonClient:
             }
                     
         except Exception as e:
-            print(f"⚠️ Ошибка проверки real-time доступа для акций: {e}")
+            logger.warning("⚠️ Ошибка проверки real-time доступа для акций: %s", e)
             return {
                 "status": "error",
                 "has_realtime": False,
@@ -823,7 +825,7 @@ class PolygonClient:
             }
                     
         except Exception as e:
-            print(f"⚠️ Ошибка проверки real-time доступа для опционов: {e}")
+            logger.warning("⚠️ Ошибка проверки real-time доступа для опционов: %s", e)
             return {
                 "status": "error",
                 "has_realtime": False,
@@ -876,7 +878,7 @@ class PolygonClient:
             }
             
         except Exception as e:
-            print(f"⚠️ Ошибка получения статуса рынка: {e}")
+            logger.warning("⚠️ Ошибка получения статуса рынка: %s", e)
             return {
                 "is_open": False,
                 "market": "unknown",
@@ -0,0 +1,306 @@
+"""
+Метрики Prometheus: HTTP маршруты, внешние провайдеры, кэши, ONNX инференс
+ЗАЧЕМ: Единственной телеметрией были print с таймингами и лог запросов IB —
+число воркеров и TTL кэшей подбирались вслепую. /metrics отдаёт гистограммы
+задержек по маршрутам, запросы в работе, вызовы провайдеров (ошибки и 429),
+попадания в кэши по пространствам имён и время инференса модели
+Затрагивает: main (middleware и /metrics), requests / httpx (клиенты провайдеров),
+gemini_client и ai_chat (gRPC вызовы Gemini), кэши main / stock_features_cache /
+vol_surface_cache / crypto_trajectory_service, ai_prediction_service
+
+Стоимость: счётчики и гистограммы prometheus_client — атомарные операции в памяти,
+шаблон маршрута вычисляется один раз на (метод, путь) и кэшируется.
+Без prometheus_client все функции — no-op, /metrics отвечает 503.
+При нескольких воркерах задайте PROMETHEUS_MULTIPROC_DIR (пустой каталог).
+"""
+
+import logging
+import os
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Optional, Tuple
+from urllib.parse import urlsplit
+
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram,
+        REGISTRY, generate_latest
+    )
+    from prometheus_client import multiprocess
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Bearer токен для /metrics (пусто — без авторизации, закрывайте на уровне сети)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# Анализ через AI длится десятки секунд — стандартных бакетов (до 10 с) мало
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+ONNX_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+
+if PROMETHEUS_AVAILABLE:
+    HTTP_REQUEST_DURATION = Histogram(
+        "http_request_duration_seconds", "Время обработки HTTP запроса",
+        ["method", "route"], buckets=LATENCY_BUCKETS
+    )
+    HTTP_REQUESTS = Counter(
+        "http_requests_total", "HTTP запросы по маршрутам и классу статуса",
+        ["method", "route", "status"]
+    )
+    HTTP_IN_PROGRESS = Gauge(
+        "http_requests_in_progress", "HTTP запросы в работе",
+        ["method", "route"], multiprocess_mode="livesum"
+    )
+    UPSTREAM_REQUESTS = Counter(
+        "upstream_requests_total", "Запросы к внешним провайдерам",
+        ["provider", "outcome"]
+    )
+    UPSTREAM_DURATION = Histogram(
+        "upstream_request_duration_seconds", "Время ответа внешнего провайдера",
+        ["provider"], buckets=LATENCY_BUCKETS
+    )
+    CACHE_REQUESTS = Counter(
+        "cache_requests_total", "Обращения к кэшам (hit / miss)",
+        ["namespace", "result"]
+    )
+    ONNX_INFERENCE = Histogram(
+        "onnx_inference_seconds", "Время session.run ONNX модели",
+        ["batch"], buckets=ONNX_BUCKETS
+    )
+
+
+# =============================================================================
+# HTTP маршруты
+# =============================================================================
+
+class PrometheusMiddleware:
+    """
+    ASGI middleware: длительность, статус и запросы в работе по шаблону маршрута
+    (/api/polygon/ticker/{ticker}, а не по пути — иначе метка на каждый тикер)
+    """
+
+    def __init__(self, app, router=None):
+        self.app = app
+        self.router = router
+
+        @lru_cache(maxsize=4096)
+        def resolve(method: str, path: str) -> str:
+            from starlette.routing import Match
+            scope = {"type": "http", "method": method, "path": path, "root_path": ""}
+            for route in self.router.routes if self.router else ():
+                match, _ = route.matches(scope)
+                if match == Match.FULL:
+                    return getattr(route, "path", path)
+            # Несуществующие пути в одну метку (сканеры не раздувают число рядов)
+            return "<unmatched>"
+
+        self._resolve = resolve
+
+    async def __call__(self, scope, receive, send):
+        if not PROMETHEUS_AVAILABLE or scope["type"] != "http" or scope["path"] == "/metrics":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = self._resolve(method, scope["path"])
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        in_progress = HTTP_IN_PROGRESS.labels(method, route)
+        in_progress.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUEST_DURATION.labels(method, route).observe(time.perf_counter() - started)
+            HTTP_REQUESTS.labels(method, route, f"{status[0] // 100}xx").inc()
+            in_progress.dec()
+
+
+# =============================================================================
+# Внешние провайдеры
+# =============================================================================
+
+def _provider_hosts() -> dict:
+    hosts = {
+        "api.polygon.io": "polygon",
+        "finnhub.io": "finnhub",
+        "pro-api.coinmarketcap.com": "cmc",
+        "generativelanguage.googleapis.com": "gemini",
+        "fc.yahoo.com": "yahoo",
+    }
+    # Фейковый Polygon (POLYGON_BASE_URL) и IB Client Portal Gateway
+    if os.getenv("POLYGON_BASE_URL"):
+        hosts[urlsplit(os.getenv("POLYGON_BASE_URL")).netloc] = "polygon"
+    hosts[urlsplit(os.getenv("IB_GATEWAY_URL", "https://localhost:5000")).netloc] = "ib"
+    return hosts
+
+
+_hosts: dict = {}
+
+
+@lru_cache(maxsize=256)
+def provider_of(url: str) -> Optional[str]:
+    """Провайдер по хосту URL (None — не отслеживается)"""
+    host = urlsplit(url).netloc
+    if host in _hosts:
+        return _hosts[host]
+    if host.endswith(".finance.yahoo.com"):
+        return "yahoo"
+    return None
+
+
+def record_upstream(provider: str, seconds: float, status_code: Optional[int] = None,
+                    error: bool = False) -> None:
+    """Учесть вызов провайдера: outcome ok / error / rate_limited (HTTP 429)"""
+    if not PROMETHEUS_AVAILABLE:
+        return
+    if status_code == 429:
+        outcome = "rate_limited"
+    elif error or (status_code is not None and status_code >= 400):
+        outcome = "error"
+    else:
+        outcome = "ok"
+    UPSTREAM_REQUESTS.labels(provider, outcome).inc()
+    UPSTREAM_DURATION.labels(provider).observe(seconds)
+
+
+@contextmanager
+def track_upstream(provider: str):
+    """
+    Замер вызова провайдера без HTTP клиента (Gemini SDK ходит по gRPC)
+    ResourceExhausted / 429 в тексте ошибки считаются rate_limited
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        limited = type(e).__name__ == "ResourceExhausted" or "429" in str(e)
+        record_upstream(provider, time.perf_counter() - started, 429 if limited else None, error=True)
+        raise
+    record_upstream(provider, time.perf_counter() - started)
+
+
+def _instrument_requests() -> None:
+    import requests
+
+    original_send = requests.Session.send
+
+    def send(session, request, **kwargs):
+        provider = provider_of(request.url)
+        if provider is None:
+            return original_send(session, request, **kwargs)
+        started = time.perf_counter()
+        try:
+            response = original_send(session, request, **kwargs)
+        except Exception:
+            record_upstream(provider, time.perf_counter() - started, error=True)
+            raise
+        record_upstream(provider, time.perf_counter() - started, response.status_code)
+        return response
+
+    requests.Session.send = send
+
+
+def _instrument_httpx() -> None:
+    import httpx
+
+    original_send = httpx.Client.send
+    original_async_send = httpx.AsyncClient.send
+
+    def send(client, request, **kwargs):
+        provider = provider_of(str(request.url))
+        if provider is None:
+            return original_send(client, request, **kwargs)
+        started = time.perf_counter()
+        try:
+            response = original_send(client, request, **kwargs)
+        except Exception:
+            record_upstream(provider, time.perf_counter() - started, error=True)
+            raise
+        record_upstream(provider, time.perf_counter() - started, response.status_code)
+        return response
+
+    async def async_send(client, request, **kwargs):
+        provider = provider_of(str(request.url))
+        if provider is None:
+            return await original_async_send(client, request, **kwargs)
+        started = time.perf_counter()
+        try:
+            response = await original_async_send(client, request, **kwargs)
+        except Exception:
+            record_upstream(provider, time.perf_counter() - started, error=True)
+            raise
+        record_upstream(provider, time.perf_counter() - started, response.status_code)
+        return response
+
+    httpx.Client.send = send
+    httpx.AsyncClient.send = async_send
+
+
+_instrumented = False
+
+
+def instrument_http_clients() -> bool:
+    """
+    Учитывать запросы requests / httpx к провайдерам (вызывается один раз при старте,
+    после install_cassettes — чтобы воспроизведённые ответы тоже попадали в метрики)
+    """
+    global _instrumented, _hosts
+    if _instrumented or not PROMETHEUS_AVAILABLE:
+        return _instrumented
+    _hosts = _provider_hosts()
+    _instrument_requests()
+    try:
+        _instrument_httpx()
+    except ImportError:
+        pass
+    _instrumented = True
+    return True
+
+
+# =============================================================================
+# Кэши и ONNX
+# =============================================================================
+
+def record_cache(namespace: str, hit: bool) -> None:
+    """Обращение к кэшу; hit ratio = hit / (hit + miss) по namespace"""
+    if PROMETHEUS_AVAILABLE:
+        CACHE_REQUESTS.labels(namespace, "hit" if hit else "miss").inc()
+
+
+def _batch_label(size: int) -> str:
+    if size <= 1:
+        return "1"
+    if size <= 16:
+        return "2-16"
+    if size <= 256:
+        return "17-256"
+    return "257+"
+
+
+def observe_onnx_inference(batch_size: int, seconds: float) -> None:
+    """Время одного session.run (батчи сгруппированы, чтобы не плодить метки)"""
+    if PROMETHEUS_AVAILABLE:
+        ONNX_INFERENCE.labels(_batch_label(batch_size)).observe(seconds)
+
+
+# =============================================================================
+# Экспорт
+# =============================================================================
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Текст метрик для /metrics (в режиме нескольких процессов — сумма по воркерам)"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
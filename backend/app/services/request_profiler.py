@@ -0,0 +1,239 @@
+"""
+Профилирование отдельного запроса по требованию и список самых медленных запросов
+ЗАЧЕМ: Когда пользователь жалуется на медленный /analyze/step2 или /calculate/curve,
+было не видно, куда ушло время. Администратор повторяет запрос с заголовком
+X-Profile-Token (или ?_profile=<token>) — запрос выполняется под сэмплирующим
+профилировщиком (pyinstrument), профиль (HTML flame graph или speedscope JSON)
+сохраняется под ID из заголовка ответа X-Profile-Id и доступен через
+/api/admin/profiles/{id}
+Затрагивает: main (middleware), routers/profiling, JWTManager (проверка роли admin)
+
+Без флага запрос проходит с одним замером времени (для списка медленных) —
+профилировщик не запускается. Сэмплируется поток event loop: код в
+asyncio.to_thread виден как ожидание в точке await.
+"""
+
+import asyncio
+import heapq
+import hmac
+import importlib.util
+import logging
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs
+
+# pyinstrument импортируется при первом профилировании, не на старте воркера
+PYINSTRUMENT_AVAILABLE = importlib.util.find_spec("pyinstrument") is not None
+
+logger = logging.getLogger(__name__)
+
+# Отдельный токен профилирования; кроме него принимается JWT с ролью admin
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", "")
+PROFILES_DIR = Path(os.getenv(
+    "PROFILES_DIR",
+    Path(__file__).resolve().parent.parent.parent / "profiles"
+))
+# Сколько файлов профилей хранить (старые удаляются)
+PROFILES_MAX_FILES = int(os.getenv("PROFILES_MAX_FILES", "200"))
+# Интервал сэмплирования, секунды
+PROFILING_INTERVAL = float(os.getenv("PROFILING_INTERVAL", "0.001"))
+# Список самых медленных запросов: размер и окно в часах
+SLOW_REQUESTS_SIZE = int(os.getenv("SLOW_REQUESTS_SIZE", "50"))
+SLOW_REQUESTS_WINDOW_HOURS = float(os.getenv("SLOW_REQUESTS_WINDOW_HOURS", "24"))
+
+FORMATS = {"html": ".html", "speedscope": ".speedscope.json"}
+
+_TOKEN_HEADER = b"x-profile-token"
+_FORMAT_HEADER = b"x-profile-format"
+_QUERY_FLAG = b"_profile="
+PROFILES_API_PREFIX = "/api/admin/profiles"
+
+
+def is_authorized(credential: Optional[str]) -> bool:
+    """Токен профилирования или JWT администратора"""
+    if not credential:
+        return False
+    if PROFILING_TOKEN and hmac.compare_digest(credential, PROFILING_TOKEN):
+        return True
+    from app.services.telegram_auth import JWTManager
+    jwt_secret = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-in-production")
+    payload = JWTManager(jwt_secret).verify_token(credential)
+    return bool(payload) and payload.get("role") == "admin"
+
+
+# =============================================================================
+# Самые медленные запросы
+# =============================================================================
+
+# Min-heap (duration, started_at, entry): в корне — самый быстрый из хранимых
+_slowest: List[tuple] = []
+
+
+def record_request(method: str, path: str, status: int, duration: float,
+                   started_at: float, profile_id: Optional[str] = None) -> None:
+    """Учесть запрос; O(log N), и то только если он медленнее самого быстрого в списке"""
+    if len(_slowest) >= SLOW_REQUESTS_SIZE and duration <= _slowest[0][0]:
+        return
+    entry = {
+        "method": method,
+        "path": path,
+        "status": status,
+        "duration_ms": round(duration * 1000, 1),
+        "started_at": started_at,
+        "profile_id": profile_id
+    }
+    item = (duration, started_at, entry)
+    if len(_slowest) < SLOW_REQUESTS_SIZE:
+        heapq.heappush(_slowest, item)
+    else:
+        heapq.heapreplace(_slowest, item)
+
+
+def get_slowest(limit: int = SLOW_REQUESTS_SIZE) -> List[Dict]:
+    """Самые медленные запросы за окно (устаревшие записи удаляются здесь)"""
+    cutoff = time.time() - SLOW_REQUESTS_WINDOW_HOURS * 3600
+    fresh = [item for item in _slowest if item[1] >= cutoff]
+    if len(fresh) != len(_slowest):
+        _slowest[:] = fresh
+        heapq.heapify(_slowest)
+    return [entry for _, _, entry in sorted(fresh, key=lambda item: -item[0])[:limit]]
+
+
+# =============================================================================
+# Хранилище профилей
+# =============================================================================
+
+def _new_profile_id() -> str:
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+
+def _save_profile(profile_id: str, profiler, fmt: str) -> None:
+    """Отрисовать и записать профиль; лишние старые файлы удаляются"""
+    if fmt == "speedscope":
+        from pyinstrument.renderers import SpeedscopeRenderer
+        content = profiler.output(SpeedscopeRenderer())
+    else:
+        content = profiler.output_html()
+    PROFILES_DIR.mkdir(parents=True, exist_ok=True)
+    (PROFILES_DIR / f"{profile_id}{FORMATS[fmt]}").write_text(content, encoding="utf-8")
+
+    files = sorted(PROFILES_DIR.glob("*-*"), key=lambda path: path.stat().st_mtime)
+    for path in files[:max(0, len(files) - PROFILES_MAX_FILES)]:
+        path.unlink(missing_ok=True)
+
+
+def find_profile(profile_id: str) -> Optional[Path]:
+    """Файл профиля по ID (ID проверяется, чтобы не выйти за PROFILES_DIR)"""
+    if not profile_id.replace("-", "").isalnum():
+        return None
+    for suffix in FORMATS.values():
+        path = PROFILES_DIR / f"{profile_id}{suffix}"
+        if path.exists():
+            return path
+    return None
+
+
+def list_profiles() -> List[Dict]:
+    """Сохранённые профили, новые первые"""
+    if not PROFILES_DIR.exists():
+        return []
+    result = []
+    for path in sorted(PROFILES_DIR.glob("*-*"), key=lambda p: p.stat().st_mtime, reverse=True):
+        profile_id, _, suffix = path.name.partition(".")
+        result.append({
+            "id": profile_id,
+            "format": "speedscope" if suffix == "speedscope.json" else "html",
+            "size_bytes": path.stat().st_size,
+            "created_at": path.stat().st_mtime
+        })
+    return result
+
+
+# =============================================================================
+# Middleware
+# =============================================================================
+
+def _profile_request(scope) -> Optional[tuple]:
+    """(credential, format), если запрос просит профилирование; иначе None"""
+    credential = fmt = None
+    for name, value in scope["headers"]:
+        if name == _TOKEN_HEADER:
+            credential = value.decode("latin-1")
+        elif name == _FORMAT_HEADER:
+            fmt = value.decode("latin-1")
+    query = scope.get("query_string", b"")
+    if credential is None and _QUERY_FLAG in query:
+        params = parse_qs(query.decode("latin-1"))
+        credential = params.get("_profile", [None])[0]
+        fmt = fmt or params.get("_profile_format", [None])[0]
+    if credential is None:
+        return None
+    return credential, fmt if fmt in FORMATS else "html"
+
+
+class ProfilingMiddleware:
+    """ASGI middleware: время всех запросов и профиль запросов с флагом"""
+
+    def __init__(self, app):
+        self.app = app
+        self._busy = False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = [500]
+        profile_id = profiler = None
+        error = None
+        # Токен в заголовке API профилей — авторизация, а не просьба профилировать
+        request = None if scope["path"].startswith(PROFILES_API_PREFIX) else _profile_request(scope)
+        if request is not None:
+            credential, fmt = request
+            if not is_authorized(credential):
+                error = "unauthorized"
+            elif not PYINSTRUMENT_AVAILABLE:
+                error = "pyinstrument is not installed"
+            elif self._busy:
+                # pyinstrument сэмплирует поток целиком — второй профиль исказил бы первый
+                error = "another request is being profiled"
+            else:
+                self._busy = True
+                profile_id = _new_profile_id()
+                from pyinstrument import Profiler
+                profiler = Profiler(interval=PROFILING_INTERVAL, async_mode="enabled")
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                if profile_id or error:
+                    headers = list(message.get("headers", []))
+                    if profile_id:
+                        headers.append((b"x-profile-id", profile_id.encode()))
+                    else:
+                        headers.append((b"x-profile-error", error.encode()))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        started_at = time.time()
+        started = time.perf_counter()
+        if profiler is not None:
+            profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - started
+            if profiler is not None:
+                profiler.stop()
+                self._busy = False
+                try:
+                    # Отрисовка HTML — десятки миллисекунд, не держим event loop
+                    await asyncio.to_thread(_save_profile, profile_id, profiler, request[1])
+                    logger.warning(f"Profile {profile_id}: {scope['method']} {scope['path']} {duration * 1000:.0f} ms")
+                except Exception as e:
+                    logger.error(f"Profile {profile_id} save failed: {e}")
+                    profile_id = None
+            record_request(scope["method"], scope["path"], status[0], duration, started_at, profile_id)
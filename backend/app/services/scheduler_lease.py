@@ -0,0 +1,174 @@
+"""
+Распределённая блокировка на основе аренды (lease) в БД
+ЗАЧЕМ: Ровно один воркер выполняет задачи планировщика; аренда продлевается
+в фоне, а при смерти владельца истекает и переходит к другому воркеру
+Затрагивает: scheduler_leases (таблица), crypto_scheduler, APScheduler (общий job store)
+"""
+
+import logging
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Optional, Tuple
+
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+from apscheduler.schedulers.background import BackgroundScheduler
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+
+from app.database import SessionLocal, engine
+from app.models.scheduler_lease import SchedulerLease
+
+logger = logging.getLogger(__name__)
+
+
+class LeaseLock:
+    """
+    Именованная аренда: захват/продление одним условным UPDATE
+    (строка обновляется, только если аренда наша или уже истекла)
+    """
+
+    def __init__(self, name: str, ttl_seconds: int = 60):
+        self.name = name
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    def acquire(self) -> bool:
+        """Захватить или продлить аренду; True — мы владелец"""
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            updated = db.query(SchedulerLease).filter(
+                SchedulerLease.name == self.name,
+                or_(SchedulerLease.owner == self.owner, SchedulerLease.expires_at < now)
+            ).update(
+                {SchedulerLease.owner: self.owner, SchedulerLease.expires_at: now + self.ttl},
+                synchronize_session=False
+            )
+            if updated:
+                db.commit()
+                return True
+
+            # Строки ещё нет — первый воркер создаёт её (гонку решает PRIMARY KEY)
+            if db.query(SchedulerLease.name).filter(SchedulerLease.name == self.name).first() is None:
+                db.add(SchedulerLease(name=self.name, owner=self.owner, expires_at=now + self.ttl))
+                try:
+                    db.commit()
+                    return True
+                except IntegrityError:
+                    db.rollback()
+            return False
+        except Exception as e:
+            logger.error(f"Lease {self.name}: acquire failed: {e}")
+            db.rollback()
+            return False
+        finally:
+            db.close()
+
+    def is_held(self) -> bool:
+        """Аренда наша и ещё не истекла (проверка перед выполнением задачи)"""
+        db = SessionLocal()
+        try:
+            return db.query(SchedulerLease.name).filter(
+                SchedulerLease.name == self.name,
+                SchedulerLease.owner == self.owner,
+                SchedulerLease.expires_at >= datetime.utcnow()
+            ).first() is not None
+        finally:
+            db.close()
+
+    def release(self) -> None:
+        """Отпустить аренду (при остановке), чтобы другой воркер забрал её сразу"""
+        db = SessionLocal()
+        try:
+            db.query(SchedulerLease).filter(
+                SchedulerLease.name == self.name,
+                SchedulerLease.owner == self.owner
+            ).update({SchedulerLease.expires_at: datetime.utcnow()}, synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            logger.error(f"Lease {self.name}: release failed: {e}")
+            db.rollback()
+        finally:
+            db.close()
+
+
+class LeaderElector:
+    """
+    Фоновый поток: периодически продлевает аренду и сообщает о смене лидерства
+    """
+
+    def __init__(
+        self,
+        lock: LeaseLock,
+        on_elected: Callable[[], None],
+        on_demoted: Callable[[], None],
+        on_tick: Optional[Callable[[], None]] = None,
+        renew_seconds: Optional[float] = None
+    ):
+        self.lock = lock
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.on_tick = on_tick
+        # Продлеваем втрое чаще срока аренды — один пропуск не теряет лидерство
+        self.renew_seconds = renew_seconds or lock.ttl.total_seconds() / 3
+        self.is_leader = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"lease-{lock.name}", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            held = self.lock.acquire()
+            if held and not self.is_leader:
+                self.is_leader = True
+                logger.info(f"Lease {self.lock.name}: acquired by {self.lock.owner}")
+                self.on_elected()
+            elif not held and self.is_leader:
+                self.is_leader = False
+                logger.warning(f"Lease {self.lock.name}: lost by {self.lock.owner}")
+                self.on_demoted()
+            if self.is_leader and self.on_tick:
+                self.on_tick()
+            self._stop.wait(self.renew_seconds)
+
+    def stop(self) -> None:
+        """Остановить поток и отпустить аренду"""
+        self._stop.set()
+        if self.is_leader:
+            self.is_leader = False
+            self.on_demoted()
+            self.lock.release()
+
+
+def create_leader_scheduler(
+    lock_name: str,
+    ttl_seconds: int = 60,
+    misfire_grace_seconds: int = 300
+) -> Tuple[BackgroundScheduler, LeaderElector]:
+    """
+    Планировщик с общим job store в БД, который выполняет задачи только у лидера
+
+    Все воркеры запускают планировщик на паузе: добавлять и удалять задачи можно
+    из любого воркера (они пишутся в общий job store), а выполняет их только
+    владелец аренды. Пока лидер жив, он периодически будит планировщик, чтобы
+    увидеть задачи, добавленные другими воркерами.
+    """
+    scheduler = BackgroundScheduler(
+        jobstores={"default": SQLAlchemyJobStore(engine=engine)},
+        # Задача, пропущенная во время смены лидера, выполняется один раз после неё
+        job_defaults={"coalesce": True, "misfire_grace_time": misfire_grace_seconds}
+    )
+    scheduler.start(paused=True)
+    elector = LeaderElector(
+        LeaseLock(lock_name, ttl_seconds),
+        on_elected=scheduler.resume,
+        on_demoted=scheduler.pause,
+        on_tick=scheduler.wakeup
+    )
+    elector.start()
+    return scheduler, elector
@@ -0,0 +1,155 @@
+"""
+Общее состояние воркеров: кэши с TTL в Redis или в памяти процесса
+ЗАЧЕМ: Кэши жили в словарях процесса — при нескольких воркерах uvicorn каждый
+воркер заново ходил к Polygon / Finnhub / FRED, цепочка от расширения TradingView
+попадала только в один воркер, а лимиты slowapi считались отдельно в каждом.
+Поэтому ecosystem конфиги держали instances: 1. Теперь все кэши идут через один
+интерфейс (namespace, key) -> JSON значение с TTL, а бэкенд выбирается настройкой
+Затрагивает: main (кэши опционов, дат экспирации и цен, лимитер slowapi),
+tradingview_service, treasury_rate_service, stock_classifier, ib_request_metrics,
+app_startup (подключение при старте)
+
+SHARED_STATE_BACKEND:
+    auto   — Redis, если отвечает на старте, иначе память процесса (по умолчанию)
+    redis  — Redis обязателен для многоворкерного режима; лимиты slowapi тоже в Redis
+    memory — только память процесса (один воркер, разработка)
+REDIS_URL (или REDIS_HOST / REDIS_PORT) — адрес Redis
+
+Значения сериализуются в JSON: кортежи возвращаются списками, datetime храните
+строкой или числом. Возвращённые значения не изменяйте на месте — в памяти
+процесса это та же ссылка, что лежит в кэше.
+При сбое Redis операция выполняется на локальной памяти, Redis повторно
+пробуется через REDIS_RETRY_SECONDS — запросы не ждут таймаут на каждом вызове.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from app.services.shared_state_backends import (
+    REDIS_RETRY_SECONDS, MemoryStateBackend, RedisStateBackend
+)
+
+logger = logging.getLogger(__name__)
+
+SHARED_STATE_BACKEND = os.getenv("SHARED_STATE_BACKEND", "auto").lower()
+REDIS_URL = os.getenv("REDIS_URL") or (
+    f"redis://{os.getenv('REDIS_HOST', 'localhost')}:{os.getenv('REDIS_PORT', '6379')}/0"
+)
+
+
+def _redis(url: str):
+    import redis
+    return redis.Redis.from_url(url, decode_responses=True, socket_connect_timeout=1, socket_timeout=1)
+
+
+def connect_redis(url: str = REDIS_URL):
+    """Redis клиент (decode_responses, таймауты 1 с) после успешного ping"""
+    client = _redis(url)
+    client.ping()
+    return client
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def _create_backend():
+    if SHARED_STATE_BACKEND == "memory":
+        return MemoryStateBackend()
+    try:
+        client = connect_redis()
+        logger.info("Shared state: Redis backend (%s)", SHARED_STATE_BACKEND)
+        return RedisStateBackend(client)
+    except Exception as e:
+        if SHARED_STATE_BACKEND == "redis":
+            # Явный режим: Redis поднимется позже — повторные попытки по REDIS_RETRY_SECONDS
+            logger.error("Shared state: Redis недоступен (%s), до восстановления — память процесса", e)
+            backend = RedisStateBackend(_redis(REDIS_URL))
+            backend._retry_at = time.monotonic() + REDIS_RETRY_SECONDS
+            return backend
+        logger.info("Shared state: Redis недоступен (%s), кэши в памяти процесса", e)
+        return MemoryStateBackend()
+
+
+def get_backend():
+    """Бэкенд общего состояния (создаётся при первом обращении; на старте — в app_startup)"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = _create_backend()
+    return _backend
+
+
+def redis_client():
+    """
+    Клиент Redis, если он сейчас доступен, иначе None
+    (для структур, которым мало get/put, — ib_request_metrics)
+    """
+    backend = get_backend()
+    if isinstance(backend, RedisStateBackend) and backend.available():
+        return backend.client
+    return None
+
+
+def get(namespace: str, key: str) -> Optional[Any]:
+    """Значение или None (нет ключа, истёк TTL)"""
+    return get_backend().get(namespace, key)
+
+
+def put(namespace: str, key: str, value: Any, ttl: Optional[float] = None) -> None:
+    """Сохранить JSON-сериализуемое значение; ttl в секундах (None — без истечения)"""
+    get_backend().put(namespace, key, value, ttl)
+
+
+def claim(namespace: str, key: str, ttl: float, owner: Any = True) -> bool:
+    """
+    Занять ключ на ttl секунд, если он свободен (SET NX) — True только у одного воркера
+    ЗАЧЕМ: Периодические задачи, которые при N воркерах иначе выполнились бы N раз
+    owner — уникальное значение владельца, если ключ потом освобождается через release
+    """
+    return get_backend().claim(namespace, key, ttl, owner)
+
+
+def release(namespace: str, key: str, owner: Any) -> bool:
+    """
+    Освободить ключ из claim, только если он всё ещё занят этим owner
+    ЗАЧЕМ: TTL истёк и ключ занял другой воркер — delete снял бы чужую блокировку
+    """
+    return get_backend().release(namespace, key, owner)
+
+
+def delete(namespace: str, key: str) -> bool:
+    """Удалить ключ; True, если он был"""
+    return get_backend().delete(namespace, key)
+
+
+def clear(namespace: str) -> None:
+    """Удалить все ключи пространства имён"""
+    get_backend().clear(namespace)
+
+
+def keys(namespace: str) -> List[str]:
+    """Ключи пространства имён (в Redis — SCAN, только для диагностики)"""
+    return get_backend().keys(namespace)
+
+
+def limiter_storage_uri() -> str:
+    """
+    Хранилище лимитов slowapi: Redis только при SHARED_STATE_BACKEND=redis
+    (в auto при недоступном Redis slowapi проверял бы его на каждом запросе)
+    """
+    return REDIS_URL if SHARED_STATE_BACKEND == "redis" else "memory://"
+
+
+def describe() -> Dict[str, Any]:
+    """Режим для /health"""
+    return {
+        "configured": SHARED_STATE_BACKEND,
+        "backend": get_backend().name,
+        "redis_connected": redis_client() is not None,
+        "limiter": "redis" if limiter_storage_uri() != "memory://" else "memory"
+    }
@@ -0,0 +1,198 @@
+"""
+Бэкенды общего состояния воркеров: память процесса и Redis
+ЗАЧЕМ: Вынесены из shared_state (правило 300 строк); модули приложения
+работают через функции shared_state, а не с бэкендами напрямую
+Затрагивает: shared_state
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Пауза перед повторной попыткой Redis после ошибки, секунды
+REDIS_RETRY_SECONDS = float(os.getenv("REDIS_RETRY_SECONDS", "30"))
+
+KEY_PREFIX = "optioner"
+
+# Удалить ключ, только если в нём значение владельца (release)
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class MemoryStateBackend:
+    """Словарь процесса с истечением по TTL (устаревшие ключи удаляются при чтении)"""
+
+    name = "memory"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # namespace -> key -> (value, expires_at или None)
+        self._data: Dict[str, Dict[str, Tuple[Any, Optional[float]]]] = {}
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(namespace, {}).get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._data[namespace][key]
+                return None
+            return value
+
+    def put(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            self._data.setdefault(namespace, {})[key] = (value, expires_at)
+
+    def claim(self, namespace: str, key: str, ttl: float, owner: Any = True) -> bool:
+        with self._lock:
+            entry = self._data.get(namespace, {}).get(key)
+            if entry is not None and (entry[1] is None or entry[1] > time.time()):
+                return False
+            self._data.setdefault(namespace, {})[key] = (owner, time.time() + ttl)
+            return True
+
+    def release(self, namespace: str, key: str, owner: Any) -> bool:
+        with self._lock:
+            entry = self._data.get(namespace, {}).get(key)
+            if entry is None or entry[0] != owner:
+                return False
+            del self._data[namespace][key]
+            return True
+
+    def delete(self, namespace: str, key: str) -> bool:
+        with self._lock:
+            return self._data.get(namespace, {}).pop(key, None) is not None
+
+    def clear(self, namespace: str) -> None:
+        with self._lock:
+            self._data.pop(namespace, None)
+
+    def keys(self, namespace: str) -> List[str]:
+        now = time.time()
+        with self._lock:
+            return [
+                key for key, (_, expires_at) in self._data.get(namespace, {}).items()
+                if expires_at is None or expires_at > now
+            ]
+
+
+class RedisStateBackend:
+    """
+    Redis: ключ optioner:{namespace}:{key}, значение — JSON, TTL через SETEX
+    Ошибка Redis не ломает запрос — операция уходит в локальную память
+    """
+
+    name = "redis"
+
+    def __init__(self, client):
+        self.client = client
+        self._fallback = MemoryStateBackend()
+        self._retry_at = 0.0
+
+    @staticmethod
+    def _key(namespace: str, key: str) -> str:
+        return f"{KEY_PREFIX}:{namespace}:{key}"
+
+    def available(self) -> bool:
+        """False в паузе после ошибки Redis (операции идут в память процесса)"""
+        return time.monotonic() >= self._retry_at
+
+    def _failed(self, operation: str, error: Exception) -> None:
+        if self.available():
+            logger.warning("Shared state: Redis %s failed (%s), memory fallback for %.0fs",
+                           operation, error, REDIS_RETRY_SECONDS)
+        self._retry_at = time.monotonic() + REDIS_RETRY_SECONDS
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        if self.available():
+            try:
+                raw = self.client.get(self._key(namespace, key))
+                if raw is not None:
+                    return json.loads(raw)
+            except Exception as e:
+                self._failed("get", e)
+        # Нет в Redis — возможно, значение не-JSON или записано во время сбоя
+        return self._fallback.get(namespace, key)
+
+    def put(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        try:
+            raw = json.dumps(value)
+        except (TypeError, ValueError) as e:
+            # Не JSON (numpy и т.п.) — значение остаётся только в этом воркере
+            logger.warning("Shared state: %s:%s не сериализуется в JSON (%s)", namespace, key, e)
+            self._fallback.put(namespace, key, value, ttl)
+            return
+        if self.available():
+            try:
+                if ttl:
+                    self.client.setex(self._key(namespace, key), int(max(1, ttl)), raw)
+                else:
+                    self.client.set(self._key(namespace, key), raw)
+                return
+            except Exception as e:
+                self._failed("set", e)
+        self._fallback.put(namespace, key, value, ttl)
+
+    def claim(self, namespace: str, key: str, ttl: float, owner: Any = True) -> bool:
+        if self.available():
+            try:
+                return bool(self.client.set(
+                    self._key(namespace, key), json.dumps(owner), nx=True, ex=int(max(1, ttl))
+                ))
+            except Exception as e:
+                self._failed("claim", e)
+        return self._fallback.claim(namespace, key, ttl, owner)
+
+    def release(self, namespace: str, key: str, owner: Any) -> bool:
+        released = self._fallback.release(namespace, key, owner)
+        if self.available():
+            try:
+                # Сравнение и удаление одной командой: между GET и DEL ключ мог истечь и достаться другому
+                released = bool(self.client.eval(
+                    _RELEASE_SCRIPT, 1, self._key(namespace, key), json.dumps(owner)
+                )) or released
+            except Exception as e:
+                self._failed("release", e)
+        return released
+
+    def delete(self, namespace: str, key: str) -> bool:
+        deleted = self._fallback.delete(namespace, key)
+        if self.available():
+            try:
+                deleted = bool(self.client.delete(self._key(namespace, key))) or deleted
+            except Exception as e:
+                self._failed("delete", e)
+        return deleted
+
+    def _scan(self, namespace: str) -> List[str]:
+        return list(self.client.scan_iter(match=self._key(namespace, "*"), count=500))
+
+    def clear(self, namespace: str) -> None:
+        self._fallback.clear(namespace)
+        if self.available():
+            try:
+                names = self._scan(namespace)
+                if names:
+                    self.client.delete(*names)
+            except Exception as e:
+                self._failed("clear", e)
+
+    def keys(self, namespace: str) -> List[str]:
+        if self.available():
+            try:
+                prefix_length = len(self._key(namespace, ""))
+                return [name[prefix_length:] for name in self._scan(namespace)]
+            except Exception as e:
+                self._failed("keys", e)
+        return self._fallback.keys(namespace)
@@ -10,11 +10,19 @@
 """
 
 import httpx
-from typing import Dict, Optional, Any
+from typing import Dict, Optional, Any, List
 from datetime import datetime, timedelta
 import asyncio
+import hashlib
+import time
 import os
 import json
+import logging
+
+from app.services import shared_state
+from app.services.stock_features_cache import get_cached_field, clear_fields
+
+logger = logging.getLogger(__name__)
 
 # ============================================================================
 # КОНСТАНТЫ И КОНФИГУРАЦИЯ
@@ -32,13 +40,17 @@ _settings_cache: Optional[Dict] = None
 _settings_cache_time: float = 0
 SETTINGS_CACHE_TTL = 60  # Перечитывать файл раз в минуту
 
+# Версия настроек — хэш содержимого
+# ЗАЧЕМ: Смена порогов/множителей инвалидирует закэшированные классификации
+_settings_version: str = "default"
+
 
 def _load_settings_from_file() -> Dict[str, Any]:
     """
     Загружает настройки из JSON файла
     ЗАЧЕМ: Позволяет менять настройки без перезапуска сервера
     """
-    global _settings_cache, _settings_cache_time
+    global _settings_cache, _settings_cache_time, _settings_version
     
     import time as time_module
     current_time = time_module.time()
@@ -52,14 +64,37 @@ def _load_settings_from_file() -> Dict[str, Any]:
             with open(SETTINGS_FILE, 'r', encoding='utf-8') as f:
                 _settings_cache = json.load(f)
                 _settings_cache_time = current_time
+                _settings_version = hashlib.md5(
+                    json.dumps(_settings_cache, sort_keys=True).encode('utf-8')
+                ).hexdigest()[:12]
                 return _settings_cache
     except Exception as e:
-        print(f"[stock_classifier] Ошибка загрузки настроек: {e}")
+        logger.warning("Ошибка загрузки настроек: %s", e)
     
     # Возвращаем дефолтные значения если файл не найден
+    _settings_version = "default"
     return _get_default_settings()
 
 
+def get_settings_version() -> str:
+    """
+    Текущая версия настроек классификации
+    ЗАЧЕМ: Метка для инвалидации кэша классификаций без перезапроса данных Finnhub
+    """
+    _load_settings_from_file()
+    return _settings_version
+
+
+def reload_settings() -> None:
+    """
+    Сбросить кэш настроек — следующий вызов перечитает файл
+    ЗАЧЕМ: Изменения со страницы настроек применяются сразу, а не через минуту
+    """
+    global _settings_cache, _settings_cache_time
+    _settings_cache = None
+    _settings_cache_time = 0
+
+
 def _get_default_settings() -> Dict[str, Any]:
     """Возвращает настройки по умолчанию"""
     return {
@@ -177,9 +212,9 @@ GROWTH_SECTORS = [
     "consumer discretionary"
 ]
 
-# In-memory кэш для результатов классификации
+# Кэш результатов классификации в shared_state (общий для воркеров)
 # ЗАЧЕМ: Избегаем частых запросов к Finnhub API (лимит 60/мин)
-_classification_cache: Dict[str, Dict[str, Any]] = {}
+CLASSIFICATION_NAMESPACE = "stock_classification"
 CACHE_TTL_SECONDS = 3600  # 1 час
 
 
@@ -187,42 +222,35 @@ CACHE_TTL_SECONDS = 3600  # 1 час
 # ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ
 # ============================================================================
 
-def _is_cache_valid(cache_entry: Dict) -> bool:
-    """
-    Проверяет, не истёк ли TTL кэша
-    ЗАЧЕМ: Данные о компании меняются редко, кэшируем на 1 час
-    """
-    if not cache_entry or "timestamp" not in cache_entry:
-        return False
-    
-    cache_time = cache_entry["timestamp"]
-    now = datetime.now()
-    return (now - cache_time).total_seconds() < CACHE_TTL_SECONDS
-
-
-def _get_from_cache(symbol: str) -> Optional[Dict]:
+def _get_from_cache(symbol: str, settings_version: str, features_stamp: tuple) -> Optional[Dict]:
     """
     Получает результат классификации из кэша
     ЗАЧЕМ: Минимизируем запросы к API
+    
+    Результат валиден, только если он посчитан при тех же настройках
+    и из тех же закэшированных данных Finnhub
     """
-    cache_key = symbol.upper()
-    if cache_key in _classification_cache:
-        entry = _classification_cache[cache_key]
-        if _is_cache_valid(entry):
-            return entry["data"]
+    # TTL (1 час) соблюдает хранилище; метка полей — список после JSON
+    entry = shared_state.get(CLASSIFICATION_NAMESPACE, symbol.upper())
+    if (
+        entry
+        and entry.get("settings_version") == settings_version
+        and entry.get("features_stamp") == list(features_stamp)
+    ):
+        return entry["data"]
     return None
 
 
-def _save_to_cache(symbol: str, data: Dict) -> None:
+def _save_to_cache(symbol: str, data: Dict, settings_version: str, features_stamp: tuple) -> None:
     """
     Сохраняет результат классификации в кэш
     ЗАЧЕМ: Повторные запросы того же тикера берутся из кэша
     """
-    cache_key = symbol.upper()
-    _classification_cache[cache_key] = {
+    shared_state.put(CLASSIFICATION_NAMESPACE, symbol.upper(), {
         "data": data,
-        "timestamp": datetime.now()
-    }
+        "settings_version": settings_version,
+        "features_stamp": list(features_stamp)
+    }, ttl=CACHE_TTL_SECONDS)
 
 
 # ============================================================================
@@ -248,7 +276,7 @@ async def _fetch_company_profile(symbol: str, client: httpx.AsyncClient) -> Opti
                 return data
         return None
     except Exception as e:
-        print(f"[stock_classifier] Ошибка получения профиля {symbol}: {e}")
+        logger.warning("Ошибка получения профиля %s: %s", symbol, e)
         return None
 
 
@@ -269,7 +297,7 @@ async def _fetch_basic_financials(symbol: str, client: httpx.AsyncClient) -> Opt
             return data.get("metric", {})
         return None
     except Exception as e:
-        print(f"[stock_classifier] Ошибка получения метрик {symbol}: {e}")
+        logger.warning("Ошибка получения метрик %s: %s", symbol, e)
         return None
 
 
@@ -308,7 +336,7 @@ async def _fetch_earnings_calendar(symbol: str, client: httpx.AsyncClient) -> Op
                     return max(0, days_to_earnings)
         return None
     except Exception as e:
-        print(f"[stock_classifier] Ошибка получения earnings {symbol}: {e}")
+        logger.warning("Ошибка получения earnings %s: %s", symbol, e)
         return None
 
 
@@ -328,7 +356,7 @@ async def _fetch_quote(symbol: str, client: httpx.AsyncClient) -> Optional[Dict]
             return response.json()
         return None
     except Exception as e:
-        print(f"[stock_classifier] Ошибка получения котировки {symbol}: {e}")
+        logger.warning("Ошибка получения котировки %s: %s", symbol, e)
         return None
 
 
@@ -363,7 +391,7 @@ def _classify_by_features(features: Dict) -> Dict[str, Any]:
     
     # Диагностическое логирование входных данных
     symbol = features.get("symbol", "UNKNOWN")
-    print(f"[DEBUG] Classifying {symbol}: sector='{sector}', cap=${market_cap:,.0f}, beta={beta:.2f}")
+    logger.debug("Classifying %s: sector=%r, cap=$%.0f, beta=%.2f", symbol, sector, market_cap, beta)
     
     # Загружаем настройки из файла конфигурации
     thresholds = get_thresholds_config()
@@ -382,7 +410,10 @@ def _classify_by_features(features: Dict) -> Dict[str, Any]:
     is_tech_growth_cap = tech_growth_min_cap <= market_cap <= tech_growth_max_cap
     
     # Диагностическое логирование для отладки
-    print(f"[DEBUG] Tech-Growth check: sector='{sector}', is_tech={is_tech_sector}, cap={cap_b:.1f}B, min={tech_growth_min_cap/1e9:.0f}B, max={tech_growth_max_cap/1e9:.0f}B, in_range={is_tech_growth_cap}")
+    logger.debug(
+        "Tech-Growth check: sector=%r, is_tech=%s, cap=%.1fB, min=%.0fB, max=%.0fB, in_range=%s",
+        sector, is_tech_sector, cap_b, tech_growth_min_cap / 1e9, tech_growth_max_cap / 1e9, is_tech_growth_cap
+    )
     
     if is_tech_sector and is_tech_growth_cap:
         reason = f"tech-growth ({sector}, cap:{cap_b:.0f}B)"
@@ -503,20 +534,28 @@ async def classify_stock(symbol: str) -> Dict[str, Any]:
     """
     symbol = symbol.upper().strip()
     
-    # Кэширование отключено — всегда запрашиваем свежие данные
-    # ЗАЧЕМ: Классификация должна обновляться при изменении логики/порогов
-    
-    # Получаем данные из Finnhub API параллельно
-    # ЗАЧЕМ: Минимизируем время ожидания
-    async with httpx.AsyncClient() as client:
-        profile_task = _fetch_company_profile(symbol, client)
-        metrics_task = _fetch_basic_financials(symbol, client)
-        earnings_task = _fetch_earnings_calendar(symbol, client)
-        quote_task = _fetch_quote(symbol, client)
-        
-        profile, metrics, days_to_earnings, quote = await asyncio.gather(
-            profile_task, metrics_task, earnings_task, quote_task
-        )
+    # Получаем данные Finnhub параллельно, каждое поле — из своего кэша
+    # ЗАЧЕМ: Профиль и метрики меняются редко, котировка — раз в минуту
+    (profile, profile_at), (metrics, metrics_at), (days_to_earnings, earnings_at), (quote, _) = await asyncio.gather(
+        get_cached_field(symbol, "profile", lambda client: _fetch_company_profile(symbol, client)),
+        get_cached_field(symbol, "metrics", lambda client: _fetch_basic_financials(symbol, client)),
+        get_cached_field(symbol, "earnings", lambda client: _fetch_earnings_calendar(symbol, client)),
+        get_cached_field(symbol, "quote", lambda client: _fetch_quote(symbol, client)),
+    )
+    
+    # Дни до earnings считались на момент загрузки — данные из хранилища могут быть старше суток
+    if days_to_earnings is not None:
+        days_to_earnings = max(0, days_to_earnings - int((time.time() - earnings_at) // 86400))
+    
+    # Классификация пересчитывается при смене настроек или обновлении полей, от которых
+    # она зависит. Котировка (TTL 60 с) в группу не входит — в метке её нет, иначе
+    # часовой кэш сбрасывался бы каждую минуту; текущий объём подставляется свежий
+    current_volume = quote.get("v", 0) if quote else 0
+    settings_version = get_settings_version()
+    features_stamp = (profile_at, metrics_at, earnings_at)
+    cached = _get_from_cache(symbol, settings_version, features_stamp)
+    if cached:
+        return {**cached, "features": {**cached["features"], "currentVolume": current_volume}, "cached": True}
     
     # Собираем features из полученных данных
     features = {
@@ -525,7 +564,7 @@ async def classify_stock(symbol: str) -> Dict[str, Any]:
         "sector": profile.get("finnhubIndustry", "") if profile else "",
         "avgVolume": metrics.get("10DayAverageTradingVolume", 0) * 1_000_000 if metrics else 0,  # В миллионах
         "daysToEarnings": days_to_earnings,
-        "currentVolume": quote.get("v", 0) if quote else 0,
+        "currentVolume": current_volume,
         "companyName": profile.get("name", "") if profile else "",
         "exchange": profile.get("exchange", "") if profile else "",
     }
@@ -552,14 +591,41 @@ async def classify_stock(symbol: str) -> Dict[str, Any]:
         "cached": False
     }
     
-    # Кэширование отключено
-    # _save_to_cache(symbol, result)
+    _save_to_cache(symbol, result, settings_version, features_stamp)
     
-    print(f"[stock_classifier] {symbol} → {group} ({classification['reason']}) down:{classification['down_mult']:.2f} up:{classification['up_mult']:.2f}")
+    # По строке на символ — при классификации списка в лог попадает выборка (LOG_SAMPLE_RATE)
+    logger.info(
+        "%s → %s (%s) down:%.2f up:%.2f", symbol, group, classification["reason"],
+        classification["down_mult"], classification["up_mult"],
+        extra={"symbol": symbol, "group": group, "sampled": True}
+    )
     
     return result
 
 
+async def classify_stocks(symbols: List[str]) -> List[Dict[str, Any]]:
+    """
+    Пакетная классификация watchlist
+    ЗАЧЕМ: Один вызов вместо N, запросы к Finnhub идут через общий пул
+    с ограничением параллелизма, повторяющиеся тикеры считаются один раз
+    
+    Returns:
+        Список результатов в порядке уникальных тикеров; для упавших тикеров —
+        словарь {"symbol": ..., "error": ...}
+    """
+    unique_symbols = list(dict.fromkeys(s.upper().strip() for s in symbols if s and s.strip()))
+    
+    results = await asyncio.gather(
+        *[classify_stock(symbol) for symbol in unique_symbols],
+        return_exceptions=True
+    )
+    
+    return [
+        {"symbol": symbol, "error": str(result)} if isinstance(result, Exception) else result
+        for symbol, result in zip(unique_symbols, results)
+    ]
+
+
 def get_stock_groups() -> Dict[str, Dict]:
     """
     Возвращает список всех доступных групп акций
@@ -600,11 +666,11 @@ def clear_cache(symbol: Optional[str] = None) -> None:
     Args:
         symbol: Если указан — очищает только этот тикер, иначе весь кэш
     """
-    global _classification_cache
-    
     if symbol:
-        cache_key = symbol.upper()
-        if cache_key in _classification_cache:
-            del _classification_cache[cache_key]
+        shared_state.delete(CLASSIFICATION_NAMESPACE, symbol.upper())
     else:
-        _classification_cache = {}
+        shared_state.clear(CLASSIFICATION_NAMESPACE)
+    
+    # Кэш полей в памяти тоже сбрасываем; хранилище очищает только администратор
+    # (/api/stock/fundamentals/purge) — массовая очистка вызвала бы лавину запросов к Finnhub
+    clear_fields(symbol)
@@ -0,0 +1,159 @@
+"""
+Кэш исходных данных Finnhub для классификатора акций
+ЗАЧЕМ: Классификация watchlist из 100 тикеров — это 400 запросов к Finnhub.
+Профиль, метрики, earnings и котировка кэшируются по отдельности со своими TTL,
+а все запросы идут через один пул соединений с ограничением параллелизма.
+Фундаментальные поля дополнительно читаются из локального SQLite хранилища
+Затрагивает: stock_classifier (classify_stock, classify_stocks), /api/stock/classify,
+fundamentals_store
+"""
+
+import os
+import time
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import httpx
+
+from app.services import fundamentals_store
+from app.services.prometheus_metrics import record_cache
+
+# TTL по полям: данные компании меняются редко, котировка — постоянно
+FIELD_TTLS = {
+    "profile": 7 * 24 * 3600,   # Профиль — раз в неделю
+    "metrics": 24 * 3600,       # Beta, средний объём — раз в день
+    "earnings": 12 * 3600,      # Дни до earnings — дважды в день
+    "quote": 60,                # Котировка — раз в минуту
+}
+
+# Поля, для которых None — нормальный ответ (нет earnings в ближайшие 60 дней)
+# ЗАЧЕМ: Не перезапрашивать такие тикеры при каждой классификации
+CACHE_NONE_FIELDS = {"earnings"}
+
+# Поля, которые хранятся на диске между перезапусками (котировка — только в памяти)
+PERSISTENT_FIELDS = {"profile", "metrics", "earnings"}
+
+# Сколько TTL подряд запись из хранилища считается пригодной
+# ЗАЧЕМ: Ночное обновление держит данные свежими; если оно пропущено,
+# классификация всё равно читает локально, а не идёт в Finnhub после рестарта
+STORE_MAX_AGE_FACTOR = float(os.getenv("FUNDAMENTALS_MAX_AGE_FACTOR", "3"))
+
+# Максимум одновременных запросов к Finnhub
+FINNHUB_MAX_CONCURRENCY = int(os.getenv("FINNHUB_MAX_CONCURRENCY", "8"))
+
+# Кэш: (symbol, field) -> (value, fetched_at)
+_field_cache: Dict[Tuple[str, str], Tuple[Any, float]] = {}
+
+_http_client: Optional[httpx.AsyncClient] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Общий AsyncClient для всех запросов к Finnhub
+    ЗАЧЕМ: Keep-alive соединения вместо нового TLS handshake на каждый тикер
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=10,
+            limits=httpx.Limits(
+                max_connections=FINNHUB_MAX_CONCURRENCY,
+                max_keepalive_connections=FINNHUB_MAX_CONCURRENCY
+            )
+        )
+    return _http_client
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    """Semaphore создаётся лениво — внутри работающего event loop"""
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(FINNHUB_MAX_CONCURRENCY)
+    return _semaphore
+
+
+async def close_http_client() -> None:
+    """Закрыть пул соединений при остановке приложения"""
+    global _http_client
+    if _http_client is not None and not _http_client.is_closed:
+        await _http_client.aclose()
+    _http_client = None
+
+
+async def get_cached_field(
+    symbol: str,
+    field: str,
+    fetcher: Callable[[httpx.AsyncClient], Awaitable[Any]]
+) -> Tuple[Any, float]:
+    """
+    Получить поле из кэша или загрузить через fetcher
+
+    Args:
+        symbol: Тикер
+        field: Имя поля из FIELD_TTLS
+        fetcher: Функция загрузки, принимающая общий httpx клиент
+
+    Returns:
+        (value, fetched_at) — fetched_at используется как метка свежести данных
+    """
+    key = (symbol.upper(), field)
+    now = time.time()
+
+    namespace = f"features:{field}"
+    cached = _field_cache.get(key)
+    if cached is not None and now - cached[1] < FIELD_TTLS[field]:
+        record_cache(namespace, True)
+        return cached
+
+    if field in PERSISTENT_FIELDS:
+        # SQLite (commit под блокировкой) — в потоке, чтобы не держать event loop
+        stored = await asyncio.to_thread(_read_stored, symbol, field)
+        if stored is not None and now - stored[1] < FIELD_TTLS[field] * STORE_MAX_AGE_FACTOR:
+            _field_cache[key] = stored
+            record_cache(namespace, True)
+            return stored
+
+    record_cache(namespace, False)
+    async with _get_semaphore():
+        value = await fetcher(get_http_client())
+
+    fetched_at = time.time()
+    if value is not None or field in CACHE_NONE_FIELDS:
+        await asyncio.to_thread(store_field, symbol, field, value, fetched_at)
+    return value, fetched_at
+
+
+def _read_stored(symbol: str, field: str) -> Optional[Tuple[Any, float]]:
+    """Отметить тикер как запрошенный и прочитать поле из хранилища (блокирующий вызов)"""
+    fundamentals_store.touch_symbol(symbol)
+    return fundamentals_store.get_field(symbol, field)
+
+
+def store_field(symbol: str, field: str, value: Any, fetched_at: float) -> None:
+    """Записать поле в кэш памяти и (для фундаментальных полей) в хранилище"""
+    _field_cache[(symbol.upper(), field)] = (value, fetched_at)
+    if field in PERSISTENT_FIELDS:
+        fundamentals_store.put_field(symbol, field, value, fetched_at)
+
+
+def clear_fields(symbol: Optional[str] = None) -> None:
+    """
+    Очистить кэш полей в памяти для тикера или целиком
+    Хранилище не трогаем: иначе следующие классификации разом ушли бы в Finnhub
+    """
+    if symbol is None:
+        _field_cache.clear()
+        return
+    symbol = symbol.upper()
+    for key in [k for k in _field_cache if k[0] == symbol]:
+        del _field_cache[key]
+
+
+def purge_fields(symbol: Optional[str] = None) -> None:
+    """
+    Удалить поля из памяти и из хранилища (блокирующий вызов — через asyncio.to_thread)
+    ЗАЧЕМ: Ручная очистка испорченных данных администратором
+    """
+    fundamentals_store.delete_symbol(symbol)
+    clear_fields(symbol)
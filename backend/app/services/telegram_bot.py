@@ -15,32 +15,50 @@ class TelegramBotManager:
         self.bot_token = bot_token
         self.admin_id = admin_id
         self.api_url = f"https://api.telegram.org/bot{bot_token}"
+        self._session: Optional[aiohttp.ClientSession] = None
+    
+    def get_session(self) -> aiohttp.ClientSession:
+        """
+        Общая сессия для всех запросов к Telegram API (polling, отправка, фото профиля)
+        ЗАЧЕМ: Keep-alive соединение вместо нового TLS handshake на каждый запрос
+        """
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=20, keepalive_timeout=60)
+            )
+        return self._session
+    
+    async def close(self):
+        """Закрыть сессию при остановке приложения"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
     
     async def send_message(self, chat_id: int, text: str, reply_markup=None) -> bool:
         """Отправляет сообщение в Telegram"""
         try:
-            async with aiohttp.ClientSession() as session:
-                payload = {
-                    "chat_id": chat_id,
-                    "text": text,
-                    "parse_mode": "HTML"
-                }
-                if reply_markup:
-                    payload["reply_markup"] = reply_markup
-                
-                print(f"📤 Отправляю сообщение: chat_id={chat_id}, text_len={len(text)}, has_markup={bool(reply_markup)}")
-                
-                async with session.post(
-                    f"{self.api_url}/sendMessage",
-                    json=payload,
-                    timeout=aiohttp.ClientTimeout(total=10)
-                ) as resp:
-                    data = await resp.json()
-                    print(f"📤 Telegram API ответ: status={resp.status}, ok={data.get('ok')}")
-                    if not data.get('ok'):
-                        print(f"❌ Ошибка от Telegram: {data.get('description', 'Unknown error')}")
-                        print(f"📋 Полный ответ: {data}")
-                    return data.get('ok', False)
+            session = self.get_session()
+            payload = {
+                "chat_id": chat_id,
+                "text": text,
+                "parse_mode": "HTML"
+            }
+            if reply_markup:
+                payload["reply_markup"] = reply_markup
+            
+            print(f"📤 Отправляю сообщение: chat_id={chat_id}, text_len={len(text)}, has_markup={bool(reply_markup)}")
+            
+            async with session.post(
+                f"{self.api_url}/sendMessage",
+                json=payload,
+                timeout=aiohttp.ClientTimeout(total=10)
+            ) as resp:
+                data = await resp.json()
+                print(f"📤 Telegram API ответ: status={resp.status}, ok={data.get('ok')}")
+                if not data.get('ok'):
+                    print(f"❌ Ошибка от Telegram: {data.get('description', 'Unknown error')}")
+                    print(f"📋 Полный ответ: {data}")
+                return data.get('ok', False)
         except Exception as e:
             print(f"❌ Ошибка отправки сообщения: {e}")
             import traceback
@@ -0,0 +1,89 @@
+"""
+Конкурентная обработка обновлений Telegram
+ЗАЧЕМ: Обновления из одного getUpdates обрабатывались строго по очереди — одобрение
+пачки пользователей админом ждало каждое предыдущее. Теперь пул воркеров
+обрабатывает их параллельно, а обновления с одним ключом (чат или пользователь,
+над которым действие) попадают в один воркер и сохраняют порядок
+Затрагивает: telegram_webhook (telegram_polling, process_telegram_update)
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def ordering_key(update: Dict[str, Any]) -> str:
+    """
+    Ключ упорядочивания обновления
+
+    - callback approve_/reject_ — пользователь, над которым действие
+      (разные пользователи обрабатываются параллельно, даже если кнопки жмёт один админ)
+    - сообщения и прочие callback — чат отправителя
+    """
+    callback = update.get('callback_query')
+    if callback:
+        data = callback.get('data', '')
+        if data.startswith(('approve_', 'reject_')):
+            return f"user:{data.split('_', 1)[1]}"
+        return f"chat:{callback.get('message', {}).get('chat', {}).get('id')}"
+    message = update.get('message') or {}
+    return f"chat:{message.get('chat', {}).get('id', message.get('from', {}).get('id'))}"
+
+
+class UpdateDispatcher:
+    """
+    Пул воркеров с очередью на каждого воркера
+    Ключ обновления всегда отображается в один и тот же воркер
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[Dict[str, Any]], Awaitable[None]],
+        workers: int = 8,
+        queue_size: int = 100
+    ):
+        self.handler = handler
+        self.workers = workers
+        self.queue_size = queue_size
+        self._queues: List[asyncio.Queue] = []
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._queues = [asyncio.Queue(maxsize=self.queue_size) for _ in range(self.workers)]
+        self._tasks = [asyncio.create_task(self._worker(queue)) for queue in self._queues]
+
+    async def dispatch(self, update: Dict[str, Any]) -> None:
+        """
+        Поставить обновление в очередь его воркера
+        Ждёт при заполненной очереди — polling не убегает вперёд обработки
+        """
+        index = hash(ordering_key(update)) % self.workers
+        await self._queues[index].put(update)
+
+    async def _worker(self, queue: asyncio.Queue) -> None:
+        while True:
+            update = await queue.get()
+            try:
+                await self.handler(update)
+            except Exception as e:
+                logger.error(f"Ошибка обработки обновления {update.get('update_id')}: {e}")
+            finally:
+                queue.task_done()
+
+    async def stop(self, drain_timeout: Optional[float] = 10) -> None:
+        """Дождаться обработки очередей (не дольше drain_timeout) и остановить воркеров"""
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*[queue.join() for queue in self._queues]), drain_timeout
+            )
+        except asyncio.TimeoutError:
+            logger.warning("Telegram dispatcher: очереди не обработаны до остановки")
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
@@ -0,0 +1,56 @@
+"""
+Кэш текущих цен тикеров (Polygon) в общем состоянии
+ЗАЧЕМ: Цену читают и REST эндпоинт /api/polygon/ticker/{ticker}, и поток P&L
+калькулятора (pl_stream) — запись и формат кэша в одном месте, один запрос
+к Polygon на тикер за TTL для всех клиентов и воркеров
+Затрагивает: main (get_ticker_price), pl_stream, shared_state (namespace "ticker_price")
+"""
+
+import time
+from typing import Dict, Optional
+
+from app.services import shared_state
+
+NAMESPACE = "ticker_price"
+# Свежесть цены — баланс между актуальностью и экономией запросов (лимит Polygon 5/мин)
+PRICE_TTL = 30
+# Сколько хранится последняя цена для ответа при ошибке Polygon
+STALE_TTL = 3600
+
+
+def get_cached(ticker: str) -> Optional[Dict]:
+    """Запись кэша {"data": ответ, "cached_time": epoch} или None"""
+    return shared_state.get(NAMESPACE, ticker.upper())
+
+
+def is_fresh(record: Optional[Dict]) -> bool:
+    return bool(record) and time.time() - record["cached_time"] < PRICE_TTL
+
+
+def fetch_price(ticker: str) -> Dict:
+    """
+    Запросить цену у Polygon и сохранить в кэш (блокирующий вызов)
+
+    Returns:
+        Ответ в формате /api/polygon/ticker/{ticker} (cached=False)
+    """
+    from app.services.polygon_client import PolygonClient
+
+    ticker = ticker.upper()
+    data = PolygonClient().get_stock_price(ticker)
+    response_data = {
+        "status": "success",
+        "ticker": ticker,
+        "price": data.get('price'),
+        "change": data.get('change'),
+        "changePercent": data.get('change_percent'),
+        "volume": data.get('volume'),
+        "timestamp": data.get('timestamp'),
+        "cached": False
+    }
+    # Запись живёт дольше TTL — для ответа при ошибке
+    shared_state.put(NAMESPACE, ticker, {
+        "data": response_data,
+        "cached_time": time.time()
+    }, ttl=STALE_TTL)
+    return response_data
@@ -0,0 +1,174 @@
+"""
+Индекс опционной цепочки TradingView: котировки по ключу, лестницы страйков, дельты
+ЗАЧЕМ: get_option_quote перебирал всю цепочку на каждую котировку, get_strikes и
+get_expirations заново собирали множества, а каждый пуш расширения заменял цепочку
+целиком. Теперь контракты лежат в словаре по (экспирация, страйк, тип) — котировка
+за O(1), лестницы страйков пересобираются только для изменённых экспираций, а
+дельта-пуш обновляет лишь присланные контракты и увеличивает версию цепочки
+Затрагивает: tradingview_service (хранение и чтение цепочек), routers/options_universal
+(/tradingview/receive, /tradingview/delta)
+
+Индекс живёт в памяти воркера; в shared_state лежит снимок цепочки и её версия.
+Воркер сверяет версию (маленькая запись) и перестраивает индекс, только если
+цепочку изменил другой воркер.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Поле контракта -> (имена во входных данных по приоритету, приведение типа, значение по умолчанию)
+CONTRACT_FIELDS: Dict[str, Tuple[Tuple[str, ...], Any, Any]] = {
+    'strike': (('strike',), float, 0),
+    'expiration': (('expiration', 'expiry'), str, ''),
+    'option_type': (('option_type', 'type'), lambda value: str(value).lower(), 'call'),
+    'bid': (('bid',), float, 0),
+    'ask': (('ask',), float, 0),
+    'last': (('last', 'price'), float, 0),
+    'volume': (('volume',), int, 0),
+    'open_interest': (('open_interest', 'oi'), int, 0),
+    'implied_volatility': (('implied_volatility', 'iv'), float, 0),
+    'delta': (('delta',), float, 0),
+    'gamma': (('gamma',), float, 0),
+    'theta': (('theta',), float, 0),
+    'vega': (('vega',), float, 0),
+}
+
+ContractKey = Tuple[str, float, str]
+
+
+def normalize_contract(raw: Dict, partial: bool = False) -> Dict:
+    """
+    Привести контракт от расширения к единому формату
+    partial=True — только присланные поля (для дельты), иначе недостающие по умолчанию
+    """
+    contract = {}
+    for field, (names, cast, default) in CONTRACT_FIELDS.items():
+        name = next((name for name in names if raw.get(name) is not None), None)
+        if name is not None:
+            contract[field] = cast(raw[name])
+        elif not partial:
+            contract[field] = cast(default)
+    return contract
+
+
+def contract_key(expiration: str, strike: float, option_type: str) -> ContractKey:
+    return (expiration, float(strike), option_type.lower())
+
+
+class ChainIndex:
+    """Цепочка одного тикера: контракты по ключу и лестницы экспираций/страйков"""
+
+    def __init__(self, chain: Dict, version: int, declared: Optional[Iterable[str]] = None):
+        """
+        declared — экспирации, которые прислало расширение (None — взять chain['expirations']);
+        экспирации из контрактов сюда не входят, иначе экспирация без контрактов
+        оставалась бы в списке с пустой лестницей страйков
+        """
+        self.version = version
+        self.ticker = chain.get('ticker', '')
+        self.underlying_price = chain.get('underlying_price', 0.0)
+        self.received_at = chain.get('received_at')
+        # Экспирации, объявленные расширением (могут быть и без контрактов)
+        self._declared = set(chain.get('expirations', []) if declared is None else declared)
+        self.contracts: Dict[ContractKey, Dict] = {}
+        # экспирация -> страйк -> число контрактов (call и put на одном страйке)
+        self._strike_refs: Dict[str, Dict[float, int]] = {}
+        self._strikes: Dict[str, List[float]] = {}
+        self._expirations: Optional[List[str]] = None
+        self._chain: Optional[Dict] = None
+        for contract in chain.get('options', []):
+            self._upsert(contract)
+
+    def _add_strike(self, expiration: str, strike: float, delta: int) -> None:
+        refs = self._strike_refs.setdefault(expiration, {})
+        count = refs.get(strike, 0) + delta
+        if count > 0:
+            refs[strike] = count
+        else:
+            refs.pop(strike, None)
+            if not refs:
+                del self._strike_refs[expiration]
+                self._expirations = None
+        self._strikes.pop(expiration, None)
+
+    def _upsert(self, contract: Dict) -> None:
+        key = contract_key(contract['expiration'], contract['strike'], contract['option_type'])
+        existing = self.contracts.get(key)
+        if existing is not None:
+            # Новый словарь, а не изменение на месте: снимок мог уйти в shared_state по ссылке
+            self.contracts[key] = {**existing, **contract}
+            return
+        self.contracts[key] = contract
+        if key[0] not in self._strike_refs:
+            self._expirations = None
+        self._add_strike(key[0], key[1], 1)
+
+    def _remove(self, key: ContractKey) -> bool:
+        if self.contracts.pop(key, None) is None:
+            return False
+        self._add_strike(key[0], key[1], -1)
+        return True
+
+    def apply_delta(self, upserts: Iterable[Dict], removed: Iterable[Dict],
+                    underlying_price: Optional[float] = None) -> Dict[str, int]:
+        """
+        Обновить только присланные контракты (частичные поля сливаются с текущими)
+
+        Returns:
+            {"updated": n, "added": n, "removed": n}
+        """
+        counts = {'updated': 0, 'added': 0, 'removed': 0}
+        for raw in upserts:
+            contract = normalize_contract(raw, partial=True)
+            if not {'expiration', 'strike', 'option_type'} <= contract.keys():
+                raise ValueError(f"Контракт дельты без expiration/strike/option_type: {raw}")
+            key = contract_key(contract['expiration'], contract['strike'], contract['option_type'])
+            if key in self.contracts:
+                counts['updated'] += 1
+            else:
+                contract = {**normalize_contract(raw), **contract}
+                counts['added'] += 1
+            self._upsert(contract)
+        for raw in removed:
+            contract = normalize_contract(raw, partial=True)
+            key = contract_key(
+                contract.get('expiration', ''), contract.get('strike', 0), contract.get('option_type', 'call')
+            )
+            counts['removed'] += self._remove(key)
+        if underlying_price is not None:
+            self.underlying_price = float(underlying_price)
+        self.received_at = datetime.now().isoformat()
+        self.version += 1
+        self._chain = None
+        return counts
+
+    def declared_expirations(self) -> List[str]:
+        """Экспирации, присланные расширением (для снимка в shared_state)"""
+        return sorted(self._declared)
+
+    def quote(self, expiration: str, strike: float, option_type: str) -> Optional[Dict]:
+        return self.contracts.get(contract_key(expiration, strike, option_type))
+
+    def expirations(self) -> List[str]:
+        if self._expirations is None:
+            self._expirations = sorted(self._declared | self._strike_refs.keys())
+        return self._expirations
+
+    def strikes(self, expiration: str) -> List[float]:
+        ladder = self._strikes.get(expiration)
+        if ladder is None:
+            ladder = self._strikes[expiration] = sorted(self._strike_refs.get(expiration, ()))
+        return ladder
+
+    def to_chain(self) -> Dict:
+        """Цепочка в прежнем формате (для /tradingview/chain и снимка в shared_state)"""
+        if self._chain is None:
+            self._chain = {
+                'ticker': self.ticker,
+                'underlying_price': self.underlying_price,
+                'expirations': list(self.expirations()),
+                'options': list(self.contracts.values()),
+                'received_at': self.received_at,
+                'version': self.version
+            }
+        return self._chain
@@ -6,14 +6,36 @@
 СТАТУС: ЗАГЛУШКА — полная интеграция будет реализована после получения документации
 
 Функционал:
-- Приём опционных цепочек от расширения
+- Приём опционных цепочек от расширения (полные снимки и дельты)
 - Парсинг и нормализация данных
-- Кэширование полученных данных
+- Кэширование полученных данных (shared_state — цепочка видна всем воркерам)
 """
 
+from contextlib import contextmanager
 from typing import Dict, List, Optional
 from datetime import datetime, timedelta
 import json
+import time
+import uuid
+
+from app.services import shared_state
+from app.services.tradingview_chain_store import ChainIndex, normalize_contract
+
+# Пространства имён общего состояния: снимок цепочки и её версия (маленькая запись,
+# сверяется на каждом чтении); записи живут сутки (устаревание — по _cache_ttl)
+STATE_NAMESPACE = "tradingview"
+VERSION_NAMESPACE = "tradingview_version"
+STATE_TTL_SECONDS = 86400
+# Блокировка записи цепочки тикера (claim = SET NX): чтение версии, применение
+# дельты и публикация N+1 выполняет один воркер за раз, иначе две параллельные
+# дельты обе публикуют N+1 и одна теряется. TTL — страховка от упавшего воркера
+LOCK_NAMESPACE = "tradingview_lock"
+LOCK_TTL_SECONDS = 5
+LOCK_WAIT_SECONDS = 1.0
+
+
+class ChainBusyError(Exception):
+    """Цепочку тикера сейчас обновляет другой запрос (расширение повторит пуш)"""
 
 
 class TradingViewService:
@@ -27,10 +49,66 @@ class TradingViewService:
     
     def __init__(self):
         """Инициализация сервиса"""
-        # Кэш для хранения полученных данных
-        self._cache: Dict[str, Dict] = {}
+        # Цепочки хранятся в shared_state: расширение шлёт данные в один воркер,
+        # а калькулятор читает из любого. Индексы — локальные для воркера
         self._cache_ttl = timedelta(minutes=5)
-        self._last_update: Dict[str, datetime] = {}
+        self._indexes: Dict[str, ChainIndex] = {}
+    
+    def _get_index(self, ticker: str) -> Optional[ChainIndex]:
+        """
+        Индекс цепочки тикера (перестраивается, если версия в shared_state новее)
+        
+        Returns:
+            ChainIndex или None, если цепочки нет
+        """
+        ticker_upper = ticker.upper()
+        meta = shared_state.get(VERSION_NAMESPACE, ticker_upper)
+        index = self._indexes.get(ticker_upper)
+        if meta is None:
+            self._indexes.pop(ticker_upper, None)
+            return None
+        if index is not None and index.version == meta['version']:
+            return index
+        entry = shared_state.get(STATE_NAMESPACE, ticker_upper)
+        if entry is None:
+            return None
+        index = self._indexes[ticker_upper] = ChainIndex(
+            entry['chain'], meta['version'], entry.get('declared_expirations')
+        )
+        return index
+    
+    @contextmanager
+    def _write_lock(self, ticker: str):
+        """Эксклюзивная запись цепочки тикера во всех воркерах (короткое ожидание)"""
+        # Ждёт в потоке threadpool (эндпоинты синхронные), event loop не блокируется
+        owner = uuid.uuid4().hex
+        deadline = time.monotonic() + LOCK_WAIT_SECONDS
+        while not shared_state.claim(LOCK_NAMESPACE, ticker, ttl=LOCK_TTL_SECONDS, owner=owner):
+            if time.monotonic() >= deadline:
+                raise ChainBusyError(f"Цепочка {ticker} обновляется другим запросом")
+            time.sleep(0.01)
+        try:
+            yield
+        finally:
+            # Запись дольше TTL — ключ мог занять другой запрос, его блокировку не снимаем
+            shared_state.release(LOCK_NAMESPACE, ticker, owner)
+    
+    def _save_index(self, ticker: str, index: ChainIndex) -> str:
+        """Записать снимок и версию в shared_state; возвращает время обновления"""
+        updated_at = datetime.now().isoformat()
+        self._indexes[ticker] = index
+        shared_state.put(STATE_NAMESPACE, ticker, {
+            'chain': index.to_chain(),
+            # В chain['expirations'] есть и выведенные из контрактов — объявленные отдельно
+            'declared_expirations': index.declared_expirations(),
+            'updated_at': updated_at
+        }, ttl=STATE_TTL_SECONDS)
+        # Версия пишется после снимка — читатель с новой версией найдёт новый снимок
+        shared_state.put(VERSION_NAMESPACE, ticker, {
+            'version': index.version,
+            'updated_at': updated_at
+        }, ttl=STATE_TTL_SECONDS)
+        return updated_at
     
     def receive_options_chain(self, ticker: str, data: Dict) -> Dict:
         """
@@ -48,17 +126,23 @@ class TradingViewService:
             # Нормализуем данные
             normalized = self._normalize_options_data(data)
             
-            # Сохраняем в кэш
-            self._cache[ticker.upper()] = normalized
-            self._last_update[ticker.upper()] = datetime.now()
+            # Полный снимок заменяет цепочку; версия продолжает счёт предыдущей
+            ticker_upper = ticker.upper()
+            with self._write_lock(ticker_upper):
+                meta = shared_state.get(VERSION_NAMESPACE, ticker_upper)
+                index = ChainIndex(normalized, (meta['version'] if meta else 0) + 1)
+                received_at = self._save_index(ticker_upper, index)
             
             return {
                 'status': 'success',
-                'ticker': ticker.upper(),
-                'contracts_count': len(normalized.get('options', [])),
-                'expirations_count': len(normalized.get('expirations', [])),
-                'received_at': datetime.now().isoformat()
+                'ticker': ticker_upper,
+                'version': index.version,
+                'contracts_count': len(index.contracts),
+                'expirations_count': len(index.expirations()),
+                'received_at': received_at
             }
+        except ChainBusyError as e:
+            return {'status': 'busy', 'error': str(e), 'ticker': ticker.upper()}
         except Exception as e:
             return {
                 'status': 'error',
@@ -66,6 +150,75 @@ class TradingViewService:
                 'ticker': ticker
             }
     
+    def receive_options_delta(self, ticker: str, data: Dict) -> Dict:
+        """
+        Принять частичное обновление цепочки от расширения
+        ЗАЧЕМ: Расширение шлёт только изменившиеся контракты — цепочка не
+        пересобирается целиком, и пуши можно делать часто
+        
+        Args:
+            ticker: Тикер инструмента
+            data: options/chain — изменённые или новые контракты (ключ —
+                expiration + strike + option_type, остальные поля — только изменённые),
+                removed — ключи удалённых контрактов, underlying_price / price,
+                base_version — версия, на которую рассчитана дельта (необязательно)
+            
+        Returns:
+            Dict со статусом и новой версией; resync_required — нужен полный снимок,
+            busy — цепочку обновляет другой запрос (повторить пуш)
+        """
+        ticker_upper = ticker.upper()
+        try:
+            # Версия читается под блокировкой — дельта применяется к последнему снимку
+            with self._write_lock(ticker_upper):
+                index = self._get_index(ticker_upper)
+                base_version = data.get('base_version')
+                if index is None or (base_version is not None and base_version != index.version):
+                    # Дельта к неизвестной версии исказила бы цепочку — просим полный снимок
+                    return {
+                        'status': 'resync_required',
+                        'ticker': ticker_upper,
+                        'version': index.version if index else None
+                    }
+                
+                counts = index.apply_delta(
+                    data.get('options') or data.get('chain') or [],
+                    data.get('removed') or [],
+                    data.get('underlying_price') or data.get('price')
+                )
+                received_at = self._save_index(ticker_upper, index)
+            
+            return {
+                'status': 'success',
+                'ticker': ticker_upper,
+                'version': index.version,
+                **counts,
+                'contracts_count': len(index.contracts),
+                'received_at': received_at
+            }
+        except ChainBusyError as e:
+            return {'status': 'busy', 'error': str(e), 'ticker': ticker_upper}
+        except Exception as e:
+            # Индекс мог измениться частично — следующее чтение перестроит его из снимка
+            self._indexes.pop(ticker_upper, None)
+            return {
+                'status': 'error',
+                'error': str(e),
+                'ticker': ticker
+            }
+    
+    def get_chain_index(self, ticker: str) -> Optional[ChainIndex]:
+        """
+        Индекс цепочки для серии чтений: версия сверяется один раз, дальше
+        котировки берутся из индекса без обращений к shared_state
+        ЗАЧЕМ: Поток P&L читает цену и IV всех позиций тикера на каждом тике
+        """
+        return self._get_index(ticker)
+    
+    def is_fresh(self, index: ChainIndex) -> bool:
+        """Цепочка обновлялась не раньше _cache_ttl назад"""
+        return datetime.now() - datetime.fromisoformat(index.received_at) <= self._cache_ttl
+    
     def get_options_chain(self, ticker: str) -> Optional[Dict]:
         """
         Получить опционную цепочку из кэша
@@ -77,23 +230,21 @@ class TradingViewService:
         Returns:
             Dict с опционной цепочкой или None
         """
-        ticker_upper = ticker.upper()
-        
         # Проверяем наличие в кэше
-        if ticker_upper not in self._cache:
+        index = self._get_index(ticker)
+        if index is None:
             return None
         
         # Проверяем TTL
-        last_update = self._last_update.get(ticker_upper)
-        if last_update and datetime.now() - last_update > self._cache_ttl:
+        if not self.is_fresh(index):
             # Данные устарели
             return {
-                **self._cache[ticker_upper],
+                **index.to_chain(),
                 '_stale': True,
-                '_last_update': last_update.isoformat()
+                '_last_update': index.received_at
             }
         
-        return self._cache[ticker_upper]
+        return index.to_chain()
     
     def get_current_price(self, ticker: str) -> Optional[float]:
         """
@@ -106,9 +257,9 @@ class TradingViewService:
         Returns:
             Текущая цена или None
         """
-        data = self.get_options_chain(ticker)
-        if data:
-            return data.get('underlying_price')
+        index = self._get_index(ticker)
+        if index:
+            return index.underlying_price
         return None
     
     def get_expirations(self, ticker: str) -> List[str]:
@@ -122,9 +273,9 @@ class TradingViewService:
         Returns:
             Список дат экспирации
         """
-        data = self.get_options_chain(ticker)
-        if data:
-            return data.get('expirations', [])
+        index = self._get_index(ticker)
+        if index:
+            return index.expirations()
         return []
     
     def get_strikes(self, ticker: str, expiration: str) -> List[float]:
@@ -139,17 +290,12 @@ class TradingViewService:
         Returns:
             Список страйков
         """
-        data = self.get_options_chain(ticker)
-        if not data:
+        index = self._get_index(ticker)
+        if not index:
             return []
         
-        options = data.get('options', [])
-        strikes = set()
-        for opt in options:
-            if opt.get('expiration') == expiration:
-                strikes.add(opt.get('strike'))
-        
-        return sorted(list(strikes))
+        # Лестница страйков пересобирается только после изменения этой экспирации
+        return index.strikes(expiration)
     
     def get_option_quote(
         self,
@@ -171,18 +317,11 @@ class TradingViewService:
         Returns:
             Dict с данными опциона или None
         """
-        data = self.get_options_chain(ticker)
-        if not data:
+        index = self._get_index(ticker)
+        if not index:
             return None
         
-        options = data.get('options', [])
-        for opt in options:
-            if (opt.get('expiration') == expiration and
-                opt.get('strike') == strike and
-                opt.get('option_type') == option_type.lower()):
-                return opt
-        
-        return None
+        return index.quote(expiration, strike, option_type)
     
     def is_connected(self) -> bool:
         """
@@ -199,10 +338,11 @@ class TradingViewService:
         Получить статус сервиса
         ЗАЧЕМ: Для диагностики и отладки
         """
+        cached_tickers = shared_state.keys(VERSION_NAMESPACE)
         return {
             'connected': self.is_connected(),
-            'cached_tickers': list(self._cache.keys()),
-            'cache_size': len(self._cache),
+            'cached_tickers': cached_tickers,
+            'cache_size': len(cached_tickers),
             '_is_stub': True,
             '_message': 'Сервис TradingView — заглушка. Ожидается документация для полной интеграции.'
         }
@@ -223,37 +363,18 @@ class TradingViewService:
         
         normalized = {
             'ticker': data.get('ticker', data.get('symbol', '')).upper(),
-            'underlying_price': float(data.get('underlying_price', data.get('price', 0))),
-            'expirations': data.get('expirations', []),
+            'underlying_price': float(data.get('underlying_price') or data.get('price') or 0),
+            'expirations': data.get('expirations') or [],
             'options': [],
             'received_at': datetime.now().isoformat()
         }
         
         # Нормализуем опционы
-        raw_options = data.get('options', data.get('chain', []))
-        for opt in raw_options:
-            normalized_opt = {
-                'strike': float(opt.get('strike', 0)),
-                'expiration': opt.get('expiration', opt.get('expiry', '')),
-                'option_type': opt.get('option_type', opt.get('type', 'call')).lower(),
-                'bid': float(opt.get('bid', 0)),
-                'ask': float(opt.get('ask', 0)),
-                'last': float(opt.get('last', opt.get('price', 0))),
-                'volume': int(opt.get('volume', 0)),
-                'open_interest': int(opt.get('open_interest', opt.get('oi', 0))),
-                'implied_volatility': float(opt.get('implied_volatility', opt.get('iv', 0))),
-                'delta': float(opt.get('delta', 0)),
-                'gamma': float(opt.get('gamma', 0)),
-                'theta': float(opt.get('theta', 0)),
-                'vega': float(opt.get('vega', 0))
-            }
-            normalized['options'].append(normalized_opt)
-        
-        # Извлекаем уникальные экспирации если не указаны
-        if not normalized['expirations'] and normalized['options']:
-            expirations = set(opt['expiration'] for opt in normalized['options'])
-            normalized['expirations'] = sorted(list(expirations))
+        raw_options = data.get('options') or data.get('chain') or []
+        normalized['options'] = [normalize_contract(opt) for opt in raw_options]
         
+        # Экспирации из контрактов сюда не добавляем: ChainIndex выводит их сам и
+        # убирает экспирацию, когда дельта удаляет её последний контракт
         return normalized
     
     def generate_mock_data(self, ticker: str, current_price: float) -> Dict:
@@ -4,6 +4,7 @@
 
 Источник: Federal Reserve Economic Data (FRED)
 Серия: DGS3MO - 3-месячные Treasury Bills (стандарт для опционов)
+Кэш ставки — в shared_state: один запрос к FRED в час на все воркеры
 """
 
 import os
@@ -12,17 +13,22 @@ import requests
 from typing import Optional
 from functools import lru_cache
 
+from app.services import shared_state
+
 # Константы
 FRED_BASE_URL = "https://api.stlouisfed.org/fred/series/observations"
 TREASURY_SERIES_ID = "DGS3MO"  # 3-месячные Treasury Bills
 CACHE_TTL_SECONDS = 3600  # Кэш на 1 час (ставка меняется редко)
 DEFAULT_RATE = 0.045  # 4.5% - fallback если API недоступен
 
-# Глобальный кэш для ставки
-_rate_cache = {
-    "rate": None,
-    "timestamp": 0
-}
+# Кэш ставки в общем состоянии: {"rate", "timestamp"}
+# Запись хранится неделю — при недоступном FRED лучше прошлая ставка, чем fallback
+STATE_NAMESPACE = "treasury_rate"
+STATE_TTL_SECONDS = 7 * 86400
+
+
+def _get_rate_cache() -> dict:
+    return shared_state.get(STATE_NAMESPACE, TREASURY_SERIES_ID) or {"rate": None, "timestamp": 0}
 
 
 def get_fred_api_key() -> Optional[str]:
@@ -92,8 +98,7 @@ def get_risk_free_rate() -> float:
     Returns:
         float: Безрисковая ставка в десятичном формате (0.045 = 4.5%)
     """
-    global _rate_cache
-    
+    _rate_cache = _get_rate_cache()
     current_time = time.time()
     
     # Проверяем кэш
@@ -107,8 +112,10 @@ def get_risk_free_rate() -> float:
     
     if rate is not None:
         # Обновляем кэш
-        _rate_cache["rate"] = rate
-        _rate_cache["timestamp"] = current_time
+        shared_state.put(STATE_NAMESPACE, TREASURY_SERIES_ID, {
+            "rate": rate,
+            "timestamp": current_time
+        }, ttl=STATE_TTL_SECONDS)
         return rate
     
     # Если API недоступен, используем кэшированное значение или fallback
@@ -128,9 +135,8 @@ def get_rate_info() -> dict:
     Returns:
         dict: {rate, source, updated_at}
     """
-    global _rate_cache
-    
     rate = get_risk_free_rate()
+    _rate_cache = _get_rate_cache()
     
     # Определяем источник
     if _rate_cache["rate"] is not None and _rate_cache["timestamp"] > 0:
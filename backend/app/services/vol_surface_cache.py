@@ -0,0 +1,210 @@
+"""
+Кэш Volatility Surface по тикеру для ML прогноза цен опционов
+ЗАЧЕМ: /api/ml/predict-price на каждый вызов заново грузил цену, даты экспирации,
+пять опционных цепочек и строил surface — повторные прогнозы по тому же тикеру
+(другие страйки и горизонты) теперь переиспользуют одну поверхность
+Затрагивает: ml_api.predict_price, PolygonClient, SurfaceBuilder
+"""
+
+import asyncio
+import logging
+import math
+import time
+from typing import Dict, Any, Optional, Tuple, List
+
+from app.services.prometheus_metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+# TTL цены базового актива (как _ticker_price_ttl в main.py)
+SPOT_TTL = 30
+# Через сколько секунд поверхность обновляется в фоне (отдаём старую)
+SURFACE_REFRESH_AFTER = 5 * 60
+# После этого срока поверхность не отдаётся и строится заново синхронно
+SURFACE_MAX_AGE = 30 * 60
+# Ширина бакета цены базового актива (1%)
+# ЗАЧЕМ: Surface строится в log-moneyness, малые движения цены её не меняют
+SPOT_BUCKET_PCT = 0.01
+# Сколько ближайших дат экспирации используется для построения surface
+NUM_EXPIRATIONS = 5
+
+# Кэш цен: ticker -> (price, timestamp)
+_spot_cache: Dict[str, Tuple[float, float]] = {}
+# Кэш поверхностей: (ticker, reference_date, spot_bucket) -> entry
+_surface_cache: Dict[Tuple[str, str, int], Dict[str, Any]] = {}
+# Lock на ключ — один холодный построитель на тикер, остальные ждут результат
+_build_locks: Dict[Tuple[str, str, int], asyncio.Lock] = {}
+# Ключи, обновляемые в фоне, и ссылки на задачи (чтобы их не собрал GC)
+_refreshing: set = set()
+_background_tasks: set = set()
+
+_polygon_client = None
+
+
+def _get_polygon():
+    """Один PolygonClient на процесс вместо нового на каждый запрос"""
+    global _polygon_client
+    if _polygon_client is None:
+        from app.services.polygon_client import PolygonClient
+        _polygon_client = PolygonClient()
+    return _polygon_client
+
+
+def spot_bucket(spot_price: float) -> int:
+    """Номер логарифмического бакета цены (шаг SPOT_BUCKET_PCT)"""
+    return int(round(math.log(spot_price) / math.log1p(SPOT_BUCKET_PCT)))
+
+
+async def get_spot_price(ticker: str) -> Optional[float]:
+    """Цена базового актива из Polygon с коротким кэшем"""
+    ticker = ticker.upper()
+    now = time.time()
+
+    cached = _spot_cache.get(ticker)
+    if cached and now - cached[1] < SPOT_TTL:
+        record_cache("spot_price", True)
+        return cached[0]
+
+    record_cache("spot_price", False)
+    stock_data = await asyncio.to_thread(_get_polygon().get_stock_price, ticker)
+    price = stock_data.get('price')
+    if price:
+        _spot_cache[ticker] = (price, now)
+    return price
+
+
+async def _fetch_chain(ticker: str, expiration_date: str) -> List[Dict]:
+    """Опционная цепочка одной даты (ошибка одной даты не ломает остальные)"""
+    try:
+        return await asyncio.to_thread(
+            _get_polygon().get_options_chain, ticker, expiration_date
+        )
+    except Exception as e:
+        logger.warning(f"⚠️ Ошибка получения опционов для {expiration_date}: {e}")
+        return []
+
+
+async def _build_entry(ticker: str, spot_price: float, reference_date: str) -> Optional[Dict[str, Any]]:
+    """Загрузить цепочки по ближайшим датам экспирации и построить surface"""
+    start = time.perf_counter()
+    polygon = _get_polygon()
+
+    # Даты экспирации, затем цепочки параллельно
+    # ЗАЧЕМ: Для интерполяции нужны точки с разными T (временами до экспирации)
+    options_chain: List[Dict] = []
+    try:
+        expiration_dates = await asyncio.to_thread(polygon.get_expiration_dates, ticker)
+        chains = await asyncio.gather(
+            *[_fetch_chain(ticker, exp) for exp in expiration_dates[:NUM_EXPIRATIONS]]
+        )
+        for chain in chains:
+            options_chain.extend(chain)
+        logger.info(f"📊 Загружено {len(options_chain)} опционов для {ticker}")
+    except Exception as e:
+        logger.warning(f"⚠️ Не удалось получить опционную цепочку: {e}")
+
+    if not options_chain:
+        return None
+
+    from ml.data.surface_builder import SurfaceBuilder
+    builder = SurfaceBuilder()
+    surface = await asyncio.to_thread(
+        builder.build_surface_from_chain,
+        options_chain=options_chain,
+        spot_price=spot_price,
+        reference_date=reference_date
+    )
+    if surface is None:
+        return None
+
+    logger.info(f"🧊 Surface для {ticker} построен за {time.perf_counter() - start:.2f}s")
+    return {
+        "surface": surface,
+        "options_chain": options_chain,
+        "spot_price": spot_price,
+        "built_at": time.time()
+    }
+
+
+async def _refresh_in_background(key: Tuple[str, str, int], spot_price: float) -> None:
+    """Фоновое перестроение поверхности (stale-while-revalidate)"""
+    try:
+        entry = await _build_entry(key[0], spot_price, key[1])
+        if entry is not None:
+            _surface_cache[key] = entry
+    except Exception as e:
+        logger.warning(f"⚠️ Фоновое обновление surface {key[0]} не удалось: {e}")
+    finally:
+        _refreshing.discard(key)
+
+
+def _schedule_refresh(key: Tuple[str, str, int], spot_price: float) -> None:
+    """Запустить фоновое обновление, если оно ещё не идёт"""
+    if key in _refreshing:
+        return
+    _refreshing.add(key)
+    task = asyncio.create_task(_refresh_in_background(key, spot_price))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+def _evict_stale(reference_date: str) -> None:
+    """Удалить поверхности прошлых дат и просроченные записи"""
+    now = time.time()
+    for key in list(_surface_cache):
+        if key[1] != reference_date or now - _surface_cache[key]["built_at"] > SURFACE_MAX_AGE:
+            del _surface_cache[key]
+            _build_locks.pop(key, None)
+
+
+async def get_surface(ticker: str, spot_price: float, reference_date: str) -> Optional[Dict[str, Any]]:
+    """
+    Получить Volatility Surface для тикера (из кэша или построить)
+
+    Returns:
+        dict с полями surface, options_chain, spot_price, built_at или None,
+        если данных недостаточно для построения
+    """
+    ticker = ticker.upper()
+    key = (ticker, reference_date, spot_bucket(spot_price))
+
+    entry = _surface_cache.get(key)
+    if entry is not None:
+        age = time.time() - entry["built_at"]
+        if age < SURFACE_MAX_AGE:
+            if age > SURFACE_REFRESH_AFTER:
+                _schedule_refresh(key, spot_price)
+            record_cache("vol_surface", True)
+            return entry
+
+    record_cache("vol_surface", False)
+    lock = _build_locks.setdefault(key, asyncio.Lock())
+    async with lock:
+        # Поверхность мог построить параллельный запрос, пока мы ждали lock
+        entry = _surface_cache.get(key)
+        if entry is not None and time.time() - entry["built_at"] < SURFACE_MAX_AGE:
+            return entry
+
+        entry = await _build_entry(ticker, spot_price, reference_date)
+        if entry is not None:
+            _evict_stale(reference_date)
+            _surface_cache[key] = entry
+        return entry
+
+
+def get_cache_stats() -> Dict[str, Any]:
+    """Состояние кэша для отладки"""
+    now = time.time()
+    return {
+        "surfaces": [
+            {
+                "ticker": key[0],
+                "reference_date": key[1],
+                "spot_bucket": key[2],
+                "age_seconds": round(now - entry["built_at"], 1),
+                "options_count": len(entry["options_chain"])
+            }
+            for key, entry in _surface_cache.items()
+        ],
+        "refreshing": len(_refreshing)
+    }
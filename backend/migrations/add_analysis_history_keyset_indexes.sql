@@ -0,0 +1,5 @@
+-- Migration: Composite indexes for keyset pagination of analysis_history
+-- Description: /api/analysis/history pages by (created_at, id) cursor, optionally filtered by ticker
+
+CREATE INDEX IF NOT EXISTS idx_created_at_id ON analysis_history (created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_ticker_created_at ON analysis_history (ticker, created_at DESC, id DESC);
@@ -0,0 +1,6 @@
+-- Migration: Keyset pagination indexes for analysis_history (SQLite version)
+-- Description: SQLite stores TIMESTAMP as text in mixed formats, so /api/analysis/history
+-- sorts by strftime('%Y-%m-%d %H:%M:%f', created_at); the expression must match the query verbatim
+
+CREATE INDEX IF NOT EXISTS idx_sqlite_sort_key_id ON analysis_history (strftime('%Y-%m-%d %H:%M:%f', created_at) DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_sqlite_ticker_sort_key_id ON analysis_history (ticker, strftime('%Y-%m-%d %H:%M:%f', created_at) DESC, id DESC);
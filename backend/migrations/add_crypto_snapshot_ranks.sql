@@ -0,0 +1,29 @@
+-- Миграция: состав снимков криптовалют в таблице позиций вместо JSON копии списка
+-- ЗАЧЕМ: Сравнение снимков и история входа/выхода тикера — индексные SQL запросы,
+-- БД не растёт на полный список при каждом снимке
+-- Старые снимки переносятся при старте приложения (backfill_legacy_snapshots)
+
+-- Справочник названий криптовалют
+CREATE TABLE IF NOT EXISTS crypto_assets (
+    symbol VARCHAR PRIMARY KEY,
+    name VARCHAR NOT NULL
+);
+
+-- Позиции криптовалют в снимке
+CREATE TABLE IF NOT EXISTS crypto_snapshot_ranks (
+    snapshot_id INTEGER NOT NULL REFERENCES crypto_snapshots(id) ON DELETE CASCADE,
+    symbol VARCHAR NOT NULL,
+    rank INTEGER NOT NULL,
+    PRIMARY KEY (snapshot_id, symbol)
+);
+
+-- Периоды пребывания в топе (left_snapshot_id NULL — всё ещё в топе)
+CREATE TABLE IF NOT EXISTS crypto_membership_periods (
+    id SERIAL PRIMARY KEY,
+    symbol VARCHAR NOT NULL,
+    entered_snapshot_id INTEGER NOT NULL REFERENCES crypto_snapshots(id) ON DELETE CASCADE,
+    left_snapshot_id INTEGER REFERENCES crypto_snapshots(id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_crypto_snapshot_ranks_symbol ON crypto_snapshot_ranks(symbol, snapshot_id);
+CREATE INDEX IF NOT EXISTS idx_crypto_membership_symbol ON crypto_membership_periods(symbol, entered_snapshot_id);
@@ -0,0 +1,151 @@
+"""
+Конкурентный режим загрузки обучающих данных (--concurrent)
+ЗАЧЕМ: Последовательная обработка (тикер, день) простаивала на сетевых задержках —
+здесь много задач выполняются одновременно в рамках общего лимита запросов к Polygon,
+а каждая surface сразу пишется в шардированное хранилище
+Затрагивает: download_training_data.py, surface_shard_store.py, Polygon API
+"""
+
+import time
+import asyncio
+import logging
+from typing import List, Tuple
+
+from surface_shard_store import SurfaceShardStore
+
+logger = logging.getLogger(__name__)
+
+
+class RateBudget:
+    """
+    Общий лимит запросов в минуту для всех задач
+    ЗАЧЕМ: Конкурентные задачи делят один rate limit Polygon, запросы
+    распределяются равномерно по временным слотам
+    """
+
+    def __init__(self, rate_per_minute: float):
+        self.interval = 60.0 / rate_per_minute
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Дождаться своего слота"""
+        async with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class ConcurrentDownloadRunner:
+    """
+    Исполнитель задач (тикер, день) с ограничением параллелизма
+    Использует загрузчик, построитель surface и проверки качества TrainingDataDownloader
+    """
+
+    def __init__(self, downloader, store: SurfaceShardStore, workers: int = 8):
+        self.downloader = downloader
+        self.store = store
+        self.workers = workers
+        self.budget = RateBudget(downloader.loader.rate_limit)
+        self.stats = downloader.stats
+
+    async def run(self, trading_days: List[str]):
+        """Выполнить все незавершённые задачи"""
+        completed = self.store.completed_tasks()
+        tasks: List[Tuple[str, str]] = []
+        for ticker in self.downloader.tickers:
+            for date in trading_days:
+                if f"{ticker}_{date}" in completed:
+                    self.stats["cache_hits"] += 1
+                    self.stats["processed_days"] += 1
+                else:
+                    tasks.append((ticker, date))
+
+        logger.info(f"🧵 Конкурентный режим: {len(tasks)} задач, {self.workers} воркеров")
+
+        # Очередь задач вместо create_task на каждую — память не растёт с числом дней
+        queue: asyncio.Queue = asyncio.Queue()
+        for task in tasks:
+            queue.put_nowait(task)
+
+        await asyncio.gather(*[self._worker(queue) for _ in range(self.workers)])
+        self.store.close()
+
+    async def _worker(self, queue: asyncio.Queue):
+        """Обработка задач из очереди до её опустошения"""
+        while True:
+            try:
+                ticker, date = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                await self._process_task(ticker, date)
+            except Exception as e:
+                logger.error(f"   ❌ {ticker} {date}: ошибка - {e}")
+                self.stats["failed_surfaces"] += 1
+            finally:
+                self.stats["processed_days"] += 1
+                self._log_progress()
+
+    async def _process_task(self, ticker: str, date: str):
+        """Загрузить цепочку и цену, проверить качество, построить и сохранить surface"""
+        key = f"{ticker}_{date}"
+        downloader = self.downloader
+
+        await self.budget.acquire()
+        options_chain = await downloader.loader.get_options_chain(ticker, date)
+        self.stats["api_requests"] += 1
+        if not options_chain:
+            # Нет данных — не чекпоинтим, чтобы повторить при следующем запуске
+            self.stats["failed_surfaces"] += 1
+            return
+
+        await self.budget.acquire()
+        price_history = await downloader.loader.get_underlying_price_history(ticker, date, date)
+        self.stats["api_requests"] += 1
+        spot_price = price_history[0].get("c", 0) if price_history else 0
+        if spot_price <= 0:
+            self.stats["failed_surfaces"] += 1
+            return
+
+        quality_check = downloader._check_chain_quality(options_chain, spot_price, date)
+        if not quality_check["passed"]:
+            logger.debug(f"   ⚠️ {key}: {quality_check['reason']}")
+            self.stats["skipped_low_quality"] += 1
+            self.store.mark_task(key, "skipped")
+            return
+
+        # Построение surface — CPU работа, выносим из event loop
+        surface = await asyncio.to_thread(
+            downloader.surface_builder.build_surface_from_chain,
+            options_chain, spot_price, date
+        )
+        if surface is None:
+            self.stats["failed_surfaces"] += 1
+            self.store.mark_task(key, "failed")
+            return
+
+        surface_quality = downloader._check_surface_quality(surface)
+        if not surface_quality["passed"]:
+            logger.debug(f"   ⚠️ {key}: surface quality - {surface_quality['reason']}")
+            self.stats["skipped_low_quality"] += 1
+            self.store.mark_task(key, "skipped")
+            return
+
+        self.store.append(ticker, date, spot_price, surface)
+        self.store.mark_task(key, True)
+        self.stats["successful_surfaces"] += 1
+
+    def _log_progress(self):
+        """Прогресс каждые 25 задач"""
+        processed = self.stats["processed_days"]
+        if processed % 25 == 0:
+            progress_pct = processed / max(1, self.stats["total_days"]) * 100
+            logger.info(
+                f"   📊 {processed}/{self.stats['total_days']} задач | "
+                f"Surfaces: {self.stats['successful_surfaces']} | "
+                f"Общий прогресс: {progress_pct:.1f}%"
+            )
@@ -10,6 +10,8 @@
 Использование:
     python download_training_data.py --tickers SPY,QQQ,AAPL --days 30
     python download_training_data.py --resume  # продолжить с последней точки
+    python download_training_data.py --concurrent --workers 16  # параллельно, шарды на диске
+    python download_training_data.py --concurrent --export-npz  # + собрать training_data.npz
 """
 
 import os
@@ -76,6 +78,9 @@ DATA_DIR = Path(__file__).parent.parent / "ml" / "data" / "training"
 # Файл прогресса для resume
 PROGRESS_FILE = DATA_DIR / "download_progress.json"
 
+# Шардированное хранилище для конкурентного режима (шарды + индекс + чекпоинты)
+SHARDS_DIR = DATA_DIR / "shards"
+
 
 class TrainingDataDownloader:
     """
@@ -316,6 +321,51 @@ class TrainingDataDownloader:
         
         return self.stats
     
+    async def download_all_concurrent(self, workers: int = 8, export: bool = False) -> Dict:
+        """
+        Конкурентная загрузка: много задач (тикер, день) в рамках общего rate limit
+        ЗАЧЕМ: Многомесячная загрузка по 35 тикерам с постоянной памятью —
+        surfaces сразу пишутся в шарды, чекпоинт пишется по каждой задаче
+        
+        Returns:
+            Статистика загрузки
+        """
+        from surface_shard_store import SurfaceShardStore, export_npz
+        from concurrent_download import ConcurrentDownloadRunner
+        
+        end_date = datetime.now()
+        start_date = end_date - timedelta(days=self.days_back)
+        trading_days = self._get_trading_days(
+            start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")
+        )
+        self.stats["total_days"] = len(trading_days) * len(self.tickers)
+        
+        logger.info("=" * 60)
+        logger.info(f"📥 Конкурентная загрузка данных для обучения ML модели")
+        logger.info(f"   Тикеры: {', '.join(self.tickers)}")
+        logger.info(f"   Торговых дней: {len(trading_days)}, задач: {self.stats['total_days']}")
+        logger.info(f"   Rate limit: {self.loader.rate_limit} req/min, воркеров: {workers}")
+        logger.info(f"   Шарды: {SHARDS_DIR}")
+        logger.info("=" * 60)
+        
+        store = SurfaceShardStore(SHARDS_DIR)
+        runner = ConcurrentDownloadRunner(self, store, workers=workers)
+        try:
+            await runner.run(trading_days)
+        finally:
+            store.close()
+        
+        if export:
+            output_path = DATA_DIR / "training_data.npz"
+            count = export_npz(
+                SHARDS_DIR, output_path,
+                self.surface_builder.k_grid, self.surface_builder.t_grid
+            )
+            logger.info(f"\n💾 Экспортировано {count} surfaces в {output_path}")
+        
+        self._print_stats()
+        return self.stats
+    
     def _check_chain_quality(
         self, 
         options_chain: List[Dict], 
@@ -534,6 +584,22 @@ async def main():
         action="store_true",
         help="Продолжить с последней точки"
     )
+    parser.add_argument(
+        "--concurrent",
+        action="store_true",
+        help="Конкурентная загрузка с записью surfaces в шарды (память не растёт)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=8,
+        help="Число параллельных задач в режиме --concurrent (по умолчанию: 8)"
+    )
+    parser.add_argument(
+        "--export-npz",
+        action="store_true",
+        help="После --concurrent собрать шарды в training_data.npz"
+    )
     parser.add_argument(
         "--clear-progress",
         action="store_true",
@@ -546,6 +612,11 @@ async def main():
     if args.clear_progress and PROGRESS_FILE.exists():
         PROGRESS_FILE.unlink()
         logger.info("🗑️ Прогресс очищен")
+    if args.clear_progress and SHARDS_DIR.exists():
+        # Начинаем заново — шарды, индекс и чекпоинты удаляются вместе
+        import shutil
+        shutil.rmtree(SHARDS_DIR)
+        logger.info("🗑️ Шарды конкурентного режима очищены")
     
     # Парсим тикеры
     tickers = [t.strip().upper() for t in args.tickers.split(",")]
@@ -559,11 +630,19 @@ async def main():
     
     # Запускаем загрузку
     try:
-        stats = await downloader.download_all()
+        if args.concurrent:
+            stats = await downloader.download_all_concurrent(
+                workers=args.workers, export=args.export_npz
+            )
+        else:
+            stats = await downloader.download_all()
         
         if stats["successful_surfaces"] > 0:
             logger.info("\n✅ Загрузка завершена успешно!")
-            logger.info(f"   Данные готовы для обучения: {DATA_DIR / 'training_data.npz'}")
+            if args.concurrent and not args.export_npz:
+                logger.info(f"   Данные готовы для обучения: {SHARDS_DIR}")
+            else:
+                logger.info(f"   Данные готовы для обучения: {DATA_DIR / 'training_data.npz'}")
         else:
             logger.warning("\n⚠️ Не удалось загрузить ни одного surface")
             
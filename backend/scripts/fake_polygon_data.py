@@ -0,0 +1,224 @@
+"""
+Данные локальной замены Polygon API (fake_polygon_server.py)
+ЗАЧЕМ: Ответы в формате Polygon с реалистичным объёмом: опционные цепочки из
+mock_chain_generator (десятки экспираций, тысячи контрактов), дневные бары
+(детерминированное случайное блуждание к текущей цене), дивиденды, статус рынка
+Затрагивает: mock_chain_generator, mock_data/stocks (цены базовых активов)
+"""
+
+import json
+import math
+import sys
+import zlib
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services import mock_chain_generator  # noqa: E402
+
+STOCKS_DIR = Path(__file__).parent.parent / "mock_data" / "stocks"
+
+
+def _seed(*parts) -> int:
+    return zlib.crc32("|".join(str(part) for part in parts).encode())
+
+
+def _ms(day: date) -> int:
+    return int(datetime(day.year, day.month, day.day).timestamp() * 1000)
+
+
+@lru_cache(maxsize=256)
+def get_spot(ticker: str) -> float:
+    """Цена из mock_data/stocks/<TICKER>.json, иначе синтетическая"""
+    try:
+        return float(json.loads((STOCKS_DIR / f"{ticker}.json").read_text())["price"])
+    except (OSError, KeyError, ValueError):
+        return mock_chain_generator.synthetic_spot(ticker)
+
+
+@lru_cache(maxsize=64)
+def get_chain(ticker: str, as_of: date) -> Dict[str, tuple]:
+    """Цепочка тикера по экспирациям: {expiration_date: (контракты по страйкам)}"""
+    spot = get_spot(ticker)
+    return {
+        expiration: tuple(sorted(
+            mock_chain_generator.generate_chain(ticker, spot, expiration, as_of),
+            key=lambda contract: (contract["strike"], contract["type"])
+        ))
+        for expiration in mock_chain_generator.generate_expirations(as_of)
+    }
+
+
+def matches(value, params: Dict[str, str], field: str) -> bool:
+    """Фильтры Polygon: field, field.gte/.gt/.lte/.lt (строки дат сравниваются как строки)"""
+    cast = type(value)
+    if field in params and value != cast(params[field]):
+        return False
+    for suffix, check in (
+        (".gte", lambda a, b: a >= b), (".gt", lambda a, b: a > b),
+        (".lte", lambda a, b: a <= b), (".lt", lambda a, b: a < b),
+    ):
+        if field + suffix in params and not check(value, cast(params[field + suffix])):
+            return False
+    return True
+
+
+def select_contracts(ticker: str, params: Dict[str, str], as_of: date) -> List[Dict]:
+    """Контракты тикера с фильтрами expiration_date, strike_price, contract_type"""
+    contracts = []
+    for expiration, chain in get_chain(ticker, as_of).items():
+        if not matches(expiration, params, "expiration_date"):
+            continue
+        for contract in chain:
+            if "contract_type" in params and contract["option_type"] != params["contract_type"]:
+                continue
+            if matches(contract["strike"], params, "strike_price"):
+                contracts.append(contract)
+    return contracts
+
+
+def snapshot_result(contract: Dict, spot: float, now_ns: int) -> Dict:
+    """Контракт в формате /v3/snapshot/options (около 1 КБ JSON, как у Polygon)"""
+    last, mid = contract["last"], (contract["bid"] + contract["ask"]) / 2
+    is_call = contract["option_type"] == "call"
+    break_even = contract["strike"] + last if is_call else contract["strike"] - last
+    return {
+        "break_even_price": round(break_even, 2),
+        "day": {
+            "change": 0.0, "change_percent": 0.0, "close": last, "high": round(last * 1.04, 2),
+            "last_updated": now_ns, "low": round(last * 0.96, 2), "open": last,
+            "previous_close": last, "volume": contract["volume"], "vwap": last
+        },
+        "details": {
+            "contract_type": contract["option_type"], "exercise_style": "american",
+            "expiration_date": contract["expiration_date"], "shares_per_contract": 100,
+            "strike_price": contract["strike"], "ticker": contract["ticker"]
+        },
+        "greeks": {
+            "delta": contract["delta"], "gamma": contract["gamma"],
+            "theta": contract["theta"], "vega": contract["vega"]
+        },
+        "implied_volatility": contract["implied_volatility"],
+        "last_quote": {
+            "ask": contract["ask"], "ask_size": 10, "bid": contract["bid"], "bid_size": 10,
+            "last_updated": now_ns, "midpoint": round(mid, 3), "timeframe": "REAL-TIME"
+        },
+        "last_trade": {
+            "conditions": [209], "exchange": 316, "price": last, "sip_timestamp": now_ns,
+            "size": 1, "timeframe": "REAL-TIME"
+        },
+        "open_interest": contract["open_interest"],
+        "underlying_asset": {
+            "change_to_break_even": round(break_even - spot, 2), "last_updated": now_ns,
+            "price": spot, "ticker": contract["underlying"], "timeframe": "REAL-TIME"
+        }
+    }
+
+
+def reference_result(contract: Dict) -> Dict:
+    """Контракт в формате /v3/reference/options/contracts"""
+    return {
+        "cfi": "OCASPS" if contract["option_type"] == "call" else "OPASPS",
+        "contract_type": contract["option_type"],
+        "exercise_style": "american",
+        "expiration_date": contract["expiration_date"],
+        "primary_exchange": "BATO",
+        "shares_per_contract": 100,
+        "strike_price": contract["strike"],
+        "ticker": contract["ticker"],
+        "underlying_ticker": contract["underlying"]
+    }
+
+
+@lru_cache(maxsize=256)
+def _daily_closes(ticker: str, start: date, end: date) -> tuple:
+    """
+    Закрытия по рабочим дням [start, end], заканчивающиеся на текущей цене в end
+    Доходность дня зависит только от (тикер, дата) — пересекающиеся запросы согласованы
+    """
+    vol = mock_chain_generator.synthetic_base_iv(ticker) / math.sqrt(252)
+    days, day = [], start
+    while day <= end:
+        if day.weekday() < 5:
+            days.append(day)
+        day += timedelta(days=1)
+    returns = [
+        np.random.default_rng(_seed(ticker, day)).normal(0, vol) for day in days
+    ]
+    # Цена дня = текущая цена, «откатанная» на доходности последующих дней
+    closes, price = [], get_spot(ticker)
+    for day, ret in zip(reversed(days), reversed(returns)):
+        closes.append((day, price))
+        price /= math.exp(ret)
+    return tuple(reversed(closes))
+
+
+def aggregate_bars(ticker: str, multiplier: int, timespan: str, start: date, end: date, today: date) -> List[Dict]:
+    """Бары /v2/aggs: day или week (multiplier дней/недель в одном баре)"""
+    if timespan not in ("day", "week"):
+        raise ValueError(f"Unsupported timespan: {timespan}")
+    closes = [item for item in _daily_closes(ticker, min(start, today), today) if start <= item[0] <= end]
+    size = multiplier * (5 if timespan == "week" else 1)
+    bars = []
+    for i in range(0, len(closes), size):
+        group = closes[i:i + size]
+        prices = [price for _, price in group]
+        open_price = prices[0] / math.exp(_seed(ticker, group[0][0], "gap") % 100 / 10000 - 0.005)
+        volume = sum(1000000 + _seed(ticker, day, "v") % 5000000 for day, _ in group)
+        bars.append({
+            "c": round(prices[-1], 2),
+            "h": round(max(prices + [open_price]) * 1.004, 2),
+            "l": round(min(prices + [open_price]) * 0.996, 2),
+            "n": volume // 200,
+            "o": round(open_price, 2),
+            "t": _ms(group[0][0]),
+            "v": volume,
+            "vw": round(sum(prices) / len(prices), 4)
+        })
+    return bars
+
+
+def dividends(ticker: str, today: date) -> List[Dict]:
+    """Квартальные дивиденды за два года (новые первые); у части тикеров их нет"""
+    annual_yield = (_seed(ticker, "div") % 30) / 1000
+    if annual_yield < 0.005:
+        return []
+    cash = round(get_spot(ticker) * annual_yield / 4, 4)
+    results = []
+    for quarter in range(1, 9):
+        day = today - timedelta(days=91 * quarter)
+        day -= timedelta(days=max(day.weekday() - 4, 0))
+        results.append({
+            "cash_amount": cash, "currency": "USD", "declaration_date": (day - timedelta(days=30)).isoformat(),
+            "dividend_type": "CD", "ex_dividend_date": day.isoformat(), "frequency": 4,
+            "pay_date": (day + timedelta(days=14)).isoformat(),
+            "record_date": (day + timedelta(days=1)).isoformat(), "ticker": ticker
+        })
+    return results
+
+
+def market_status(now: datetime, forced: Optional[str] = None) -> Dict:
+    """/v1/marketstatus/now по часам сервера (время Нью-Йорка) или принудительно"""
+    minutes = now.hour * 60 + now.minute
+    if forced:
+        market = forced
+    elif now.weekday() >= 5:
+        market = "closed"
+    elif 570 <= minutes < 960:
+        market = "open"
+    else:
+        market = "extended-hours" if 240 <= minutes < 1200 else "closed"
+    exchange = "open" if market == "open" else market
+    return {
+        "afterHours": market == "extended-hours" and minutes >= 960,
+        "currencies": {"crypto": "open", "fx": "open"},
+        "earlyHours": market == "extended-hours" and minutes < 570,
+        "exchanges": {"nasdaq": exchange, "nyse": exchange, "otc": exchange},
+        "market": market,
+        "serverTime": now.isoformat()
+    }
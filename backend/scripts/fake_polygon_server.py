@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Локальная замена Polygon API для нагрузочного тестирования
+ЗАЧЕМ: Замерять пропускную способность, хвостовые задержки и поведение при 429
+у PolygonClient, OptionsService, HybridClient и IVRankCalculator без расхода
+квоты реального API — офлайн и в CI
+Затрагивает: POLYGON_BASE_URL (клиенты Polygon), fake_polygon_data.py
+
+Эндпоинты: /v3/snapshot/options/{underlying}[/{option}], /v3/reference/options/contracts,
+/v2/aggs/ticker/{ticker}/range/..., /v2/aggs/ticker/{ticker}/prev, /v3/reference/dividends,
+/v1/marketstatus/now (+ /v3/reference/tickers/{ticker}, /v2/last/trade/{ticker}).
+Списки листаются через next_url с cursor, как у Polygon.
+
+Использование:
+    python scripts/fake_polygon_server.py --port 8765 --latency-ms 80 --jitter-ms 40
+    python scripts/fake_polygon_server.py --rate-limit 300 --tail-ratio 0.01 --tail-ms 2000
+    POLYGON_BASE_URL=http://localhost:8765 uvicorn app.main:app
+
+    GET /_fake/stats — счётчики запросов по эндпоинтам, 429 и ошибок
+"""
+
+import argparse
+import asyncio
+import base64
+import random
+import time
+import uuid
+from collections import Counter, deque
+from datetime import date, datetime, timedelta
+from typing import Deque, Dict, Optional
+from urllib.parse import urlencode
+from zoneinfo import ZoneInfo
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+import fake_polygon_data as data
+
+NEW_YORK = ZoneInfo("America/New_York")
+
+
+class FakePolygonConfig:
+    """Поведение сервера: задержки, лимит запросов, доля ошибок"""
+
+    def __init__(
+        self,
+        latency_ms: float = 0,
+        jitter_ms: float = 0,
+        tail_ratio: float = 0,
+        tail_ms: float = 0,
+        rate_limit: int = 0,
+        error_rate: float = 0,
+        market: Optional[str] = None,
+        seed: Optional[int] = None
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.tail_ratio = tail_ratio
+        self.tail_ms = tail_ms
+        # Запросов в минуту на один apiKey (0 — без лимита)
+        self.rate_limit = rate_limit
+        self.error_rate = error_rate
+        self.market = market
+        self.random = random.Random(seed)
+
+    def delay_seconds(self) -> float:
+        delay = self.latency_ms + self.random.uniform(0, self.jitter_ms)
+        if self.tail_ratio and self.random.random() < self.tail_ratio:
+            delay += self.tail_ms
+        return delay / 1000
+
+
+def _error(status_code: int, message: str) -> JSONResponse:
+    return JSONResponse(
+        {"status": "ERROR", "request_id": uuid.uuid4().hex, "error": message},
+        status_code=status_code
+    )
+
+
+def _page(request: Request, items: list, default_limit: int, max_limit: int, formatter) -> Dict:
+    """Страница списка с next_url (cursor = смещение); apiKey в next_url не попадает"""
+    params = request.query_params
+    limit = max(1, min(int(params.get("limit", default_limit)), max_limit))
+    offset = int(base64.urlsafe_b64decode(params["cursor"]).decode()) if "cursor" in params else 0
+    body = {
+        "status": "OK",
+        "request_id": uuid.uuid4().hex,
+        "results": [formatter(item) for item in items[offset:offset + limit]]
+    }
+    if offset + limit < len(items):
+        query = {k: v for k, v in params.items() if k not in ("apiKey", "cursor")}
+        query["cursor"] = base64.urlsafe_b64encode(str(offset + limit).encode()).decode()
+        body["next_url"] = f"{str(request.base_url).rstrip('/')}{request.url.path}?{urlencode(query)}"
+    return body
+
+
+def create_app(config: Optional[FakePolygonConfig] = None) -> FastAPI:
+    """Приложение фейкового Polygon (можно поднять в тесте через uvicorn в потоке)"""
+    config = config or FakePolygonConfig()
+    app = FastAPI(title="Fake Polygon API")
+    stats: Counter = Counter()
+    windows: Dict[str, Deque[float]] = {}
+
+    @app.middleware("http")
+    async def upstream_behaviour(request: Request, call_next):
+        if request.url.path.startswith("/_fake"):
+            return await call_next(request)
+        stats["requests"] += 1
+
+        if config.rate_limit:
+            now = time.monotonic()
+            window = windows.setdefault(request.query_params.get("apiKey", ""), deque())
+            while window and window[0] <= now - 60:
+                window.popleft()
+            if len(window) >= config.rate_limit:
+                stats["rate_limited"] += 1
+                return _error(429, "You've exceeded the maximum requests per minute, please wait or upgrade your subscription to continue. https://polygon.io/pricing")
+            window.append(now)
+
+        delay = config.delay_seconds()
+        if delay:
+            await asyncio.sleep(delay)
+        if config.error_rate and config.random.random() < config.error_rate:
+            stats["errors"] += 1
+            return _error(502, "Upstream error (injected)")
+
+        started = time.perf_counter()
+        response = await call_next(request)
+        stats["handler_ms"] += int((time.perf_counter() - started) * 1000)
+        return response
+
+    @app.get("/_fake/stats")
+    async def fake_stats():
+        return dict(stats)
+
+    @app.get("/v3/snapshot/options/{underlying}")
+    def options_chain_snapshot(underlying: str, request: Request):
+        stats["snapshot_chain"] += 1
+        today = date.today()
+        spot, now_ns = data.get_spot(underlying), time.time_ns()
+        contracts = data.select_contracts(underlying, dict(request.query_params), today)
+        return _page(request, contracts, 10, 250, lambda c: data.snapshot_result(c, spot, now_ns))
+
+    @app.get("/v3/snapshot/options/{underlying}/{option_ticker}")
+    def option_contract_snapshot(underlying: str, option_ticker: str):
+        stats["snapshot_contract"] += 1
+        for chain in data.get_chain(underlying, date.today()).values():
+            for contract in chain:
+                if contract["ticker"] == option_ticker:
+                    result = data.snapshot_result(contract, data.get_spot(underlying), time.time_ns())
+                    return {"status": "OK", "request_id": uuid.uuid4().hex, "results": result}
+        return _error(404, "Contract not found")
+
+    @app.get("/v3/reference/options/contracts")
+    def options_contracts(request: Request):
+        stats["reference_contracts"] += 1
+        params = dict(request.query_params)
+        underlying = params.get("underlying_ticker")
+        if not underlying:
+            return _error(400, "underlying_ticker is required by the fake server")
+        contracts = data.select_contracts(underlying, params, date.today())
+        return _page(request, contracts, 10, 1000, data.reference_result)
+
+    @app.get("/v2/aggs/ticker/{ticker}/range/{multiplier}/{timespan}/{start}/{end}")
+    def aggregates(ticker: str, multiplier: int, timespan: str, start: str, end: str, limit: int = 5000):
+        stats["aggs"] += 1
+        try:
+            bars = data.aggregate_bars(
+                ticker, multiplier, timespan,
+                date.fromisoformat(start), date.fromisoformat(end), date.today()
+            )[:limit]
+        except ValueError as e:
+            return _error(400, str(e))
+        return {
+            "adjusted": True, "queryCount": len(bars), "request_id": uuid.uuid4().hex,
+            "results": bars, "resultsCount": len(bars), "status": "OK", "ticker": ticker
+        }
+
+    @app.get("/v2/aggs/ticker/{ticker}/prev")
+    def previous_close(ticker: str):
+        stats["prev"] += 1
+        today = date.today()
+        bars = data.aggregate_bars(ticker, 1, "day", today - timedelta(days=7), today - timedelta(days=1), today)
+        results = [{"T": ticker, **bars[-1]}] if bars else []
+        return {
+            "adjusted": True, "queryCount": len(results), "request_id": uuid.uuid4().hex,
+            "results": results, "resultsCount": len(results), "status": "OK", "ticker": ticker
+        }
+
+    @app.get("/v3/reference/dividends")
+    def reference_dividends(request: Request):
+        stats["dividends"] += 1
+        params = dict(request.query_params)
+        items = [
+            item for item in data.dividends(params.get("ticker", ""), date.today())
+            if data.matches(item["ex_dividend_date"], params, "ex_dividend_date")
+        ]
+        if params.get("order") == "asc":
+            items.reverse()
+        return _page(request, items, 10, 1000, lambda item: item)
+
+    @app.get("/v1/marketstatus/now")
+    def market_status_now():
+        stats["market_status"] += 1
+        return data.market_status(datetime.now(NEW_YORK), config.market)
+
+    @app.get("/v3/reference/tickers/{ticker}")
+    def ticker_details(ticker: str):
+        stats["ticker_details"] += 1
+        spot = data.get_spot(ticker)
+        return {"status": "OK", "request_id": uuid.uuid4().hex, "results": {
+            "ticker": ticker, "name": f"{ticker} (fake)", "market": "stocks", "active": True,
+            "primary_exchange": "XNAS", "currency_name": "usd", "description": "",
+            "market_cap": round(spot * 1_000_000_000, 2),
+            "share_class_shares_outstanding": 1_000_000_000
+        }}
+
+    @app.get("/v2/last/trade/{ticker}")
+    def last_trade(ticker: str):
+        stats["last_trade"] += 1
+        return {"status": "OK", "request_id": uuid.uuid4().hex, "results": {
+            "T": ticker, "p": data.get_spot(ticker), "s": 100, "t": time.time_ns(), "x": 4
+        }}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальная замена Polygon API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0, help="Базовая задержка ответа")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Случайная добавка 0..N мс")
+    parser.add_argument("--tail-ratio", type=float, default=0, help="Доля медленных ответов (0..1)")
+    parser.add_argument("--tail-ms", type=float, default=0, help="Добавка к медленным ответам")
+    parser.add_argument("--rate-limit", type=int, default=0, help="Запросов в минуту на apiKey (0 — без лимита)")
+    parser.add_argument("--error-rate", type=float, default=0, help="Доля ответов 502 (0..1)")
+    parser.add_argument("--market", choices=["open", "closed", "extended-hours"], help="Статус рынка вместо часов")
+    parser.add_argument("--seed", type=int, help="Seed задержек и ошибок")
+    args = parser.parse_args()
+
+    config = FakePolygonConfig(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, tail_ratio=args.tail_ratio,
+        tail_ms=args.tail_ms, rate_limit=args.rate_limit, error_rate=args.error_rate,
+        market=args.market, seed=args.seed
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Шардированное хранилище Volatility Surface для обучающих данных
+ЗАЧЕМ: Surfaces пишутся на диск сразу по мере загрузки (memory-mappable .npy шарды
+по тикерам + индекс), а не копятся в памяти до одного монолитного .npz в конце
+Затрагивает: download_training_data.py (режим --concurrent), обучение ML модели
+
+Структура директории:
+    shards/
+        index.jsonl             — по строке на сохранённую surface (ticker, date, price, shard, row)
+        progress.jsonl          — чекпоинт по каждой задаче (ticker_date -> статус)
+        SPY/shard_00000.npy     — float32 массив (SHARD_CAPACITY, K, T), строки заполняются по порядку
+"""
+
+import os
+import json
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Surfaces на один шард (41×20×4 байт × 256 ≈ 0.8 MB)
+SHARD_CAPACITY = 256
+
+
+def _append_line(path: Path, record: Dict) -> None:
+    """Дописать JSON строку и сбросить её на диск (чекпоинт переживает обрыв)"""
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _read_lines(path: Path) -> List[Dict]:
+    """Прочитать JSON строки, пропуская недописанную последнюю строку после обрыва"""
+    if not path.exists():
+        return []
+    records = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
+
+
+class SurfaceShardStore:
+    """
+    Append-only хранилище surfaces
+    ЗАЧЕМ: Постоянная память при многомесячной загрузке и resume без повторной работы
+    """
+
+    def __init__(self, root: Path, shard_capacity: int = SHARD_CAPACITY):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.shard_capacity = shard_capacity
+        self.index_path = self.root / "index.jsonl"
+        self.progress_path = self.root / "progress.jsonl"
+
+        # Следующая свободная позиция по тикеру: ticker -> (shard, row)
+        self._positions: Dict[str, Tuple[int, int]] = {}
+        for record in _read_lines(self.index_path):
+            pos = (record["shard"], record["row"] + 1)
+            if pos > self._positions.get(record["ticker"], (0, 0)):
+                self._positions[record["ticker"]] = pos
+
+        # Открытые memmap текущих шардов: ticker -> (shard, array)
+        self._open_shards: Dict[str, Tuple[int, np.memmap]] = {}
+
+    def completed_tasks(self) -> Dict[str, object]:
+        """Чекпоинты задач: ticker_date -> статус (True / "skipped" / "failed")"""
+        return {r["key"]: r["status"] for r in _read_lines(self.progress_path)}
+
+    def mark_task(self, key: str, status: object) -> None:
+        """Записать чекпоинт задачи"""
+        _append_line(self.progress_path, {"key": key, "status": status})
+
+    def _shard_path(self, ticker: str, shard: int) -> Path:
+        return self.root / ticker / f"shard_{shard:05d}.npy"
+
+    def _get_shard(self, ticker: str, shard: int, surface_shape: Tuple[int, ...]) -> np.memmap:
+        """Открыть (или создать) memmap шарда"""
+        opened = self._open_shards.get(ticker)
+        if opened and opened[0] == shard:
+            return opened[1]
+        if opened:
+            opened[1].flush()
+
+        path = self._shard_path(ticker, shard)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.exists():
+            array = np.lib.format.open_memmap(path, mode='r+')
+        else:
+            array = np.lib.format.open_memmap(
+                path, mode='w+', dtype=np.float32,
+                shape=(self.shard_capacity, *surface_shape)
+            )
+            # Незаполненные строки — NaN, чтобы их нельзя было спутать с данными
+            array[:] = np.nan
+
+        self._open_shards[ticker] = (shard, array)
+        return array
+
+    def append(self, ticker: str, date: str, price: float, surface: np.ndarray) -> None:
+        """
+        Сохранить surface: строка шарда -> flush -> запись в индекс
+        ЗАЧЕМ: Запись в индексе появляется только после того, как данные на диске
+        """
+        shard, row = self._positions.get(ticker, (0, 0))
+        if row >= self.shard_capacity:
+            shard, row = shard + 1, 0
+
+        array = self._get_shard(ticker, shard, surface.shape)
+        array[row] = surface.astype(np.float32)
+        array.flush()
+
+        _append_line(self.index_path, {
+            "ticker": ticker, "date": date, "price": float(price),
+            "shard": shard, "row": row
+        })
+        self._positions[ticker] = (shard, row + 1)
+
+    def close(self) -> None:
+        """Сбросить открытые шарды на диск"""
+        for _, array in self._open_shards.values():
+            array.flush()
+        self._open_shards.clear()
+
+
+def load_training_shards(root: Path, tickers: Optional[List[str]] = None) -> Dict:
+    """
+    Загрузить датасет из шардов без чтения всего в память
+    ЗАЧЕМ: Обучение читает surfaces через memmap по индексу
+
+    Returns:
+        {"index": [...], "shards": {(ticker, shard): memmap}}
+    """
+    root = Path(root)
+    index = [
+        r for r in _read_lines(root / "index.jsonl")
+        if tickers is None or r["ticker"] in tickers
+    ]
+    shards = {}
+    for record in index:
+        key = (record["ticker"], record["shard"])
+        if key not in shards:
+            path = root / record["ticker"] / f"shard_{record['shard']:05d}.npy"
+            shards[key] = np.load(path, mmap_mode='r')
+    return {"index": index, "shards": shards}
+
+
+def export_npz(root: Path, output_path: Path, k_grid: np.ndarray, t_grid: np.ndarray) -> int:
+    """
+    Собрать шарды в один .npz в прежнем формате (surfaces_grid, quote_dates, ...)
+    ЗАЧЕМ: Совместимость с существующим пайплайном обучения
+
+    Returns:
+        Количество surfaces в файле
+    """
+    dataset = load_training_shards(root)
+    index = dataset["index"]
+    if not index:
+        return 0
+
+    surfaces = np.stack([
+        dataset["shards"][(r["ticker"], r["shard"])][r["row"]] for r in index
+    ])
+    np.savez_compressed(
+        output_path,
+        surfaces_grid=surfaces,
+        quote_dates=np.array([r["date"] for r in index]),
+        underlying_prices=np.array([r["price"] for r in index]),
+        tickers=np.array([r["ticker"] for r in index]),
+        k_grid=k_grid,
+        T_grid=t_grid
+    )
+    return len(index)
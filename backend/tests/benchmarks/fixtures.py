@@ -0,0 +1,125 @@
+"""
+Фиксированные синтетические данные для бенчмарков
+ЗАЧЕМ: Замеры на одинаковых входах при каждом запуске — без сети и без
+зависимости от текущей даты (цепочки строятся на фиксированную дату)
+Затрагивает: mock_chain_generator, scripts/fake_polygon_data (формат snapshot Polygon)
+"""
+
+import sys
+from datetime import date
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+sys.path.insert(0, str(BACKEND_DIR / "scripts"))
+
+from app.services import mock_chain_generator  # noqa: E402
+
+AS_OF = date(2025, 1, 2)
+SPOT = 590.0
+TICKERS = ("SPY", "QQQ", "IWM", "AAPL")
+
+
+def options_chain(size: int) -> List[Dict]:
+    """Цепочка ровно из size контрактов (SPY, затем другие тикеры по кругу)"""
+    contracts: List[Dict] = []
+    for ticker in TICKERS:
+        for expiration in mock_chain_generator.generate_expirations(AS_OF):
+            contracts.extend(mock_chain_generator.generate_chain(ticker, SPOT, expiration, AS_OF))
+            if len(contracts) >= size:
+                return contracts[:size]
+    raise ValueError(f"Generator cannot produce {size} contracts")
+
+
+def positions(legs: int) -> List[Dict]:
+    """Стратегия из legs ног: чередование long/short коллов и путов вокруг цены"""
+    result = []
+    for i in range(legs):
+        offset = (i // 2 + 1) * 5 * (1 if i % 2 == 0 else -1)
+        result.append({
+            "option_type": "call" if i % 2 == 0 else "put",
+            "position_type": "long" if i % 4 < 2 else "short",
+            "strike": SPOT + offset,
+            "premium": 4.0 + i * 0.25,
+            "quantity": 1 + i % 3,
+            "days_to_expiry": 30 + 7 * (i % 4),
+            "iv": 0.18 + 0.01 * (i % 5)
+        })
+    return result
+
+
+def polygon_snapshot_pages(size: int, page_size: int = 250) -> List[Dict]:
+    """Ответы /v3/snapshot/options страницами, связанными через next_url"""
+    import fake_polygon_data
+
+    results = [
+        fake_polygon_data.snapshot_result(contract, SPOT, 1735830000000000000)
+        for contract in options_chain(size)
+    ]
+    pages = []
+    for offset in range(0, len(results), page_size):
+        page = {"status": "OK", "results": results[offset:offset + page_size]}
+        if offset + page_size < len(results):
+            page["next_url"] = f"https://api.polygon.io/v3/snapshot/options/SPY?cursor={offset + page_size}"
+        pages.append(page)
+    return pages
+
+
+class FakeHttpResponse:
+    """Минимальный ответ requests для подмены requests.get"""
+
+    def __init__(self, payload: Dict):
+        self._payload = payload
+        self.status_code = 200
+
+    def raise_for_status(self) -> None:
+        pass
+
+    def json(self) -> Dict:
+        return self._payload
+
+
+def yahoo_option_chain(strikes: int) -> SimpleNamespace:
+    """Ответ yfinance Ticker.option_chain: DataFrame коллов и путов (с NaN, как у Yahoo)"""
+    rng = np.random.default_rng(42)
+    strike_values = SPOT - strikes / 2 + np.arange(strikes, dtype=float)
+
+    def frame() -> pd.DataFrame:
+        df = pd.DataFrame({
+            "contractSymbol": [f"SPY250117C{int(k * 1000):08d}" for k in strike_values],
+            "strike": strike_values,
+            "lastPrice": rng.uniform(0.05, 50, strikes),
+            "bid": rng.uniform(0.05, 50, strikes),
+            "ask": rng.uniform(0.05, 50, strikes),
+            "volume": rng.integers(0, 5000, strikes).astype(float),
+            "openInterest": rng.integers(0, 50000, strikes).astype(float),
+            "impliedVolatility": rng.uniform(0.1, 0.6, strikes)
+        })
+        df.loc[df.index % 7 == 0, "volume"] = np.nan
+        return df
+
+    return SimpleNamespace(calls=frame(), puts=frame())
+
+
+class FakeYfTicker:
+    """Подмена yfinance.Ticker с фиксированной цепочкой"""
+
+    def __init__(self, chain: SimpleNamespace):
+        self.options = ("2025-01-17",)
+        self._chain = chain
+
+    def option_chain(self, expiration: str) -> SimpleNamespace:
+        return self._chain
+
+
+def hybrid_inputs(size: int):
+    """Данные Yahoo и Polygon одной цепочки для HybridClient._merge_options_data"""
+    chain = options_chain(size)
+    yahoo = [{k: v for k, v in c.items() if k not in ("delta", "gamma", "theta", "vega")} for c in chain]
+    polygon = [dict(c, implied_volatility=c["implied_volatility"] * 1.01) for c in chain]
+    return yahoo, polygon
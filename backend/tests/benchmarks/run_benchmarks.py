@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Бенчмарки горячих путей: калькуляторы P&L, метрики, разбор данных провайдеров, ONNX
+ЗАЧЕМ: Оптимизации подтверждаются цифрами, а регрессии ловятся сравнением
+с сохранённым baseline (код выхода 1, если замедление больше порога)
+Затрагивает: StocksPLCalculator, FuturesPLCalculator, calculate_all_metrics,
+OptionsService.get_options_chain, YahooClient.get_options_chain,
+HybridClient._merge_options_data, AIPredictionService.predict_iv
+
+Использование:
+    python tests/benchmarks/run_benchmarks.py                    # замер + сравнение с baseline
+    python tests/benchmarks/run_benchmarks.py --save-baseline    # записать baseline
+    python tests/benchmarks/run_benchmarks.py -k metrics --threshold 0.15
+
+Baseline зависит от машины — сохраняйте его на той же машине (или CI-раннере),
+где запускается сравнение.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import fixtures
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+
+# Кейс: имя -> фабрика, возвращающая замеряемую функцию (или None — пропустить)
+Case = Tuple[str, Callable[[], Optional[Callable[[], object]]]]
+
+
+def _pl_curve_case(calculator_cls, legs: int, points: int):
+    def factory():
+        calculator = calculator_cls()
+        strategy = fixtures.positions(legs)
+        return lambda: calculator.generate_pl_curve(
+            strategy, fixtures.SPOT, price_range_percent=0.2, num_points=points, target_days=10
+        )
+    return factory
+
+
+def _metrics_case(size: int):
+    def factory():
+        from app.services.calculations import calculate_all_metrics
+        chain = fixtures.options_chain(size)
+        # Без тикера — IV Rank (сетевой запрос) не считается
+        return lambda: calculate_all_metrics(chain, fixtures.SPOT)
+    return factory
+
+
+def _polygon_parse_case(size: int):
+    def factory():
+        from app.services import options_service
+        pages = fixtures.polygon_snapshot_pages(size)
+        service = options_service.OptionsService.__new__(options_service.OptionsService)
+        service.api_key, service.base_url = "bench", "https://api.polygon.io"
+
+        def run():
+            responses = iter(pages)
+            original_get = options_service.requests.get
+            options_service.requests.get = lambda *a, **kw: fixtures.FakeHttpResponse(next(responses))
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    return service.get_options_chain("SPY", "2025-01-17")
+            finally:
+                options_service.requests.get = original_get
+        return run
+    return factory
+
+
+def _yahoo_case(strikes: int):
+    def factory():
+        from app.services import yahoo_client
+        ticker = fixtures.FakeYfTicker(fixtures.yahoo_option_chain(strikes))
+        yahoo_client.yf = type("yf", (), {"Ticker": staticmethod(lambda symbol: ticker)})
+        client = yahoo_client.YahooClient()
+        return lambda: client.get_options_chain("SPY", "2025-01-17")
+    return factory
+
+
+def _hybrid_merge_case(size: int):
+    def factory():
+        from app.services.hybrid_client import HybridClient
+        yahoo, polygon = fixtures.hybrid_inputs(size)
+        client = HybridClient.__new__(HybridClient)
+        return lambda: client._merge_options_data(yahoo, polygon)
+    return factory
+
+
+def _predict_iv_case(batch: int):
+    def factory():
+        from app.services.ai_prediction_service import AIPredictionService
+        service = AIPredictionService()
+        loop = asyncio.new_event_loop()
+        loop.run_until_complete(service.init_model())
+        if service._session is None:
+            return None
+        if batch == 1:
+            return lambda: loop.run_until_complete(
+                service.predict_iv("SPY", "CALL", fixtures.SPOT * 1.02, fixtures.SPOT, 0.1, 0.2)
+            )
+        scenarios = [
+            {"ticker": "SPY", "type": "CALL" if i % 2 else "PUT", "stock_price": fixtures.SPOT,
+             "strike": fixtures.SPOT * (0.8 + 0.4 * i / batch), "ttm": 0.25, "current_iv": 0.2}
+            for i in range(batch)
+        ]
+        return lambda: loop.run_until_complete(service.predict_iv_batch(scenarios))
+    return factory
+
+
+def build_cases() -> List[Case]:
+    from app.calculators.futures_pl_calculator import FuturesPLCalculator
+    from app.calculators.stocks_pl_calculator import StocksPLCalculator
+
+    cases: List[Case] = []
+    for name, calculator_cls in (("stocks", StocksPLCalculator), ("futures", FuturesPLCalculator)):
+        for legs in (1, 4, 8):
+            for points in (100, 500):
+                cases.append((f"{name}_pl_curve[legs={legs},points={points}]",
+                              _pl_curve_case(calculator_cls, legs, points)))
+    for size in (1_000, 10_000, 50_000):
+        cases.append((f"calculate_all_metrics[{size}]", _metrics_case(size)))
+    for size in (1_000, 5_000):
+        cases.append((f"polygon_snapshot_parse[{size}]", _polygon_parse_case(size)))
+    for strikes in (100, 500):
+        cases.append((f"yahoo_dataframe_convert[strikes={strikes}]", _yahoo_case(strikes)))
+    for size in (1_000, 10_000):
+        cases.append((f"hybrid_merge[{size}]", _hybrid_merge_case(size)))
+    for batch in (1, 256):
+        cases.append((f"onnx_predict_iv[batch={batch}]", _predict_iv_case(batch)))
+    return cases
+
+
+def measure(func: Callable[[], object], repeat: int, min_time: float) -> float:
+    """
+    Секунд на вызов: число вызовов подбирается так, чтобы серия длилась
+    не меньше min_time; из repeat серий берётся лучшая (меньше всего шума)
+    """
+    func()  # прогрев: кэши, ленивые импорты
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1_000_000:
+            break
+        number *= 2 if elapsed == 0 else max(2, min(10, int(min_time / elapsed) + 1))
+    best = elapsed / number
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def _format(seconds: float) -> str:
+    if seconds >= 1:
+        return f"{seconds:.2f} s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f} ms"
+    return f"{seconds * 1e6:.1f} µs"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Бенчмарки горячих путей backend")
+    parser.add_argument("-k", "--filter", default="", help="Запускать только кейсы, содержащие подстроку")
+    parser.add_argument("--repeat", type=int, default=5, help="Серий замера на кейс")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Минимальная длительность серии, с")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Допустимое замедление (0.25 = 25%%)")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Записать результаты в baseline")
+    args = parser.parse_args()
+
+    baseline: Dict[str, float] = {}
+    if args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text()).get("results", {})
+
+    results: Dict[str, float] = {}
+    regressions = []
+    print(f"{'case':<48} {'time':>12} {'baseline':>12} {'change':>9}")
+    for name, factory in build_cases():
+        if args.filter not in name:
+            continue
+        func = factory()
+        if func is None:
+            print(f"{name:<48} {'skipped':>12}")
+            continue
+        seconds = measure(func, args.repeat, args.min_time)
+        results[name] = seconds
+        line = f"{name:<48} {_format(seconds):>12}"
+        if name in baseline:
+            change = seconds / baseline[name] - 1
+            flag = "  REGRESSION" if change > args.threshold else ""
+            line += f" {_format(baseline[name]):>12} {change:>+8.1%}{flag}"
+            if flag:
+                regressions.append(name)
+        print(line)
+
+    if args.save_baseline:
+        # Кейсы вне фильтра сохраняют прежние значения
+        merged = {**baseline, **results}
+        args.baseline.write_text(json.dumps({
+            "machine": f"{platform.node()} {platform.machine()} {platform.processor()}".strip(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "saved_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "results": merged
+        }, indent=2, sort_keys=True) + "\n")
+        print(f"\nBaseline saved: {args.baseline}")
+
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s) over {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
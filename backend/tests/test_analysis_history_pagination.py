@@ -0,0 +1,125 @@
+"""
+Тест keyset пагинации истории анализов на SQLite
+ЗАЧЕМ: server_default пишет created_at как 'YYYY-MM-DD HH:MM:SS', а курсор
+биндился с микросекундами — страницы повторяли записи одной секунды
+Запуск: python -m pytest tests/test_analysis_history_pagination.py
+        или python tests/test_analysis_history_pagination.py
+"""
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+
+from app.models.analysis_history import AnalysisHistory
+from app.services.analysis_history_service import get_history_page
+
+
+def _session():
+    engine = create_engine("sqlite://")
+    AnalysisHistory.__table__.create(engine)
+    return sessionmaker(bind=engine)()
+
+
+def _record(analysis_id, ticker, **fields):
+    return AnalysisHistory(
+        id=analysis_id, ticker=ticker, stock_data={}, metrics={},
+        ai_model="test", ai_analysis="x", **fields
+    )
+
+
+def _collect(db, limit, ticker=None):
+    """Пройти все страницы; ids в порядке выдачи"""
+    ids, cursor = [], None
+    for _ in range(100):
+        page = get_history_page(db, limit=limit, cursor=cursor, ticker=ticker)
+        ids.extend(item["id"] for item in page["data"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return ids
+    raise AssertionError("Пагинация не завершилась — курсор зациклился")
+
+
+def test_rows_sharing_server_default_timestamp():
+    """Больше limit записей в одну секунду (server_default) — каждая ровно один раз"""
+    db = _session()
+    for i in range(7):
+        db.add(_record(f"00000000-0000-0000-0000-{i:012d}", "AAPL"))
+    db.commit()
+    # CURRENT_TIMESTAMP мог попасть на границу секунды — выравниваем явно в том же формате
+    db.execute(text("UPDATE analysis_history SET created_at = '2026-01-01 10:00:00'"))
+    db.commit()
+
+    ids = _collect(db, limit=3)
+    assert len(ids) == 7
+    assert len(set(ids)) == 7
+    assert ids == sorted(ids, reverse=True)
+
+
+def test_mixed_timestamp_formats_in_order():
+    """Записи со значением из Python (микросекунды) и из server_default листаются по дате"""
+    db = _session()
+    db.add_all([
+        _record("a", "MSFT", created_at=datetime(2026, 1, 1, 10, 0, 0, 500000)),
+        _record("b", "MSFT", created_at=datetime(2026, 1, 1, 10, 0, 1)),
+        _record("c", "MSFT"),
+        _record("d", "MSFT"),
+    ])
+    db.commit()
+    db.execute(text("UPDATE analysis_history SET created_at = '2026-01-01 10:00:00' WHERE id IN ('c', 'd')"))
+    db.commit()
+
+    assert _collect(db, limit=1, ticker="msft") == ["b", "a", "d", "c"]
+
+
+def _page_plans(db, ticker=None):
+    """EXPLAIN QUERY PLAN запросов первой и следующей страницы"""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        page = get_history_page(db, limit=2, ticker=ticker)
+        get_history_page(db, limit=2, cursor=page["next_cursor"], ticker=ticker)
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    raw = db.connection().connection.driver_connection
+    return [
+        " / ".join(row[-1] for row in raw.execute(f"EXPLAIN QUERY PLAN {statement}", parameters))
+        for statement, parameters in statements
+    ]
+
+
+def test_sqlite_page_uses_sort_key_index():
+    """Страница ищется по индексу выражения сортировки, без сортировки во временном B-дереве"""
+    db = _session()
+    db.add_all(_record(f"id-{i}", "AAPL" if i % 2 else "MSFT") for i in range(6))
+    db.commit()
+
+    plans = _page_plans(db)
+    assert len(plans) == 2
+    for plan in plans:
+        assert "idx_sqlite_sort_key_id" in plan, plan
+        assert "TEMP B-TREE" not in plan, plan
+    assert "SEARCH" in plans[1], plans[1]
+
+    ticker_plans = _page_plans(db, ticker="aapl")
+    for plan in ticker_plans:
+        assert "idx_sqlite_ticker_sort_key_id" in plan, plan
+        assert "TEMP B-TREE" not in plan, plan
+    assert "<expr><?" in ticker_plans[1], ticker_plans[1]
+
+
+if __name__ == "__main__":
+    test_rows_sharing_server_default_timestamp()
+    test_mixed_timestamp_formats_in_order()
+    test_sqlite_page_uses_sort_key_index()
+    print("✅ Пагинация истории: OK")
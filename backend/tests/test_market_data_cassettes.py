@@ -0,0 +1,54 @@
+"""
+Тест запасного ключа кассет рыночных данных
+ЗАЧЕМ: запасной ключ отбрасывал все параметры-даты, и replay цепочки с
+expiration_date=2025-12-19 отдавал записанную цепочку другой экспирации
+Запуск: python -m pytest tests/test_market_data_cassettes.py
+        или python tests/test_market_data_cassettes.py
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.services.market_data_cassettes import CassetteStore, request_key
+
+CHAIN_URL = "https://api.polygon.io/v3/snapshot/options/SPY?expiration_date={}&apiKey=secret"
+
+
+def _store_with(*urls):
+    store = CassetteStore(tempfile.mkdtemp(), "2025-11-20")
+    for url in urls:
+        store.record("GET", url, None, 200, {"content-type": "application/json"}, url.encode(), 1.0)
+    return store
+
+
+def test_other_expiration_is_a_miss():
+    """Цепочка другой экспирации не подменяется записанной"""
+    store = _store_with(CHAIN_URL.format("2025-11-21"))
+    assert store.replay("GET", CHAIN_URL.format("2025-12-19"), None) is None
+    assert store.replay("GET", CHAIN_URL.format("2025-11-21"), None) is not None
+
+
+def test_current_date_window_falls_back():
+    """Окно from/to от текущей даты не мешает replay на другой день"""
+    recorded = "https://finnhub.io/api/v1/stock/candle?symbol=AAPL&from=1763596800&to=1763683200&token=t"
+    store = _store_with(recorded)
+    entry = store.replay("GET", "https://finnhub.io/api/v1/stock/candle?symbol=AAPL&from=1&to=2", None)
+    assert entry is not None
+    assert store.replay("GET", "https://finnhub.io/api/v1/stock/candle?symbol=MSFT&from=1&to=2", None) is None
+
+
+def test_fallback_keeps_expiration_range():
+    """expiration_date.gte/.lte остаются в запасном ключе"""
+    _, fallback = request_key("GET", "https://api.polygon.io/v3/reference/options/contracts"
+                                     "?underlying_ticker=SPY&expiration_date.gte=2025-11-20&period1=1")
+    assert "expiration_date.gte=2025-11-20" in fallback
+    assert "period1" not in fallback
+
+
+if __name__ == "__main__":
+    test_other_expiration_is_a_miss()
+    test_current_date_window_falls_back()
+    test_fallback_keeps_expiration_range()
+    print("✅ Кассеты рыночных данных: OK")
@@ -19,6 +19,7 @@ module.exports = {
       autorestart: true,
       watch: false,
       max_memory_restart: '1G',
+      // Несколько воркеров: --workers N в args и SHARED_STATE_BACKEND=redis (см. DEPLOYMENT.md)
       instances: 1,
       exec_mode: 'fork'
     }
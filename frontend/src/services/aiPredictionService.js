@@ -48,6 +48,115 @@ const aiPredictionService = {
       console.error('Error fetching AI prediction:', error);
       return currentIv; // Fallback на текущую IV
     }
+  },
+
+  /**
+   * Пакетный прогноз IV: все сценарии одним запросом и одним инференсом модели
+   * ЗАЧЕМ: Калькулятор запрашивает IV для каждой ноги × цены × дня
+   * @param {Array<Object>} scenarios - Массив параметров в формате predictIV
+   * @returns {Promise<number[]>} - Прогнозы IV в том же порядке (или текущие IV в случае ошибки)
+   */
+  predictIVBatch: async (scenarios) => {
+    const fallback = scenarios.map((s) => s.currentIv);
+    if (scenarios.length === 0) {
+      return fallback;
+    }
+
+    try {
+      const response = await fetch(`${API_BASE_URL}/api/ai/predict-iv/batch`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+          scenarios: scenarios.map(({ ticker, type, stockPrice, strike, ttm, currentIv }) => ({
+            ticker,
+            type,
+            stockPrice,
+            strike,
+            ttm,
+            currentIv
+          }))
+        }),
+      });
+
+      if (!response.ok) {
+        throw new Error(`AI Batch Prediction failed: ${response.statusText}`);
+      }
+
+      const data = await response.json();
+
+      if (data.success) {
+        return data.predictions.map((p) => p.iv);
+      } else {
+        console.warn('AI Batch Prediction returned success=false, using fallback IV');
+        return fallback;
+      }
+    } catch (error) {
+      console.error('Error fetching AI batch prediction:', error);
+      return fallback; // Fallback на текущие IV
+    }
+  },
+
+  /**
+   * Получить AI IV Surface — сетку IV по moneyness (K/S) × времени до экспирации
+   * ЗАЧЕМ: Одна сетка заменяет сотни точечных запросов, дальше IV интерполируется локально
+   * @param {Object} params - Параметры запроса
+   * @param {string} params.ticker - Тикер актива
+   * @param {string} params.type - Тип опциона ('CALL' или 'PUT')
+   * @param {number} params.currentIv - Текущая рыночная IV
+   * @returns {Promise<Object|null>} - { moneyness, ttm, shape, iv, used_ai } или null при ошибке
+   */
+  getIVSurface: async ({ ticker, type, currentIv }) => {
+    try {
+      const response = await fetch(`${API_BASE_URL}/api/ai/iv-surface`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ ticker, type, currentIv }),
+      });
+
+      if (!response.ok) {
+        throw new Error(`AI IV Surface failed: ${response.statusText}`);
+      }
+
+      const data = await response.json();
+      return data.success ? data : null;
+    } catch (error) {
+      console.error('Error fetching AI IV surface:', error);
+      return null;
+    }
+  },
+
+  /**
+   * Билинейная интерполяция IV по сетке из getIVSurface
+   * @param {Object} surface - Ответ getIVSurface
+   * @param {number} stockPrice - Цена базового актива
+   * @param {number} strike - Страйк опциона
+   * @param {number} ttm - Время до экспирации в годах
+   * @returns {number} - Интерполированная IV (значения за границами сетки прижимаются к краю)
+   */
+  interpolateIV: (surface, stockPrice, strike, ttm) => {
+    const { moneyness, ttm: ttmGrid, iv } = surface;
+    const cols = ttmGrid.length;
+
+    // Индекс левого узла и вес правого для значения на отсортированной сетке
+    const locate = (grid, value) => {
+      if (value <= grid[0]) return [0, 0];
+      if (value >= grid[grid.length - 1]) return [grid.length - 2, 1];
+      let i = 0;
+      while (grid[i + 1] < value) i += 1;
+      return [i, (value - grid[i]) / (grid[i + 1] - grid[i])];
+    };
+
+    const [i, wm] = locate(moneyness, strike / stockPrice);
+    const [j, wt] = locate(ttmGrid, ttm);
+    const at = (row, col) => iv[row * cols + col];
+
+    const low = at(i, j) * (1 - wt) + at(i, j + 1) * wt;
+    const high = at(i + 1, j) * (1 - wt) + at(i + 1, j + 1) * wt;
+    return low * (1 - wm) + high * wm;
   }
 };
 
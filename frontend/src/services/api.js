@@ -99,7 +99,8 @@ export const analyzeStep3 = async (ticker, aiModel = 'gemini') => {
 export const checkHealth = async () => {
   try {
     const response = await axios.get(`${API_URL}/health`);
-    return response.data.status === 'healthy';
+    // degraded — AI модель не загружена, API работает (IV по fallback)
+    return ['healthy', 'degraded'].includes(response.data.status);
   } catch (error) {
     return false;
   }